@@ -0,0 +1,191 @@
+# analytics.py
+"""
+Utilisation reports over borrow history, computed column-wise with NumPy.
+
+Loans (one row per borrowed unit) come from reminders, which carry
+borrow_date/return_date; borrow counts can also come straight from request
+dicts (history) via their timestamp. Records are flattened once into
+columnar arrays and every aggregate is a vectorised pass over those arrays.
+
+NumPy is optional for the app itself and only needed here.
+
+    python analytics.py [user_settings.json]
+"""
+import json
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - reported when the module is used
+    np = None
+
+
+DAY = 86_400
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("analytics needs NumPy: pip install numpy")
+
+
+def _to_epoch(values, unit):
+    """ISO date/datetime strings -> int64 epoch seconds; unparseable -> -1."""
+    try:
+        arr = np.array(values, dtype=f"datetime64[{unit}]")
+    except ValueError:
+        arr = np.array([_parse_one(v, unit) for v in values], dtype=f"datetime64[{unit}]")
+    secs = arr.astype("datetime64[s]").astype(np.int64)
+    secs[np.isnat(arr)] = -1
+    return secs
+
+
+def _parse_one(value, unit):
+    try:
+        return np.datetime64(value, unit)
+    except (ValueError, TypeError):
+        return np.datetime64("NaT", unit)
+
+
+class LoanColumns:
+    """
+    Columnar loan table:
+        item   int32  index into item_names
+        start  int64  epoch seconds (borrow date)
+        end    int64  epoch seconds of the day after the return date (return
+                      dates are inclusive, as in reservations.py), -1 when
+                      unknown/open
+    """
+
+    def __init__(self, item_names, item, start, end):
+        self.item_names = item_names
+        self.item = item
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return len(self.item)
+
+
+def _intern(names, index):
+    codes = np.empty(len(names), dtype=np.int32)
+    for i, name in enumerate(names):
+        code = index.get(name)
+        if code is None:
+            code = index[name] = len(index)
+        codes[i] = code
+    return codes
+
+
+def loans_from_reminders(reminders, item_names=None):
+    """Flatten reminder dicts (one row per item unit) into LoanColumns; rows returned before they start are dropped."""
+    _require_numpy()
+    index = {name: i for i, name in enumerate(item_names or [])}
+    items, starts, ends = [], [], []
+    for rem in reminders:
+        b, r = rem.get("borrow_date") or "NaT", rem.get("return_date") or "NaT"
+        for it in rem.get("items", []):
+            items.append(it)
+            starts.append(b)
+            ends.append(r)
+    codes = _intern(items, index)
+    names = [None] * len(index)
+    for name, i in index.items():
+        names[i] = name
+    start, end = _to_epoch(starts, "D"), _to_epoch(ends, "D")
+    known = end >= 0
+    end[known] += DAY
+    keep = ~known | (start < 0) | (end > start)
+    if not keep.all():
+        codes, start, end = codes[keep], start[keep], end[keep]
+    return LoanColumns(names, codes, start, end)
+
+
+def requests_to_columns(requests, item_names=None):
+    """Request dicts (history) -> (item_names, item codes, timestamp epoch seconds)."""
+    _require_numpy()
+    index = {name: i for i, name in enumerate(item_names or [])}
+    items, stamps = [], []
+    for req in requests:
+        ts = req.get("timestamp") or "NaT"
+        for it in req.get("items", []):
+            items.append(it)
+            stamps.append(ts)
+    codes = _intern(items, index)
+    names = [None] * len(index)
+    for name, i in index.items():
+        names[i] = name
+    return names, codes, _to_epoch(stamps, "us")
+
+
+# AGGREGATES
+def borrow_counts(codes, n_items):
+    return np.bincount(codes, minlength=n_items)
+
+
+def mean_loan_duration(cols):
+    """Mean loan length per item in seconds (NaN where no closed loan)."""
+    n = len(cols.item_names)
+    closed = (cols.end >= 0) & (cols.start >= 0)
+    dur = (cols.end[closed] - cols.start[closed]).astype(np.float64)
+    totals = np.bincount(cols.item[closed], weights=dur, minlength=n)
+    counts = np.bincount(cols.item[closed], minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def peak_concurrent(cols):
+    """
+    Max simultaneous loans per item. Each loan is +1 at start and -1 at end
+    (the day after its return date); events are sorted per item and the running sum is
+    reduced per item with maximum.reduceat.
+    """
+    n = len(cols.item_names)
+    peaks = np.zeros(n, dtype=np.int64)
+    ok = cols.start >= 0
+    if not ok.any():
+        return peaks
+    closed = ok & (cols.end >= 0)
+    ev_item = np.concatenate([cols.item[ok], cols.item[closed]])
+    ev_time = np.concatenate([cols.start[ok], cols.end[closed]])
+    ev_delta = np.concatenate([np.ones(ok.sum(), np.int64), -np.ones(closed.sum(), np.int64)])
+    order = np.lexsort((ev_delta, ev_time, ev_item))  # -1 before +1 at equal times
+    ev_item, ev_delta = ev_item[order], ev_delta[order]
+    running = np.cumsum(ev_delta)
+    starts = np.flatnonzero(np.r_[True, ev_item[1:] != ev_item[:-1]])
+    # make the running sum restart at each item group
+    base = np.r_[0, running[starts[1:] - 1]]
+    local = running - np.repeat(base, np.diff(np.r_[starts, len(running)]))
+    peaks[ev_item[starts]] = np.maximum.reduceat(local, starts)
+    return peaks
+
+
+def utilisation_report(cols):
+    counts = borrow_counts(cols.item, len(cols.item_names))
+    durations = mean_loan_duration(cols)
+    peaks = peak_concurrent(cols)
+    return [{
+        "item": name,
+        "borrows": int(counts[i]),
+        "peak_concurrent": int(peaks[i]),
+        "mean_loan_days": None if np.isnan(durations[i]) else float(durations[i]) / DAY,
+    } for i, name in enumerate(cols.item_names)]
+
+
+def report_for_controller(controller):
+    """Utilisation over the controller's reminders, keyed by its catalog order."""
+    return utilisation_report(loans_from_reminders(controller.reminders, controller.all_items))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else "user_settings.json"
+    with open(path, encoding="utf-8") as f:
+        reminders = json.load(f).get("reminders", [])
+    print(f"{'item':<32} {'borrows':>8} {'peak':>5} {'mean days':>10}")
+    for row in utilisation_report(loans_from_reminders(reminders)):
+        days = "-" if row["mean_loan_days"] is None else f"{row['mean_loan_days']:.1f}"
+        print(f"{row['item'][:32]:<32} {row['borrows']:>8} {row['peak_concurrent']:>5} {days:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
 # app_controller.py
 import os
 import json
+from collections import Counter
 from datetime import datetime
 
-from auth import AuthSystem
-from catalog import build_tree_and_items, init_availability
+from auth import AuthSystem, iter_user_rows
+from user_store import SQLiteUserStore, data_dir, default_store_path
 from dsa_structures import Stack, Queue, PriorityQueue, DoublyLinkedList
+from forecast import DemandForecaster
+from kits import KitTemplate, load_kits
+from loans import LoanIndex
+from messages import MessageStore
+from overdue import OverdueEngine
+from ratelimit import AdmissionController
+from reservations import OPEN_END, ReservationCalendar, day_number
+from waitlist import Waitlists
 from requests import make_request, reason_to_priority, append_history
+from sessions import IDLE_TIMEOUT, Session, SessionManager
 
 # Helper functions
 def _safe_len(ds):
@@ -16,6 +26,23 @@ def _safe_len(ds):
     except Exception:
         return 0
 
+def _today():
+    return datetime.now().date().toordinal()
+
+
+def _day_span(borrow_date, return_date):
+    """(start, end) day numbers for a dated loan, or None if either date is unparseable."""
+    start, end = day_number(borrow_date), day_number(return_date)
+    if start is None or end is None:
+        return None
+    return start, end
+
+def _sum_counts(pairs):
+    total = Counter()
+    for item, n in pairs:
+        total[item] += n
+    return total
+
 # CART (DOUBLY LINKED LIST)
 class Cart:
     """
@@ -54,36 +81,158 @@ class CircuitLendController:
     - Doubly Linked List for cart management
     """
 
-    def __init__(self):
-        # Catalog & availability
-        self.tree_root, self.categories, self.all_items = build_tree_and_items()
-        self.availability = init_availability(self.all_items)
+    def __init__(self, user_store=None, catalog=None, settings_file=None, catalog_path=None,
+                 availability=None):
+        # Catalog & availability (built on first use, see _ensure_catalog).
+        # Loaded from catalog.jsonl (or catalog_path; a .bin path is memory-mapped,
+        # see catalog_bin.py); `catalog` may instead be a prebuilt
+        # (tree_root, categories, all_items) tuple.
+        # `availability` replaces the per-process stock dict, e.g. with a
+        # shared_stock.SharedAvailability so several processes share counters.
+        self._catalog_override = catalog
+        self._catalog_path = catalog_path
+        self._availability_override = availability
+        self._all_items = None            # with _tree_root/_categories, built on first use
+        self._availability = None
+        self._item_records = None
+        self._record_index = None         # id -> record, for catalogs without their own lookup
+        self._fuzzy_index = None          # (catalog_version, search.FuzzyIndex)
+        self._search_cache = None         # search.QueryCache shared by search sessions
+        self.catalog = None
+        self.catalog_version = 0
 
         # Authentication
-        self.auth = AuthSystem()
-        self.current_user = None
+        # users persist in SQLite by default; pass MemoryUserStore() for tests
+        if user_store is None:
+            user_store = SQLiteUserStore(default_store_path())
+        # tokens live as long as an idle session; each resume restarts both clocks
+        self.auth = AuthSystem(store=user_store, token_ttl=IDLE_TIMEOUT)
+
+        # Sessions: each logged-in user has their own cart (Doubly Linked List)
+        # and undo history (Stack); self.cart / self.undo_stack / self.current_user
+        # are those of the active session, or of an anonymous one when logged out
+        self.sessions = SessionManager(Cart, Stack, on_drop=self._session_dropped)
+        self._guest = Session(None, None, Cart(), Stack(), 0)
+        self._active = None
 
         # DSA Structures
-        self.cart = Cart()                 # Doubly Linked List
         self.pending_q = Queue()           # Queue (FIFO)
         self.priority_q = PriorityQueue()  # Priority Queue
-        self.undo_stack = Stack()           # Stack (LIFO)
 
         # Settings
-        self.settings_file = os.path.join(os.path.dirname(__file__), "user_settings.json")
+        self.settings_file = settings_file or os.path.join(data_dir(), "user_settings.json")
         self.settings = self._load_settings()
 
-        # Reminders
+        # Reminders; due dates are parsed once and scheduled for overdue checks
         self.reminders = self.settings.get("reminders", [])
+        self.overdue = OverdueEngine(self._notify_overdue)
+        # Reservation calendar: open dated loans, replayed from reminders
+        self.calendar = ReservationCalendar(self._capacity)
+        for rem in self.reminders:
+            self.overdue.track(rem)
+            self._book_reminder(rem)
+
+        # Lab kit templates (name -> KitTemplate)
+        self.kits = load_kits(self.settings)
+
+        # Demand forecast, updated incrementally on every submit
+        self.forecaster = DemandForecaster.from_dict(self.settings.get("forecast", {}))
+
+        # Outstanding loans by item and by user (see loans.py), saved next to the settings
+        self.loans_file = os.path.splitext(self.settings_file)[0] + "_loans.json"
+        self.loans = LoanIndex()
+        self._open_ended = set()          # ids of undated loans (booked to OPEN_END)
+        self._load_loans()
+
+        # Waitlists: freed units are held for the next waiter (see waitlist.py)
+        self.waitlists = Waitlists()
 
-        # Messages (optional feature)
-        self.messages = []
+        # Messages: bounded per-user inboxes, paginated (see messages.py)
+        self.messages = MessageStore()
 
-        # Seed demo users
+        # Rate limits on submit/return/undo (None disables; see ratelimit.py)
+        self.admission = AdmissionController()
+
+        # Instrumentation (off unless enable_metrics() is called)
+        self.metrics = None
+
+        # Seed demo users (first run only)
+        if self.auth.store.count() == 0:
+            self._seed_demo_users()
+
+    def _load_loans(self):
+        migrated = False
+        try:
+            with open(self.loans_file, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            rows = self.settings.pop("loans", None)
+            migrated = rows is not None
+        if rows is not None:
+            self.loans.load(rows)
+        else:
+            # settings from before loans were saved: open loans are the
+            # unreturned, already started reminders
+            today = _today()
+            for n, rem in enumerate(self.reminders):
+                span = _day_span(rem.get("borrow_date"), rem.get("return_date"))
+                uid = self._reminder_uid(rem)
+                if rem.get("returned") or uid is None or (span and span[0] > today):
+                    continue
+                rem["loan"] = f"reminder-{n}"
+                self.loans.open(rem["loan"], uid, rem.get("items", []))
+                migrated = True
+        if migrated:
+            self._save_loans()
+            self._persist()
+        # loans without a dated reminder are open-ended; book them from today on
+        dated = {rem.get("loan") for rem in self.reminders if not rem.get("returned")}
+        for row in self.loans.to_list():
+            if row[0] not in dated:
+                self._book_open_ended(row[0], Counter(row[2]))
+
+    def _seed_demo_users(self):
         self.auth.register("Theresa", email="theresa@school.edu",
                            student_id="2026-00001", password="test123")
         self.auth.register("Juan", student_id="2026-12345", password="pass")
 
+    # METRICS (opt-in)
+    def enable_metrics(self):
+        """Start recording per-method latency/call/error counts; see metrics.py."""
+        from metrics import Metrics, instrument
+        if self.metrics is None:
+            m = Metrics()
+            instrument(self, m)
+            m.gauge("pending_queue_depth", lambda: _safe_len(self.pending_q))
+            m.gauge("priority_queue_depth", lambda: _safe_len(self.priority_q))
+            m.gauge("undo_stack_depth", lambda: _safe_len(self.undo_stack))
+            m.gauge("cart_size", lambda: _safe_len(self.cart.items_list))
+            m.gauge("sessions", lambda: len(self.sessions))
+            for kind in ("rejected", "shed"):
+                m.gauge(f"admission_{kind}",
+                        lambda kind=kind: sum(getattr(self.admission, kind).values())
+                        if self.admission else 0)
+            m.cache("session_tokens", lambda: (self.auth.token_hits, self.auth.token_misses))
+            m.cache("search_queries", lambda: ((self._search_cache.hits, self._search_cache.misses)
+                                               if self._search_cache else (0, 0)))
+            store = self.auth.store
+            if hasattr(store, "map_hits"):
+                m.cache("user_identity_map", lambda: (store.map_hits, store.map_misses))
+            self.metrics = m
+        return self.metrics
+
+    def disable_metrics(self):
+        from metrics import uninstrument
+        uninstrument(self)
+        self.metrics = None
+
+    def export_metrics(self, path=None):
+        """Write a Prometheus text dump next to the settings file (or to path)."""
+        if self.metrics is None:
+            return None
+        path = path or os.path.join(os.path.dirname(self.settings_file), "metrics.prom")
+        return self.metrics.write_prometheus(path)
+
     # SETTINGS
     def _load_settings(self):
         try:
@@ -104,6 +253,7 @@ class CircuitLendController:
 
     def _persist(self):
         self.settings["reminders"] = self.reminders
+        self.settings["forecast"] = self.forecaster.to_dict()
         try:
             with open(self.settings_file, "w", encoding="utf-8") as f:
                 json.dump(self.settings, f, indent=2)
@@ -111,6 +261,18 @@ class CircuitLendController:
         except Exception:
             return False
 
+    def _save_loans(self):
+        # own compact file: rewritten on every borrow/return, so kept out of
+        # the indented settings JSON (whose pure-Python encoder is slow)
+        tmp = self.loans_file + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self.loans.to_list(), ensure_ascii=False))
+            os.replace(tmp, self.loans_file)
+            return True
+        except OSError:
+            return False
+
     def save_settings(self, settings_dict):
         self.settings.update(settings_dict or {})
         return self._persist()
@@ -124,9 +286,39 @@ class CircuitLendController:
 
     # AUTHENTICATION
     def login(self, identifier, password=None):
-        res = self.auth.login(identifier, password)
+        return self._complete_login(self.auth.login(identifier, password))
+
+    def login_async(self, identifier, password=None):
+        """Start a login on the auth worker thread; pass the future to finish_login()."""
+        return self.auth.login_async(identifier, password)
+
+    def finish_login(self, future):
+        try:
+            res = future.result()
+        except Exception:
+            res = None
+        return self._complete_login(res)
+
+    def resume_session(self, token):
+        """
+        Log back in with a verified-session token, skipping the password KDF.
+        Also switches between sessions in server mode: the token's cart and
+        undo history become the active ones.
+        """
+        res = self.auth.user_for_token(token, refresh=True)
+        if not res:
+            self.sessions.close(token)
+            return False, "Session expired. Please log in again."
+        self._active = self.sessions.get(token) or self.sessions.open(res, token)
+        return True, f"Welcome back, {res.name}!"
+
+    def _complete_login(self, res):
         if res:
-            self.current_user = res
+            previous = self.sessions.for_user(res)
+            old_token = previous.token if previous else None
+            self._active = self.sessions.open(res, self.auth.issue_token(res))
+            if old_token is not None and old_token != self._active.token:
+                self.auth.revoke_token(old_token)   # the session moved to the new token
             self.settings["email"] = getattr(res, "email", "")
             self.settings["name"] = getattr(res, "name", "")
             self.settings["student_id"] = getattr(res, "student_id", "")
@@ -135,9 +327,70 @@ class CircuitLendController:
         return False, "Login failed."
 
     def logout(self):
-        self.current_user = None
+        # dropping the session discards its cart, so the next user starts empty
+        if self._active is not None:
+            self.sessions.close(self._active.token)
+        self._active = None
+        self._guest.cart = Cart()
+        self._guest.undo_stack = Stack()
         return True, "Logged out."
 
+    # SESSIONS
+    @property
+    def current_user(self):
+        return self._active.user if self._active else None
+
+    @property
+    def session_token(self):
+        return self._active.token if self._active else None
+
+    @property
+    def session(self):
+        """The active Session (anonymous when nobody is logged in)."""
+        return self._active or self._guest
+
+    @property
+    def cart(self):
+        return self.session.cart
+
+    @cart.setter
+    def cart(self, value):
+        self.session.cart = value
+
+    @property
+    def undo_stack(self):
+        return self.session.undo_stack
+
+    @undo_stack.setter
+    def undo_stack(self, value):
+        self.session.undo_stack = value
+
+    @property
+    def screen_state(self):
+        """Per-session dict for GUI state (last search, open screen...)."""
+        return self.session.screen
+
+    def _touch(self):
+        """
+        Count an action by the active user as session activity: the idle
+        timeout (and the token's TTL) restart from now. A session already
+        past its timeout is dropped instead, logging the user out.
+        """
+        session = self._active
+        if session is not None and self.sessions.get(session.token) is not None:
+            self.auth.user_for_token(session.token, refresh=True)
+
+    def expire_sessions(self, now=None):
+        """Drop idle sessions; True if the active one was among them."""
+        active = self._active
+        self.sessions.expire(now)
+        return active is not None and self._active is None
+
+    def _session_dropped(self, session):
+        self.auth.revoke_token(session.token)
+        if session is self._active:
+            self._active = None
+
     def register(self, name, email=None, student_id=None, password=None):
         ok, msg = self.auth.register(name, email=email,
                                      student_id=student_id, password=password)
@@ -150,6 +403,10 @@ class CircuitLendController:
             self._persist()
         return ok, msg
 
+    def import_users(self, path, iterations=None):
+        """Bulk-register users from a CSV/JSONL file; returns an ImportReport."""
+        return self.auth.import_users(iter_user_rows(path), iterations=iterations)
+
     def change_username(self, new_name):
         if not self.current_user:
             return False, "Please log in first."
@@ -162,53 +419,425 @@ class CircuitLendController:
     def change_password(self, old_pwd, new_pwd):
         if not self.current_user:
             return False, "Please log in first."
-        return self.auth.change_password(self.current_user, old_pwd, new_pwd)
+        ok, msg = self.auth.change_password(self.current_user, old_pwd, new_pwd)
+        if ok:
+            # old tokens were revoked with the password; keep this session alive
+            self.sessions.rekey(self._active, self.auth.issue_token(self.current_user))
+        return ok, msg
 
     # CATALOG
-    def search_items(self, q):
+    def _ensure_catalog(self):
+        if self._availability is None:
+            from catalog import CATALOG_FILE, CatalogSource, StreamedAvailability, init_availability
+            path = self._catalog_path or CATALOG_FILE
+            if self._catalog_override:
+                tree_root, categories, all_items = self._catalog_override
+                self._tree_root, self._categories, self._all_items = tree_root, categories, list(all_items)
+            elif path.endswith(".bin"):
+                # shared read-only map: ids/categories are views, not copies
+                from catalog_bin import MappedCatalog
+                self.catalog = MappedCatalog(path)
+                self._tree_root, self._categories, self._all_items = self._mapped_tree()
+            else:
+                # streamed: the tree is built when first asked for (_ensure_tree)
+                self.catalog = CatalogSource(path)
+            if self._availability_override is not None:
+                self._availability = self._availability_override
+                if self.catalog is not None and hasattr(self._availability, "apply_catalog_delta"):
+                    self.catalog.fingerprint()  # shared counters are stamped with it: read it now
+            elif self.catalog is not None:
+                # stock is read per item as it is first looked up (from the
+                # stream or the map), net of open loans
+                self._availability = StreamedAvailability(self.catalog, self.loans.by_item_units())
+            else:
+                self._availability = init_availability(self._all_items, self.catalog)
+                # units still out on loans saved from the last run
+                for item, n in self.loans.by_item_units().items():
+                    if item in self._availability:
+                        self._availability[item] = max(0, self._availability[item] - n)
+
+    def _ensure_tree(self):
+        self._ensure_catalog()
+        if self._all_items is None:
+            from catalog import build_tree_and_items
+            self._tree_root, self._categories, self._all_items = build_tree_and_items(self.catalog)
+
+    def _mapped_tree(self):
+        categories = self.catalog.categories()
+        return {"name": "root", "children": list(categories)}, categories, self.catalog.ids()
+
+    def reload_catalog(self):
+        """
+        Pick up edits to the catalog file without a restart. New items get
+        their initial stock, stock edits shift availability by the difference,
+        removed items disappear. Returns True if anything changed.
+        """
+        self._ensure_catalog()
+        if self.catalog is None or not self.catalog.changed():
+            return False
+        from catalog import default_stock
+        avail = self._availability
+        shared = hasattr(avail, "apply_catalog_delta")
+        old_stamp = self.catalog.fingerprint() if shared else None
+        added, removed, changed = self.catalog.reload()
+
+        def stock(rec):
+            return rec["stock"] if rec["stock"] is not None else default_stock(rec["id"])
+
+        deltas = {new["id"]: stock(new) - stock(old) for old, new in changed}
+        lazy = hasattr(avail, "loaded")
+        if shared:
+            # fixed slots: only stock edits to known items apply, and only
+            # once for all the processes reloading this edit
+            avail.apply_catalog_delta(old_stamp, self.catalog.fingerprint(), deltas)
+            deltas = {}
+        elif lazy:
+            # a streamed map reads items it has not seen yet (new ones
+            # included) from the reloaded file when they are first looked up
+            deltas = {item_id: d for item_id, d in deltas.items() if avail.loaded(item_id)}
+        else:
+            for rec in added:
+                avail[rec["id"]] = stock(rec)
+        for item_id, delta in deltas.items():
+            if delta > 0:
+                self._release_stock([item_id] * delta)
+            elif delta < 0:
+                self._retake_stock([item_id] * -delta)
+        for item_id in removed:
+            if not shared:
+                avail.pop(item_id, None)
+        if hasattr(self.catalog, "ids"):
+            self._tree_root, self._categories, self._all_items = self._mapped_tree()
+        else:
+            self._all_items = None      # rebuilt on next use
+        self._item_records = self._record_index = None
+        self.catalog_version += 1
+        return True
+
+    def item_records(self):
+        """Display records (id, title, category, image, desc) in catalog order."""
+        self._ensure_catalog()
+        if self._item_records is None:
+            if self.catalog is not None:
+                self._item_records = self.catalog.records()
+            else:
+                self._ensure_tree()
+                cat_of = {it: cat for cat, its in self._categories.items() for it in its}
+                self._item_records = [{"id": it, "title": it, "category": cat_of.get(it, ""),
+                                       "image": None, "desc": "", "stock": None}
+                                      for it in self._all_items]
+        return self._item_records
+
+    def item_record(self, item_id):
+        self._ensure_catalog()
+        if self.catalog is not None:
+            return self.catalog.get(item_id)
+        if self._record_index is None:
+            self._record_index = {r["id"]: r for r in self.item_records()}
+        return self._record_index.get(item_id)
+
+    @property
+    def tree_root(self):
+        self._ensure_tree()
+        return self._tree_root
+
+    @property
+    def categories(self):
+        self._ensure_tree()
+        return self._categories
+
+    @property
+    def all_items(self):
+        self._ensure_tree()
+        return self._all_items
+
+    @property
+    def availability(self):
+        self._ensure_catalog()
+        return self._availability
+
+    def search_items(self, q, fuzzy=False):
+        """
+        Substring match on item ids (catalog order). fuzzy=True ranks by
+        typo-tolerant token match instead (see search.py).
+        """
+        self._touch()
+        self._ensure_catalog()
+        if fuzzy:
+            return self._fuzzy().search(q)
+        if hasattr(self.catalog, "search"):
+            return self.catalog.search(q)   # mmap-backed index
         from catalog import array_search
         return array_search(self.all_items, q)
 
+    def search_session(self, fuzzy=False):
+        """Incremental search-as-you-type session sharing one LRU of recent queries."""
+        from search import QueryCache, SearchSession
+        if self._search_cache is None:
+            self._search_cache = QueryCache()
+        return SearchSession(self, fuzzy=fuzzy, cache=self._search_cache)
+
+    def _fuzzy(self):
+        # built once per catalog version from the display records
+        if self._fuzzy_index is None or self._fuzzy_index[0] != self.catalog_version:
+            from search import FuzzyIndex
+            self._fuzzy_index = (self.catalog_version, FuzzyIndex(self.item_records()))
+        return self._fuzzy_index[1]
+
     def sort_items(self, by="name"):
         from catalog import array_sort
         return array_sort(self.all_items, by=by, availability=self.availability)
 
+    def _capacity(self, item):
+        """Units of item that exist (catalog stock), for the reservation calendar."""
+        from catalog import default_stock
+        rec = self.item_record(item)
+        stock = rec.get("stock") if rec else None
+        return stock if stock is not None else default_stock(item)
+
+    def free_between(self, item, borrow_date, return_date):
+        """Units of item not reserved on any day of [borrow_date, return_date]."""
+        span = _day_span(borrow_date, return_date)
+        if span is None:
+            return self.availability_of(item)
+        return self.calendar.free(item, *span)
+
     def availability_of(self, item):
         return self.availability.get(item, 0)
 
+    def on_loan(self, item):
+        """Units of item currently borrowed (O(1))."""
+        return self.loans.outstanding(item)
+
+    def who_has(self, item):
+        """{uid: units} of students holding item."""
+        return self.loans.holders(item)
+
+    def my_loans(self):
+        """Counter of units the logged-in user holds."""
+        return self.loans.user_items(self.current_user.uid) if self.current_user else {}
+
+    def recommended_stock(self):
+        """Forecast-based stock level per catalog item (see forecast.py)."""
+        return self.forecaster.recommendations(self.all_items)
+
+    # STOCK (plain dict, or a shared backend with atomic *_many operations)
+    def _short_of_stock(self, counts):
+        """First item whose stock is below its count (nothing is taken), or None."""
+        avail = self.availability
+        return next((item for item, n in counts.items() if avail.get(item, 0) < n), None)
+
+    def _take_stock(self, items):
+        """
+        Deduct one unit per listed item (or a Counter of totals, one step
+        per item), all or nothing. Returns the first short item or None.
+        """
+        counts = items if isinstance(items, Counter) else Counter(items)
+        avail = self.availability
+        if hasattr(avail, "try_take_many"):
+            return avail.try_take_many(counts)[1]
+        for item, n in counts.items():
+            if avail.get(item, 0) < n:
+                return item
+        for item, n in counts.items():
+            avail[item] -= n
+        return None
+
+    def _release_stock(self, items):
+        avail = self.availability
+        if hasattr(avail, "release_many"):
+            avail.release_many(Counter(items))
+            return
+        for item in items:
+            avail[item] = avail.get(item, 0) + 1
+
+    def _retake_stock(self, items):
+        """Deduct without going below zero (undoing a return)."""
+        avail = self.availability
+        if hasattr(avail, "take_up_to_many"):
+            avail.take_up_to_many(Counter(items))
+            return
+        for item in items:
+            avail[item] = max(0, avail.get(item, 0) - 1)
+
     # CART OPERATIONS (DLL)
-    def add_to_cart(self, item):
+    def add_to_cart(self, item, borrow_date=None, return_date=None):
+        """
+        Add one unit of item. For a dated borrow the calendar decides (a
+        booking that starts later needs no stock today); otherwise, or when
+        it starts today, a unit must be in stock now.
+        """
+        self._touch()
         if item not in self.availability:
             return False, "Item not found."
-        if self.availability[item] <= 0:
+        span = _day_span(borrow_date, return_date) if borrow_date and return_date else None
+        if span and span[0] <= span[1]:
+            wanted = self.cart.items().count(item) + 1
+            if self.calendar.free(item, *span) < wanted:
+                return False, f"Fully booked {borrow_date} to {return_date}."
+        if (span is None or span[0] <= _today()) and \
+                self.availability[item] <= 0 and not self._held_for_me(item):
             return False, "Item unavailable."
         return self.cart.add(item)
 
+    # WAITLISTS (PQ per item) & HOLDS
+    def _held_for_me(self, item):
+        return bool(self.current_user) and self.waitlists.held(item, self.current_user.uid) > 0
+
+    def join_waitlist(self, item, reason="normal"):
+        self._touch()
+        if not self.current_user:
+            return False, "Please log in first."
+        if item not in self.availability:
+            return False, "Item not found."
+        if self.availability[item] > 0:
+            return False, "Item is available now."
+        return self.waitlists.join(item, self.current_user.uid, reason_to_priority(reason))
+
+    def leave_waitlist(self, item):
+        if not self.current_user:
+            return False, "Please log in first."
+        left = self.waitlists.leave(item, self.current_user.uid)
+        return left, ("Left the waitlist." if left else "Not on the waitlist.")
+
+    def _free_units(self, items):
+        """Hand each freed unit to the item's next waiter, the rest back to stock. Returns [(item, uid)] handed off."""
+        handed, back = [], []
+        for item in items:
+            uid = self.waitlists.hand_off(item)
+            if uid is None:
+                back.append(item)
+                continue
+            handed.append((item, uid))
+            self.messages.append({
+                "title": "Item available",
+                "lines": [f"A unit of {item} is being held for you.",
+                          f"Add it to your cart within {self.waitlists.hold_seconds // 3600} hours to claim it."],
+            }, user=uid)
+        if back:
+            self._release_stock(back)
+        return handed
+
+    def expire_holds(self, now=None):
+        """
+        Pass unclaimed holds past their deadline to the next waiter (or
+        stock), then start dated bookings whose first day has come.
+        """
+        expired = self.waitlists.expire(now)
+        self._free_units([item for item, _ in expired])
+        self.start_due_bookings()
+        return len(expired)
+
+    def start_due_bookings(self, today=None):
+        """Take stock and open the loan for future bookings that start today (or earlier)."""
+        today = _today() if today is None else today
+        started = 0
+        for n, rem in enumerate(self.reminders):
+            if not rem.get("pending") or rem.get("returned"):
+                continue
+            span = _day_span(rem.get("borrow_date"), rem.get("return_date"))
+            if span is None or span[0] > today:
+                continue
+            # the calendar kept these units free; if stock is short anyway, retry on the next poll
+            if self._take_stock(rem.get("items", [])) is not None:
+                continue
+            rem.setdefault("loan", f"booking-{n}-{span[0]}")
+            self.loans.open(rem["loan"], self._reminder_uid(rem), rem.get("items", []))
+            del rem["pending"]
+            started += 1
+        if started:
+            self._save_loans()
+            self._persist()
+        return started
+
+    # OPEN-ENDED (undated) LOANS: booked on the calendar from their start until returned
+    def _book_open_ended(self, loan_id, items):
+        self.calendar.book(items, _today(), OPEN_END, force=True)
+        self._open_ended.add(loan_id)
+
+    def _close_loan(self, loan_id):
+        units = self.loans.close(loan_id)
+        if loan_id in self._open_ended:
+            self._open_ended.discard(loan_id)
+            if units:
+                self.calendar.cancel(units, _today(), OPEN_END)
+        return units
+
+    def _unbook_open_ended(self, consumed):
+        back = [(item, n) for loan_id, item, n in consumed if loan_id in self._open_ended]
+        if back:
+            self.calendar.cancel(_sum_counts(back), _today(), OPEN_END)
+        for loan_id, _, _ in consumed:
+            if self.loans.get(loan_id) is None:
+                self._open_ended.discard(loan_id)
+
+    def _rebook_open_ended(self, consumed):
+        ids = {rem.get("loan") for rem in self.reminders if not rem.get("returned")}
+        back = [(item, n) for loan_id, item, n in consumed if loan_id not in ids]
+        if back:
+            self.calendar.book(_sum_counts(back), _today(), OPEN_END, force=True)
+            self._open_ended.update(loan_id for loan_id, _, _ in consumed if loan_id not in ids)
+
     def remove_from_cart(self, item):
+        self._touch()
         return self.cart.remove(item)
 
     # BORROW REQUESTS (QUEUE & PQ)
     def submit_borrow(self, reason="normal", prioritize=False,
                       id_deposit=True, borrow_date=None, return_date=None):
-
+        self._touch()
         if not self.current_user:
             return False, "Please log in first."
-
         items = self.cart.items()
         if not items:
             return False, "Cart is empty."
+        span = _day_span(borrow_date, return_date) if borrow_date and return_date else None
+        if span and span[1] < span[0]:
+            return False, "Return date is before borrow date."
+        # Stock first (units held for this user from a waitlist come first);
+        # a booking starting in the future leaves current stock alone
+        take_now = span is None or span[0] <= _today()
+        if take_now:
+            uid = self.current_user.uid
+            from_holds = Counter({it: min(n, self.waitlists.held(it, uid)) for it, n in Counter(items).items()})
+            need = Counter(items) - from_holds
+            short = self._short_of_stock(need)
+            if short is not None:
+                return False, f"Out of stock: {short}"
+
+        # Then the reservation calendar: dated borrows over their span;
+        # undated loans are booked from today until returned, so with the
+        # stock there they still cannot take units promised to an upcoming booking
+        if span:
+            short = self.calendar.first_short(items, *span)
+            if short is not None:
+                return False, f"Fully booked {borrow_date} to {return_date}: {short}"
+        else:
+            short = self.calendar.first_short(items, _today(), OPEN_END)
+            if short is not None:
+                return False, f"Reserved for an upcoming booking: {short}"
+
+        # only requests that could go through spend a rate-limit token
+        ok, msg = self._admit("submit_borrow")
+        if not ok:
+            return False, msg
 
         # Deduct stock
-        for item in items:
-            if self.availability[item] <= 0:
-                return False, f"Out of stock: {item}"
-        for item in items:
-            self.availability[item] -= 1
+        if take_now:
+            short = self._take_stock(list(need.elements()))
+            if short is not None:
+                return False, f"Out of stock: {short}"
+            for it, n in from_holds.items():
+                self.waitlists.claim(it, uid, n)
 
         request = make_request(
             self.current_user, items,
             reason=reason, id_deposit=id_deposit
         )
+        if take_now:
+            self.loans.open(request["id"], self.current_user.uid, items)
+        if span is None:
+            self._book_open_ended(request["id"], items)
 
         # PRIORITY QUEUE vs NORMAL QUEUE
         if prioritize:
@@ -218,23 +847,24 @@ class CircuitLendController:
             self.pending_q.enqueue(request)
 
         append_history(self.current_user, request)
+        self.auth.record_history(self.current_user, request)
+        self.forecaster.observe(items)
+
+        # Save reminder (books the calendar); a future one takes stock when it starts
+        reminder = None
+        if borrow_date and return_date:
+            reminder = self.add_reminder(items, borrow_date, return_date,
+                                         loan=request["id"], pending=not take_now)
+        if take_now:
+            self._save_loans()
 
         # STACK PUSH (UNDO)
         self.undo_stack.push({
             "type": "CANCEL_BORROW",
-            "payload": request
+            "payload": request,
+            "reminder": reminder
         })
 
-        # Save reminder
-        if borrow_date and return_date:
-            self.reminders.append({
-                "user": self.current_user.name,
-                "items": items,
-                "borrow_date": borrow_date,
-                "return_date": return_date
-            })
-            self._persist()
-
         self.cart = Cart()
         return True, (
             f"Submitted ({reason}). "
@@ -242,6 +872,101 @@ class CircuitLendController:
             f"Priority: {_safe_len(self.priority_q)}"
         )
 
+    # LAB KITS (bulk reservation)
+    def save_kit(self, name, items):
+        kit = KitTemplate(name, items)
+        missing = kit.missing(self.availability)
+        if missing:
+            return False, f"Not in catalog: {', '.join(missing)}"
+        if not kit.items:
+            return False, "Kit is empty."
+        self.kits[name] = kit
+        self.settings["kits"] = {k.name: k.to_dict() for k in self.kits.values()}
+        self._persist()
+        return True, f"Saved kit '{name}'."
+
+    def reserve_kit(self, name, students, borrow_date=None, return_date=None, reason="official_lab"):
+        """
+        Reserve kit `name` for every student (ids or emails) in one step.
+        Everything is validated first; stock (or, for a future date, the
+        reservation calendar) is checked and changed once per item using the
+        class totals, so either every student gets a kit or nobody does.
+        """
+        self._touch()
+        if not self.current_user:
+            return False, "Please log in first."
+        kit = self.kits.get(name)
+        if kit is None:
+            return False, f"No kit named '{name}'."
+        missing = kit.missing(self.availability)
+        if missing:
+            return False, f"Kit items not in catalog: {', '.join(missing)}"
+        users, unknown = [], []
+        for ident in students:
+            u = self.auth.find_user(ident)
+            (users if u else unknown).append(u or ident)
+        if unknown:
+            return False, f"Unknown students: {', '.join(map(str, unknown[:5]))}"
+        if not users:
+            return False, "No students given."
+
+        totals = kit.totals(len(users))
+        span = _day_span(borrow_date, return_date) if borrow_date and return_date else None
+        if span and span[1] < span[0]:
+            return False, "Return date is before borrow date."
+        take_now = span is None or span[0] <= _today()
+        if take_now:
+            short = self._short_of_stock(totals)
+            if short is not None:
+                return False, f"Not enough {short} for {len(users)} kits ({totals[short]} needed)."
+        if span:
+            short = self.calendar.first_short(totals, *span)
+            if short is not None:
+                return False, f"Fully booked {borrow_date} to {return_date}: {short}"
+        else:
+            short = self.calendar.first_short(totals, _today(), OPEN_END)
+            if short is not None:
+                return False, f"Reserved for an upcoming booking: {short}"
+        if take_now:
+            short = self._take_stock(totals)
+            if short is not None:
+                return False, f"Not enough {short} for {len(users)} kits ({totals[short]} needed)."
+        if span:
+            self.calendar.book(totals, *span, force=True)
+        else:
+            self.calendar.book(totals, _today(), OPEN_END, force=True)
+
+        units = kit.units()
+        priority = reason_to_priority(reason)
+        requests, reminders = [], []
+        for u in users:
+            request = make_request(u, units, reason=reason)
+            request["kit"] = name
+            self.priority_q.push(priority, request)
+            append_history(u, request)
+            self.auth.record_history(u, request)
+            if take_now:
+                self.loans.open(request["id"], u.uid, units)
+            if span:
+                reminders.append(self.add_reminder(units, borrow_date, return_date,
+                                                   user=u, book=False, persist=False,
+                                                   loan=request["id"], pending=not take_now))
+            else:
+                self._open_ended.add(request["id"])   # booked above with the totals
+            requests.append(request)
+        self.forecaster.observe(list(totals.elements()))
+        if reminders:
+            self._persist()
+        if take_now:
+            self._save_loans()
+
+        self.undo_stack.push({
+            "type": "CANCEL_KIT",
+            "payload": requests,
+            "reminders": reminders
+        })
+        return True, f"Reserved '{name}' for {len(users)} students."
+
     # HISTORY & RECEIPTS
     def list_borrow_history(self):
         if not self.current_user:
@@ -269,17 +994,152 @@ class CircuitLendController:
             "issued_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
         }
 
+    # MESSAGES (per-user inbox)
+    def send_message(self, message, user=None):
+        user = user or self.current_user
+        return self.messages.append(message, user=user.uid if user else None)
+
+    def inbox_page(self, number=0, per_page=None):
+        """(entries, page_count) for the logged-in user; entries are (seq, message, read)."""
+        uid = self.current_user.uid if self.current_user else None
+        kw = {"per_page": per_page} if per_page else {}
+        return self.messages.page(uid, number, **kw), self.messages.page_count(uid, **kw)
+
+    def mark_messages_read(self, seqs):
+        if self.current_user:
+            self.messages.mark_read(seqs, user=self.current_user.uid)
+
+    def unread_messages(self):
+        return self.messages.unread(self.current_user.uid) if self.current_user else 0
+
+    # REMINDERS & OVERDUE
+    def add_reminder(self, items, borrow_date, return_date, user=None, book=True, persist=True,
+                     loan=None, pending=False):
+        self._touch()
+        rem = {
+            "user": (user or self.current_user).name,
+            "uid": (user or self.current_user).uid,
+            "items": list(items),
+            "borrow_date": borrow_date,
+            "return_date": return_date
+        }
+        if loan is not None:
+            rem["loan"] = loan          # the loan this booking is (or becomes)
+        if pending:
+            rem["pending"] = True       # starts in the future; stock not taken yet
+        self.reminders.append(rem)
+        self.overdue.track(rem)
+        if book:
+            self._book_reminder(rem)
+        if persist:
+            self._persist()
+        return rem
+
+    def set_loan_dates(self, loan_id, borrow_date, return_date):
+        """
+        Date one of the current user's open loans: its booking (open-ended
+        for an undated loan) is replaced by [borrow_date, return_date] and a
+        reminder is saved for the overdue checks.
+        """
+        self._touch()
+        if not self.current_user:
+            return False, "Please log in first."
+        loan = self.loans.get(loan_id)
+        if loan is None or loan.user != self.current_user.uid:
+            return False, "No open loan to set dates for."
+        span = _day_span(borrow_date, return_date)
+        if span is None:
+            return False, "Dates must be YYYY-MM-DD."
+        if span[1] < span[0]:
+            return False, "Return date is before borrow date."
+        if loan_id in self._open_ended:
+            self._open_ended.discard(loan_id)
+            self.calendar.cancel(loan.items, _today(), OPEN_END)
+        old = [r for r in self.reminders if r.get("loan") == loan_id and not r.get("returned")]
+        for rem in old:
+            self.overdue.untrack(rem)
+            self._unbook_reminder(rem)
+        if old:
+            self.reminders = [r for r in self.reminders if not any(r is o for o in old)]
+        self.add_reminder(list(loan.items.elements()), borrow_date, return_date, loan=loan_id)
+        return True, "Reminder saved. See Reminders tab."
+
+    def _book_reminder(self, rem):
+        span = _day_span(rem.get("borrow_date"), rem.get("return_date"))
+        if span and span[0] <= span[1] and not rem.get("returned"):
+            self.calendar.book(rem.get("items", []), *span, force=True)
+
+    def _unbook_reminder(self, rem):
+        span = _day_span(rem.get("borrow_date"), rem.get("return_date"))
+        if span and span[0] <= span[1] and not rem.get("returned"):
+            self.calendar.cancel(rem.get("items", []), *span)
+
+    def check_overdue(self, now=None):
+        """Advance the overdue timer wheel; newly overdue loans are sent to their owner's inbox."""
+        fired = self.overdue.tick(now)
+        if fired:
+            self._persist()     # "notified" marks, so a restart does not send them again
+        return fired
+
+    def _reminder_uid(self, reminder):
+        """Owner uid; reminders saved before uids were stored fall back to a unique name match."""
+        if reminder.get("uid") is not None:
+            return reminder["uid"]
+        users = self.auth.find_by_name(reminder.get("user", ""))
+        return users[0].uid if len(users) == 1 else None
+
+    def _notify_overdue(self, reminder, due):
+        reminder["notified"] = due
+        self.messages.append({
+            "title": "Overdue",
+            "lines": [f"Return deadline passed: {reminder.get('return_date', '')}",
+                      "Items:"] + [f"  {it}" for it in reminder.get("items", [])],
+            "reminder": reminder,
+        }, user=self._reminder_uid(reminder))
+
+    def _resolve_reminders(self, items):
+        """Mark the current user's reminders covered by returned items as returned."""
+        left = Counter(items)
+        resolved = []
+        for rem in self.reminders:
+            if rem.get("returned") or self._reminder_uid(rem) != self.current_user.uid:
+                continue
+            need = Counter(rem.get("items", []))
+            if need and all(left[it] >= n for it, n in need.items()):
+                left -= need
+                self._unbook_reminder(rem)
+                rem["returned"] = True
+                self.overdue.untrack(rem)
+                resolved.append(rem)
+        if resolved:
+            self._persist()
+        return resolved
+
     # RETURNS & UNDO (STACK)
     def return_items(self, items):
+        self._touch()
         if not self.current_user:
             return False, "Please log in first."
-
-        for item in items:
-            self.availability[item] += 1
+        uid = self.current_user.uid
+        short = self.loans.first_unheld(uid, items)
+        if short is not None:
+            return False, f"No open loan for {short}."
+        ok, msg = self._admit("return_items")
+        if not ok:
+            return False, msg
+        consumed = self.loans.return_units(uid, items)
+        self._unbook_open_ended(consumed)
+        handed = self._free_units(items)
+        resolved = self._resolve_reminders(items)
+        self._save_loans()
 
         self.undo_stack.push({
             "type": "REVERT_RETURN",
-            "payload": items
+            "payload": items,
+            "user": uid,
+            "loans": consumed,
+            "handed": handed,
+            "reminders": resolved
         })
 
         return True, f"Returned {len(items)} item(s)."
@@ -289,21 +1149,74 @@ class CircuitLendController:
             return False, "Please log in first."
         self.current_user.history_head = None
         self.current_user.history_tail = None
+        self.auth.clear_history(self.current_user)
         return True, "Borrow history cleared."
 
+    def _admit(self, op):
+        if self.admission is None:
+            return True, ""
+        user = self.current_user
+        return self.admission.admit(op, user.uid if user else None)
+
     def undo(self):
+        self._touch()
+        if not self.undo_stack:
+            return False, "Nothing to undo."
+        ok, msg = self._admit("undo")
+        if not ok:
+            return False, msg
         action = self.undo_stack.pop()
         if not action:
             return False, "Nothing to undo."
 
         if action["type"] == "CANCEL_BORROW":
-            for item in action["payload"].get("items", []):
-                self.availability[item] += 1
+            # only units still out on the loan come back (some may be returned
+            # already; a future booking may not have started)
+            loan_id = action["payload"]["id"]
+            self._free_units(self._close_loan(loan_id))
+            # its booking, including one added later by set_loan_dates
+            dropped = [r for r in self.reminders
+                       if r is action.get("reminder") or r.get("loan") == loan_id]
+            for rem in dropped:
+                self.overdue.untrack(rem)
+                self._unbook_reminder(rem)
+            if dropped:
+                self.reminders = [r for r in self.reminders if not any(r is d for d in dropped)]
+                self._persist()
+            self._save_loans()
             return True, "Undo successful: borrow cancelled."
 
+        if action["type"] == "CANCEL_KIT":
+            freed = []
+            for request in action["payload"]:
+                freed.extend(self._close_loan(request["id"]))
+            self._free_units(freed)
+            dropped = set(map(id, action.get("reminders", [])))
+            for rem in action.get("reminders", []):
+                self.overdue.untrack(rem)
+                self._unbook_reminder(rem)
+            if dropped:
+                self.reminders = [r for r in self.reminders if id(r) not in dropped]
+                self._persist()
+            self._save_loans()
+            return True, f"Undo successful: kit reservation for {len(action['payload'])} students cancelled."
+
         if action["type"] == "REVERT_RETURN":
-            for item in action["payload"]:
-                self.availability[item] = max(0, self.availability[item] - 1)
+            # units already handed to waiters are taken back from their holds
+            rest = Counter(action["payload"])
+            for item, uid in action.get("handed", []):
+                if self.waitlists.claim(item, uid):
+                    rest[item] -= 1
+            self._retake_stock(list(rest.elements()))
+            self.loans.restore(action["user"], action["loans"])
+            self._rebook_open_ended(action["loans"])
+            for rem in action.get("reminders", []):
+                rem.pop("returned", None)
+                self.overdue.track(rem)
+                self._book_reminder(rem)
+            if action.get("reminders"):
+                self._persist()
+            self._save_loans()
             return True, "Undo successful: return reverted."
 
         return False, "Unknown undo action."
@@ -1,5 +1,124 @@
 # auth.py
+import csv
 import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+from user_store import MemoryUserStore, norm_email, norm_name
+
+# PASSWORD HASHING
+# Stored format: "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>"
+# Older accounts hold a bare unsalted SHA-256 hex digest; those are
+# re-hashed with the KDF the first time the user logs in successfully.
+KDF_NAME = "pbkdf2_sha256"
+DEFAULT_ITERATIONS = 100_000
+SALT_BYTES = 16
+TOKEN_TTL = 15 * 60  # seconds a verified-session token stays valid
+
+
+def hash_password(pwd, iterations=DEFAULT_ITERATIONS, salt=None):
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", pwd.encode("utf-8"), salt, iterations)
+    return f"{KDF_NAME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def _legacy_hash(pwd):
+    return hashlib.sha256(pwd.encode("utf-8")).hexdigest()
+
+
+def _is_hex(text, length=None):
+    return (bool(text) and len(text) % 2 == 0 and (length is None or len(text) == length)
+            and all(ch in "0123456789abcdefABCDEF" for ch in text))
+
+
+def is_password_hash(stored):
+    """True for a legacy 64-hex SHA-256 digest or a well-formed KDF hash."""
+    if not isinstance(stored, str):
+        return False
+    parts = stored.split("$")
+    if len(parts) == 1:
+        return _is_hex(stored, 64)
+    if len(parts) != 4 or parts[0] != KDF_NAME:
+        return False
+    _, rounds, salt_hex, digest_hex = parts
+    return (rounds.isascii() and rounds.isdigit() and int(rounds) > 0
+            and _is_hex(salt_hex) and _is_hex(digest_hex, 64))
+
+
+def verify_password(pwd, stored, iterations=DEFAULT_ITERATIONS):
+    """
+    Returns (ok, needs_rehash).
+    needs_rehash is True for legacy digests and for KDF hashes made
+    with a different cost than the current setting. A corrupt stored
+    hash never matches.
+    """
+    if not stored:
+        return False, False
+    parts = stored.split("$")
+    if len(parts) != 4:
+        if not _is_hex(stored, 64):
+            return False, False
+        ok = hmac.compare_digest(stored, _legacy_hash(pwd))
+        return ok, ok
+    name, rounds, salt_hex, digest_hex = parts
+    if name != KDF_NAME:
+        return False, False
+    try:
+        rounds = int(rounds)
+        digest = hashlib.pbkdf2_hmac("sha256", pwd.encode("utf-8"),
+                                     bytes.fromhex(salt_hex), rounds)
+    except ValueError:
+        return False, False
+    ok = hmac.compare_digest(digest.hex(), digest_hex)
+    return ok, ok and rounds != iterations
+
+
+# BULK IMPORT
+def iter_user_rows(path):
+    """
+    Stream user rows from a .csv (header row) or .jsonl file, one dict at a time.
+    Columns: name, email, student_id, and password or password_hash.
+    Malformed JSON lines are yielded as None so the importer can report them.
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row if isinstance(row, dict) else None
+
+
+def _text(value):
+    # JSONL rows may carry numbers (e.g. a numeric student_id); compare as text
+    return "" if value is None else str(value).strip()
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []      # (row_number, message)
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        total = self.imported + len(self.errors)
+        return total / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"ImportReport(imported={self.imported}, errors={len(self.errors)}, "
+                f"rows_per_sec={self.rows_per_sec:.0f})")
+
 
 class User:
     def __init__(self, name, email=None, student_id=None):
@@ -10,54 +129,202 @@ class User:
         # borrow history linked list of dict nodes: {"request": {...}, "next": node}
         self.history_head = None
         self.history_tail = None
+        self.uid = None  # assigned by the user store
 
 class AuthSystem:
     """
     Supports:
       - register(name, email=None, student_id=None, password=None) -> (ok: bool, msg: str)
       - login(identifier, password=None) -> User or None
+      - login_async(identifier, password=None) -> Future[User or None]
+      - import_users(rows, iterations=None) -> ImportReport
+      - find_by_name(name) -> [User]
+      - issue_token(user) -> str / user_for_token(token) -> User or None
       - change_username(user: User, new_name: str) -> (ok, msg)
       - change_password(user: User, old_pwd: str, new_pwd: str) -> (ok, msg)
+      - record_history(user, request) / clear_history(user)
+    Users and history are kept in a pluggable store (see user_store.py).
     """
-    def __init__(self):
-        self.users = []
-        self.by_email = {}
-        self.by_id = {}
+    def __init__(self, iterations=DEFAULT_ITERATIONS, token_ttl=TOKEN_TTL, store=None):
+        self.store = store if store is not None else MemoryUserStore()
+        self.iterations = iterations
+        self.token_ttl = token_ttl
+        self._tokens = {}     # token -> (user, expires_at)
+        self.token_hits = 0
+        self.token_misses = 0
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            # imported lazily: concurrent.futures is a noticeable slice of startup
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="auth")
+        return self._executor
 
     def _hash(self, pwd):
-        return hashlib.sha256(pwd.encode("utf-8")).hexdigest()
+        return hash_password(pwd, self.iterations)
+
+    def _check(self, user, pwd):
+        ok, needs_rehash = verify_password(pwd, user.password_hash, self.iterations)
+        if needs_rehash:
+            # transparent upgrade of legacy / outdated-cost hashes
+            user.password_hash = self._hash(pwd)
+            self.store.update(user)
+        return ok
+
+    def _lookup(self, identifier):
+        return self.store.get_by_email(norm_email(identifier)) or self.store.get_by_id(identifier)
+
+    def find_user(self, identifier):
+        """User by email (any case) or student id, without a password check."""
+        identifier = (identifier or "").strip()
+        return self._lookup(identifier) if identifier else None
 
     def register(self, name, email=None, student_id=None, password=None):
-        if email and email in self.by_email:
+        if email and self.store.get_by_email(norm_email(email)):
             return False, "Email already registered."
-        if student_id and student_id in self.by_id:
+        if student_id and self.store.get_by_id(student_id):
             return False, "Student ID already registered."
         u = User(name, email=email, student_id=student_id)
         if password:
             u.password_hash = self._hash(password)
-        self.users.append(u)
-        if email:
-            self.by_email[email] = u
-        if student_id:
-            self.by_id[student_id] = u
+        self.store.add_many([u])
         return True, f"Registered {name}."
 
+    def import_users(self, rows, iterations=None, batch_size=1000):
+        """
+        Bulk-register users from an iterable of dicts (see iter_user_rows).
+        Rows are validated in a single pass against the store and the rows
+        already accepted; bad rows are reported, not raised. Accepted users
+        are hashed a batch at a time on the auth thread pool and written to
+        the store in one add_many() call per batch.
+        `iterations` may lower the KDF cost for the import; such hashes are
+        upgraded on each user's first login.
+        """
+        report = ImportReport()
+        start = time.perf_counter()
+        cost = iterations or self.iterations
+        batch, to_hash = [], []
+        pending_emails, pending_ids = set(), set()
+        for row_no, row in enumerate(rows, start=1):
+            err = self._validate_import_row(row, pending_emails, pending_ids)
+            if err:
+                report.errors.append((row_no, err))
+                continue
+            email = _text(row.get("email")) or None
+            sid = _text(row.get("student_id")) or None
+            u = User(_text(row["name"]), email=email, student_id=sid)
+            u.password_hash = row.get("password_hash") or None
+            if email:
+                pending_emails.add(norm_email(email))
+            if sid:
+                pending_ids.add(sid)
+            batch.append(u)
+            if row.get("password") and not u.password_hash:
+                to_hash.append((u, str(row["password"])))
+            if len(batch) >= batch_size:
+                self._flush_import(batch, to_hash, cost)
+                report.imported += len(batch)
+                batch, to_hash = [], []
+                pending_emails.clear()
+                pending_ids.clear()
+        self._flush_import(batch, to_hash, cost)
+        report.imported += len(batch)
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def _validate_import_row(self, row, pending_emails, pending_ids):
+        if row is None:
+            return "Malformed row."
+        if not _text(row.get("name")):
+            return "Missing name."
+        stored = row.get("password_hash")
+        if stored and not is_password_hash(stored):
+            return "Malformed password hash."
+        email = _text(row.get("email"))
+        sid = _text(row.get("student_id"))
+        if not email and not sid:
+            return "Missing email and student ID."
+        if email and (norm_email(email) in pending_emails
+                      or self.store.get_by_email(norm_email(email))):
+            return f"Email already registered: {email}"
+        if sid and (sid in pending_ids or self.store.get_by_id(sid)):
+            return f"Student ID already registered: {sid}"
+        return None
+
+    def _flush_import(self, batch, to_hash, iterations):
+        if not batch:
+            return
+        if to_hash:
+            hashes = self._pool().map(lambda pair: hash_password(pair[1], iterations), to_hash)
+            for (u, _), h in zip(to_hash, hashes):
+                u.password_hash = h
+        self.store.add_many(batch)
+
+    def find_by_name(self, name):
+        return self.store.find_by_name(norm_name(name))
+
+    def user_by_uid(self, uid):
+        return self.store.get_by_uid(uid)
+
     def login(self, identifier, password=None):
-        # identifier can be email or student_id
-        u = self.by_email.get(identifier) or self.by_id.get(identifier)
+        # identifier can be email (any case) or student_id
+        identifier = (identifier or "").strip()
+        u = self._lookup(identifier) if identifier else None
         if not u:
             return None
         if password is not None:
             if not u.password_hash:
                 return None
-            if u.password_hash != self._hash(password):
+            if not self._check(u, password):
                 return None
         return u
 
+    def login_async(self, identifier, password=None):
+        """Run login (and its KDF work) on a worker thread so the UI stays responsive."""
+        return self._pool().submit(self.login, identifier, password)
+
+    # VERIFIED-SESSION TOKENS
+    def issue_token(self, user):
+        token = secrets.token_urlsafe(24)
+        self._tokens[token] = (user, time.monotonic() + self.token_ttl)
+        return token
+
+    def user_for_token(self, token, refresh=False):
+        """User for a live token, or None; refresh=True restarts its TTL (sliding expiry)."""
+        entry = self._tokens.get(token)
+        if not entry:
+            self.token_misses += 1
+            return None
+        user, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._tokens[token]
+            self.token_misses += 1
+            return None
+        if refresh:
+            self._tokens[token] = (user, time.monotonic() + self.token_ttl)
+        self.token_hits += 1
+        return user
+
+    def revoke_token(self, token):
+        return self._tokens.pop(token, None) is not None
+
+    def _revoke_user_tokens(self, user):
+        for tok in [t for t, (u, _) in self._tokens.items() if u is user]:
+            del self._tokens[tok]
+
+    # BORROW HISTORY
+    def record_history(self, user, request):
+        self.store.append_history(user, request)
+
+    def clear_history(self, user):
+        self.store.clear_history(user)
+
     def change_username(self, user, new_name):
         if not user or not new_name.strip():
             return False, "Invalid username."
         user.name = new_name.strip()
+        self.store.update(user)
         return True, "Username updated."
 
     def change_password(self, user, old_pwd, new_pwd):
@@ -65,9 +332,11 @@ class AuthSystem:
             return False, "No user."
         if not user.password_hash:
             return False, "Password not set. Please set a password via Sign up."
-        if user.password_hash != self._hash(old_pwd or ""):
+        if not self._check(user, old_pwd or ""):
             return False, "Old password incorrect."
         if not new_pwd or len(new_pwd) < 4:
             return False, "New password must be at least 4 characters."
         user.password_hash = self._hash(new_pwd)
+        self.store.update(user)
+        self._revoke_user_tokens(user)
         return True, "Password changed."
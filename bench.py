@@ -0,0 +1,775 @@
+# bench.py
+"""
+Headless micro-benchmarks (no Tk).
+
+    python bench.py login [--costs 10000 50000 100000 200000]
+    python bench.py import [--users 20000] [--format csv|jsonl]
+    python bench.py controller [--items 5000] [--users 1000] [--json out.json]
+                               [--baseline base.json] [--save-baseline base.json]
+    python bench.py analytics [--loans 1000000]
+    python bench.py shared-stock [--procs 4] [--ops 2000]
+    python bench.py reservations [--count 100000]
+    python bench.py keystrokes [--items 50000]
+    python bench.py startup [--runs 5]      # imports gui, but opens no window
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from auth import AuthSystem, hash_password, iter_user_rows
+
+
+def _rate(fn, duration=1.0):
+    """Call fn repeatedly for ~duration seconds, return calls/sec."""
+    n = 0
+    start = time.perf_counter()
+    end = start + duration
+    while True:
+        fn()
+        n += 1
+        now = time.perf_counter()
+        if now >= end:
+            return n / (now - start)
+
+
+# LOGIN
+def bench_login(costs, duration=1.0):
+    results = []
+    for cost in costs:
+        auth = AuthSystem(iterations=cost)
+        auth.register("Bench", student_id="bench-0001", password="secret")
+        user = auth.login("bench-0001", "secret")
+        token = auth.issue_token(user)
+        results.append({
+            "iterations": cost,
+            "logins_per_sec": _rate(lambda: auth.login("bench-0001", "secret"), duration),
+            "token_checks_per_sec": _rate(lambda: auth.user_for_token(token), duration),
+        })
+    return results
+
+
+# BULK IMPORT
+# password_hash values an import must refuse
+_BAD_HASHES = ["not-a-hash", "ab" * 31, "pbkdf2_sha256$many$00ff$" + "00" * 32,
+               "pbkdf2_sha256$1000$zz$" + "00" * 32, "pbkdf2_sha256$1000$00ff$",
+               "md5$1000$00ff$" + "00" * 32]
+
+
+def _write_user_file(path, n, fmt, dup_every=0, bad_every=0):
+    """Write n user rows; returns how many of them the importer should reject."""
+    fields = ["name", "email", "student_id", "password", "password_hash"]
+    expected_errors = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        for i in range(n):
+            dup = bool(dup_every and i and i % dup_every == 0)
+            bad = bool(bad_every and i % bad_every == bad_every // 2)
+            k = i - 1 if dup else i
+            row = {"name": f"Student {i}", "email": f"Student.{k}@CvSU.edu.ph",
+                   "student_id": f"2026-{i:05d}", "password": f"pw{i}"}
+            if bad:
+                row["password_hash"] = _BAD_HASHES[(i // bad_every) % len(_BAD_HASHES)]
+            expected_errors += dup or bad
+            if writer:
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(row) + "\n")
+    return expected_errors
+
+
+def bench_import(n_users, fmt="csv", iterations=1000, dup_every=100, bad_every=250):
+    fd, path = tempfile.mkstemp(suffix="." + fmt)
+    os.close(fd)
+    try:
+        expected = _write_user_file(path, n_users, fmt, dup_every, bad_every)
+        auth = AuthSystem()
+        report = auth.import_users(iter_user_rows(path), iterations=iterations)
+    finally:
+        os.remove(path)
+    return [{
+        "format": fmt,
+        "rows": n_users,
+        "imported": report.imported,
+        "errors": len(report.errors),
+        "seconds": report.elapsed,
+        "rows_per_sec": report.rows_per_sec,
+        "rejects_ok": "yes" if len(report.errors) == expected else "no",
+    }]
+
+
+# CONTROLLER HOT PATHS
+_WORDS = ["Digital", "Analog", "AC", "DC", "Bench", "Precision", "Power", "Signal",
+          "Multimeter", "Oscilloscope", "Supply", "Resistor", "Capacitor", "Inductor",
+          "Breadboard", "Probe", "Clip", "Switch", "Relay", "Diode"]
+_CATEGORIES = ["Equipment", "Components", "Accessories"]
+_STOCK = 10 ** 9        # per item: the bench never runs out
+
+
+def synthetic_catalog(n_items, seed=0):
+    rng = random.Random(seed)
+    items = [f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} {i:05d}" for i in range(n_items)]
+    categories = {cat: items[k::len(_CATEGORIES)] for k, cat in enumerate(_CATEGORIES)}
+    tree_root = {"name": "root", "children": list(categories.keys())}
+    return tree_root, categories, items
+
+
+def build_controller(n_items, n_users, history_len=50, seed=0):
+    """
+    Headless controller with a synthetic catalog and n_users accounts.
+    Returns (controller, tmp): its settings and loans files live in the
+    TemporaryDirectory tmp, which the caller cleans up.
+    """
+    from app_controller import CircuitLendController
+    from user_store import MemoryUserStore
+
+    tmp = tempfile.TemporaryDirectory()
+    c = CircuitLendController(user_store=MemoryUserStore(),
+                              catalog=synthetic_catalog(n_items, seed),
+                              settings_file=os.path.join(tmp.name, "settings.json"))
+    shared_hash = hash_password("pw", iterations=1000)
+    c.auth.import_users({"name": f"Student {i}", "student_id": f"2026-{i:05d}",
+                         "password_hash": shared_hash} for i in range(n_users))
+    # stock and calendar capacity both come from the record, so no step fails on either
+    for rec in c.item_records():
+        rec["stock"] = c.availability[rec["id"]] = _STOCK
+    c.admission = None      # hot-path timings, not rate limits (see bench_admission)
+    _ok(c.login("2026-00000"))
+    rng = random.Random(seed)
+    for _ in range(history_len):
+        _ok(c.add_to_cart(rng.choice(c.all_items)))
+        _ok(c.submit_borrow())
+    return c, tmp
+
+
+def _ok(result):
+    """A timed step that fails fast would time the failure path; stop the bench instead."""
+    if not result[0]:
+        raise RuntimeError(f"bench step failed: {result[1]}")
+    return result
+
+
+def _timings(fn, iterations):
+    samples = []
+    for i in range(iterations):
+        t = time.perf_counter_ns()
+        fn(i)
+        samples.append(time.perf_counter_ns() - t)
+    samples.sort()
+    mean = sum(samples) / len(samples)
+    return {
+        "calls": len(samples),
+        "mean_us": mean / 1000,
+        "p50_us": samples[len(samples) // 2] / 1000,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1000,
+        "ops_per_sec": 1e9 / mean if mean else 0.0,
+    }
+
+
+def _typo(rng, word):
+    """word with one random deletion, swap or substitution"""
+    i = rng.randrange(len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+
+def bench_controller(n_items=5000, n_users=1000, iterations=500, cart_size=5, seed=0):
+    c, tmp = build_controller(n_items, n_users, seed=seed)
+    rng = random.Random(seed)
+    items = c.all_items
+    queries = [rng.choice(_WORDS).lower()[:rng.randint(2, 6)] for _ in range(64)]
+    typos = [_typo(rng, rng.choice(_WORDS)) for _ in range(64)]
+    picks = [rng.choice(items) for _ in range(256)]
+    results = {}
+    try:
+        results["search_items"] = _timings(lambda i: c.search_items(queries[i % 64]), iterations)
+        c.search_items("", fuzzy=True)   # index build is not part of the per-query cost
+        results["search_items[fuzzy]"] = _timings(
+            lambda i: c.search_items(typos[i % 64], fuzzy=True), iterations)
+        results["sort_items[name]"] = _timings(lambda i: c.sort_items("name"), max(1, iterations // 10))
+        results["sort_items[availability]"] = _timings(
+            lambda i: c.sort_items("availability"), max(1, iterations // 10))
+
+        def add_remove(i):
+            item = picks[i % 256]
+            _ok(c.add_to_cart(item))
+            _ok(c.remove_from_cart(item))
+        results["add_to_cart+remove_from_cart"] = _timings(add_remove, iterations)
+
+        def batch(i):
+            return [picks[(i + k) % 256] for k in range(cart_size)]
+
+        def submit(i):
+            for item in batch(i):
+                _ok(c.add_to_cart(item))
+            _ok(c.submit_borrow())
+        results["submit_borrow"] = _timings(submit, iterations)
+        results["return_items"] = _timings(lambda i: _ok(c.return_items(batch(i))), iterations)
+        results["undo"] = _timings(lambda i: _ok(c.undo()), iterations)
+        results["list_borrow_history"] = _timings(lambda i: c.list_borrow_history(), iterations)
+    finally:
+        tmp.cleanup()
+    return {
+        "params": {"items": n_items, "users": n_users, "iterations": iterations,
+                   "cart_size": cart_size, "python": sys.version.split()[0]},
+        "results": results,
+    }
+
+
+def compare_to_baseline(current, baseline, tolerance=0.25, min_delta_us=10.0):
+    """
+    Return [(op, baseline_us, current_us)] for ops whose mean latency regressed
+    beyond tolerance. Sub-min_delta_us differences are ignored as timer noise.
+    """
+    regressions = []
+    for op, base in baseline.get("results", {}).items():
+        cur = current["results"].get(op)
+        if (cur and cur["mean_us"] > base["mean_us"] * (1 + tolerance)
+                and cur["mean_us"] - base["mean_us"] > min_delta_us):
+            regressions.append((op, base["mean_us"], cur["mean_us"]))
+    return regressions
+
+
+# ANALYTICS
+def bench_analytics(n_loans, n_items=200, seed=0):
+    import datetime
+    import analytics
+
+    rng = random.Random(seed)
+    day0 = datetime.date(2025, 1, 1)
+    dates = [(day0 + datetime.timedelta(days=d)).isoformat() for d in range(400)]
+    reminders = []
+    for _ in range(n_loans):
+        d = rng.randrange(365)
+        reminders.append({"items": [f"Item {rng.randrange(n_items)}"],
+                          "borrow_date": dates[d], "return_date": dates[d + rng.randint(1, 14)]})
+    t = time.perf_counter()
+    cols = analytics.loans_from_reminders(reminders)
+    flatten = time.perf_counter() - t
+    t = time.perf_counter()
+    analytics.utilisation_report(cols)
+    aggregate = time.perf_counter() - t
+    return [{"loans": n_loans, "flatten_s": flatten, "aggregate_s": aggregate,
+             "loans_per_sec": n_loans / (flatten + aggregate)}]
+
+
+# SHARED STOCK (multi-process stress)
+def _stock_worker(handle, items, n_ops, seed, out):
+    """One controller process borrowing/returning against shared counters."""
+    from collections import Counter
+    from app_controller import CircuitLendController
+    from shared_stock import SharedAvailability
+    from user_store import MemoryUserStore
+
+    shared = SharedAvailability.attach(handle)
+    tmp = tempfile.TemporaryDirectory()
+    c = CircuitLendController(user_store=MemoryUserStore(),
+                              settings_file=os.path.join(tmp.name, "settings.json"),
+                              catalog=({"name": "root", "children": ["Lab"]}, {"Lab": items}, items),
+                              availability=shared)
+    c.admission = None
+    c.auth.import_users([{"name": f"Worker {seed}", "student_id": f"w-{seed}",
+                          "password_hash": hash_password("pw", iterations=1000)}])
+    c.login(f"w-{seed}")
+    rng = random.Random(seed)
+    held, loans, borrowed, rejected = Counter(), [], 0, 0
+    for _ in range(n_ops):
+        if loans and rng.random() < 0.4:
+            batch = loans.pop(rng.randrange(len(loans)))
+            c.return_items(batch)
+            held.subtract(batch)
+            continue
+        for _ in range(rng.randint(1, 3)):
+            c.cart.add(rng.choice(items))
+        batch = c.cart.items()
+        ok, _ = c.submit_borrow()
+        if ok:
+            loans.append(batch)
+            held.update(batch)
+            borrowed += 1
+        else:
+            c.cart = type(c.cart)()
+            rejected += 1
+    shared.close()
+    tmp.cleanup()
+    out.put((dict(held), borrowed, rejected))
+
+
+def bench_shared_stock(n_procs=4, n_ops=2000, n_items=8, stock=20):
+    """
+    n_procs controllers hammer a few scarce items through one SharedAvailability.
+    Afterwards every counter must equal stock minus what the workers still hold,
+    and none may have gone negative (no oversell, no lost updates).
+    """
+    import multiprocessing
+    from shared_stock import SharedAvailability
+
+    items = [f"Scarce part {i}" for i in range(n_items)]
+    shared = SharedAvailability.create(items, {it: stock for it in items})
+    out = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_stock_worker,
+                                     args=(shared.handle(), items, n_ops, seed, out))
+             for seed in range(n_procs)]
+    t = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - t
+    held = {it: sum(r[0].get(it, 0) for r in results) for it in items}
+    bad = [it for it in items if shared[it] != stock - held[it] or shared[it] < 0]
+    final = dict(shared)
+    shared.close()
+    return [{"procs": n_procs, "borrows": sum(r[1] for r in results),
+             "rejected": sum(r[2] for r in results),
+             "ops_per_sec": n_procs * n_ops / elapsed,
+             "consistent": "yes" if not bad else f"NO {bad[:3]}"}], final
+
+
+# SEARCH-AS-YOU-TYPE
+def bench_keystrokes(n_items=50_000, n_words=40, seed=0):
+    """
+    Type n_words queries one character at a time (with an occasional
+    backspace) and time each keystroke: a full search_items per keystroke
+    versus a SearchSession.
+    """
+    c, tmp = build_controller(n_items, 1, history_len=0, seed=seed)
+    rng = random.Random(seed)
+    keystrokes = []
+    for _ in range(n_words):
+        word = f"{rng.choice(_WORDS).lower()} {rng.choice(_WORDS).lower()[:3]}"
+        for k in range(1, len(word) + 1):
+            keystrokes.append(word[:k])
+            if rng.random() < 0.1 and k > 1:
+                keystrokes.append(word[:k - 1])   # backspace
+                keystrokes.append(word[:k])
+    rows = []
+    try:
+        for label, make in (("full search", lambda: c.search_items),
+                            ("session", lambda: c.search_session().update)):
+            search = make()
+            samples = []
+            for q in keystrokes:
+                t = time.perf_counter_ns()
+                search(q)
+                samples.append(time.perf_counter_ns() - t)
+            samples.sort()
+            rows.append({"mode": label, "keystrokes": len(samples),
+                         "mean_us": sum(samples) / len(samples) / 1000,
+                         "p50_us": samples[len(samples) // 2] / 1000,
+                         "p99_us": samples[int(len(samples) * 0.99)] / 1000})
+    finally:
+        tmp.cleanup()
+    return rows
+
+
+# ADMISSION CONTROL
+def bench_admission(n_users=40, n_abusers=4, duration=2.0, seed=0):
+    """
+    Server-style run: one controller behind a lock, n_abusers threads
+    spamming dated submit/undo while n_users well-behaved students each
+    borrow once. Reports the students' submit latency (lock wait included)
+    with admission control off and on.
+    """
+    import threading
+    from ratelimit import AdmissionController
+
+    rows = []
+    for label, admission in (("no limits", None), ("admission", AdmissionController())):
+        c, tmp = build_controller(200, n_users + n_abusers, history_len=0, seed=seed)
+        c.admission = admission
+        lock = threading.Lock()
+        stop = threading.Event()
+        tokens = []
+        for i in range(n_users + n_abusers):
+            c.login(f"2026-{i:05d}")
+            tokens.append(c.session_token)
+        rng = random.Random(seed)
+
+        def abuser(token):
+            while not stop.is_set():
+                with lock:
+                    c.resume_session(token)
+                    c.add_to_cart(rng.choice(c.all_items))
+                    ok, _ = c.submit_borrow(borrow_date="2026-01-12", return_date="2026-01-20")
+                    if not ok:
+                        c.cart = type(c.cart)()
+                    c.undo()
+                time.sleep(0.002)      # ~hundreds of clicks a second, not a tight loop
+
+        samples = []
+
+        def student(token, delay):
+            time.sleep(delay)
+            t = time.perf_counter()
+            with lock:
+                c.resume_session(token)
+                c.add_to_cart(rng.choice(c.all_items))
+                c.submit_borrow()
+            samples.append(time.perf_counter() - t)
+
+        threads = [threading.Thread(target=abuser, args=(tok,)) for tok in tokens[n_users:]]
+        threads += [threading.Thread(target=student, args=(tok, duration * i / n_users))
+                    for i, tok in enumerate(tokens[:n_users])]
+        try:
+            for th in threads:
+                th.start()
+            for th in threads[n_abusers:]:
+                th.join()
+            stop.set()
+            for th in threads[:n_abusers]:
+                th.join()
+        finally:
+            tmp.cleanup()
+        samples.sort()
+        refused = sum(admission.rejected.values()) + sum(admission.shed.values()) if admission else 0
+        rows.append({"mode": label, "students": len(samples),
+                     "p50_ms": samples[len(samples) // 2] * 1000,
+                     "p99_ms": samples[int(len(samples) * 0.99)] * 1000,
+                     "refused": refused})
+    return rows
+
+
+# REQUEST CODEC
+def bench_codec(n_requests=50_000, n_items=5000, n_users=1000, seed=0):
+    """
+    make_request dicts through json.dumps/loads versus codec.RequestCodec,
+    one record at a time, as one framed stream (encode_many/decode_many)
+    and through RequestView. Every decoded record must equal its source;
+    main() exits non-zero when one does not.
+    """
+    from codec import RequestCodec, RequestView, StringTable
+    from requests import make_request
+
+    rng = random.Random(seed)
+    items = synthetic_catalog(n_items, seed)[2]
+    users = [type("U", (), {"name": f"Student {i}", "student_id": f"2026-{i:05d}"})()
+             for i in range(n_users)]
+    reqs = [make_request(rng.choice(users), rng.sample(items, rng.randint(1, 5)),
+                         reason=rng.choice(("normal", "normal", "urgent", "low")))
+            for _ in range(n_requests)]
+
+    def run(label, encode, decode):
+        t = time.perf_counter()
+        blobs = [encode(r) for r in reqs]
+        enc_s = time.perf_counter() - t
+        t = time.perf_counter()
+        back = [decode(b) for b in blobs]
+        dec_s = time.perf_counter() - t
+        return {"format": label, "bytes_per_req": sum(map(len, blobs)) / n_requests,
+                "encode_k_per_s": n_requests / enc_s / 1000,
+                "decode_k_per_s": n_requests / dec_s / 1000,
+                "lossless": "yes" if back == reqs else "NO"}
+
+    def run_many(label, enc, dec):
+        t = time.perf_counter()
+        blob = enc.encode_many(reqs)
+        enc_s = time.perf_counter() - t
+        t = time.perf_counter()
+        back = dec.decode_many(blob)
+        dec_s = time.perf_counter() - t
+        return {"format": label, "bytes_per_req": len(blob) / n_requests,
+                "encode_k_per_s": n_requests / enc_s / 1000,
+                "decode_k_per_s": n_requests / dec_s / 1000,
+                "lossless": "yes" if back == reqs else "NO"}
+
+    catalog = RequestCodec(StringTable(items))
+    stream_enc, stream_dec = RequestCodec(learn=True), RequestCodec(learn=True)
+    return [
+        run("json", lambda r: json.dumps(r).encode("utf-8"), json.loads),
+        run("codec, catalog table", catalog.encode, catalog.decode),
+        run("codec, learned stream", stream_enc.encode, stream_dec.decode),
+        run_many("codec, framed stream", RequestCodec(learn=True), RequestCodec(learn=True)),
+        run("codec, RequestView", catalog.encode, lambda b: RequestView(b, catalog).to_dict()),
+    ]
+
+
+# REPLICATION (primary + follower processes)
+def _follower_worker(kind, where, authkey, target, out):
+    """Follower process: apply the journal until seq target, report replicated state."""
+    from app_controller import CircuitLendController
+    from replication import FileTail, Follower, SocketTail
+    from user_store import MemoryUserStore
+
+    tmp = tempfile.TemporaryDirectory()
+    c = CircuitLendController(user_store=MemoryUserStore(),
+                              settings_file=os.path.join(tmp.name, "settings.json"))
+    f = Follower(c, FileTail(where) if kind == "file" else SocketTail(where, authkey))
+    t = time.perf_counter()
+    goal = None
+    while goal is None or f.seq < goal:
+        if goal is None and not target.empty():
+            goal = target.get()
+        if not f.pump(timeout=0.05) and kind == "file":
+            time.sleep(0.01)
+    elapsed = time.perf_counter() - t
+    out.put((kind, f.seq, elapsed,
+             {it: (c.availability_of(it), c.on_loan(it)) for it in c.all_items}))
+    tmp.cleanup()
+
+
+def bench_replication(n_ops=2000, seed=0):
+    """
+    A primary controller runs n_ops random borrows/returns/undos while one
+    file-tailing and one socket follower process apply its journal; both
+    must end with the primary's stock and on-loan counts.
+    """
+    import multiprocessing
+    from app_controller import CircuitLendController
+    from replication import Journal, JournalServer, Primary
+    from user_store import MemoryUserStore
+
+    tmp = tempfile.TemporaryDirectory()
+    c = CircuitLendController(user_store=MemoryUserStore(),
+                              settings_file=os.path.join(tmp.name, "settings.json"))
+    c.admission = None
+    journal = Journal(os.path.join(tmp.name, "journal.jsonl"))
+    Primary(c, journal)
+    authkey = os.urandom(16)
+    server = JournalServer(journal, authkey)
+    out = multiprocessing.Queue()
+    targets = {"file": multiprocessing.Queue(), "socket": multiprocessing.Queue()}
+    procs = [multiprocessing.Process(target=_follower_worker,
+                                     args=("file", journal.path, authkey, targets["file"], out)),
+             multiprocessing.Process(target=_follower_worker,
+                                     args=("socket", server.address, authkey, targets["socket"], out))]
+    for p in procs:
+        p.start()
+
+    rng = random.Random(seed)
+    c.login("2026-00001", "test123")
+    items = c.all_items
+    t = time.perf_counter()
+    for _ in range(n_ops):
+        r = rng.random()
+        if r < 0.5:
+            c.add_to_cart(rng.choice(items))
+            if not c.submit_borrow()[0]:
+                c.cart = type(c.cart)()
+        elif r < 0.85:
+            held = c.my_loans()
+            if held:
+                c.return_items([rng.choice(list(held.elements()))])
+        else:
+            c.undo()
+    primary_s = time.perf_counter() - t
+    for q in targets.values():
+        q.put(journal.seq)
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    server.close()
+    journal.close()
+    tmp.cleanup()
+    expected = {it: (c.availability_of(it), c.on_loan(it)) for it in items}
+    return [{"follower": kind, "entries": seq, "primary_ops_per_s": n_ops / primary_s,
+             "follower_s": elapsed,
+             "consistent": "yes" if state == expected else "NO"}
+            for kind, seq, elapsed, state in results]
+
+
+# RESERVATIONS
+def bench_reservations(n_bookings=100_000, n_items=50, capacity=40, seed=0):
+    """Book n_bookings random day ranges over a year, then time max-concurrent queries."""
+    from reservations import ReservationCalendar, day_number
+
+    rng = random.Random(seed)
+    cal = ReservationCalendar(lambda item: capacity)
+    day0 = day_number("2026-01-01")
+    items = [f"Item {i}" for i in range(n_items)]
+    ranges = []
+    for _ in range(n_bookings):
+        start = day0 + rng.randrange(365)
+        ranges.append((rng.choice(items), start, start + rng.randint(0, 14)))
+
+    t = time.perf_counter()
+    accepted = 0
+    for item, start, end in ranges:
+        accepted += cal.book([item], start, end)[0]
+    book_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for item, start, end in ranges:
+        cal.reserved(item, start, end + 30)
+    query_s = time.perf_counter() - t
+    nodes = sum(len(tree) for tree in cal._trees.values())
+    return [{"bookings": n_bookings, "accepted": accepted,
+             "book_us": book_s / n_bookings * 1e6, "query_us": query_s / n_bookings * 1e6,
+             "tree_nodes": nodes}]
+
+
+# STARTUP (fresh interpreter per launch)
+_STARTUP_CHILD = """
+import json, os, sys, time
+t0 = time.perf_counter()
+import app_controller, gui
+t1 = time.perf_counter()
+from user_store import SQLiteUserStore
+folder = sys.argv[1]
+app_controller.CircuitLendController(
+    user_store=SQLiteUserStore(os.path.join(folder, "circuitcart.db")),
+    settings_file=os.path.join(folder, "user_settings.json"))
+print(json.dumps([t1 - t0, time.perf_counter() - t1]))
+"""
+
+
+def bench_startup(runs=5):
+    """
+    Time what main.py does before the first frame, each launch in a new
+    interpreter: importing app_controller and gui, then constructing the
+    controller. A first run (empty data folder, so the demo accounts are
+    seeded with the KDF) and a restart are reported separately, as medians
+    against main.STARTUP_BUDGET_MS.
+    """
+    import subprocess
+    from main import STARTUP_BUDGET_MS
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = {"first run": [], "restart": []}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as folder:
+            for launch in samples:
+                out = subprocess.run([sys.executable, "-c", _STARTUP_CHILD, folder], cwd=here,
+                                     capture_output=True, text=True, check=True).stdout
+                samples[launch].append(json.loads(out.splitlines()[-1]))
+    rows = []
+    for launch, timings in samples.items():
+        imports = sorted(t[0] for t in timings)[len(timings) // 2] * 1000
+        init = sorted(t[1] for t in timings)[len(timings) // 2] * 1000
+        total = sorted(sum(t) for t in timings)[len(timings) // 2] * 1000
+        rows.append({"launch": launch, "runs": len(timings), "import_ms": imports,
+                     "init_ms": init, "total_ms": total,
+                     "within_budget": "yes" if total <= STARTUP_BUDGET_MS else "no"})
+    return rows
+
+
+def _print_rows(rows):
+    if not rows:
+        return
+    keys = list(rows[0].keys())
+    width = max(22, *(len(str(row[keys[0]])) for row in rows))
+    print("  ".join(f"{k:>{width if i == 0 else 14}}" for i, k in enumerate(keys)))
+    for row in rows:
+        print("  ".join(
+            (f"{row[k]:>{width if i == 0 else 14},.1f}" if isinstance(row[k], float)
+             else f"{row[k]:>{width if i == 0 else 14}}")
+            for i, k in enumerate(keys)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CircuitCart headless benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_login = sub.add_parser("login", help="logins/sec at several KDF cost settings")
+    p_login.add_argument("--costs", type=int, nargs="+",
+                         default=[10_000, 50_000, 100_000, 200_000])
+    p_login.add_argument("--duration", type=float, default=1.0)
+
+    p_import = sub.add_parser("import", help="bulk user import throughput")
+    p_import.add_argument("--users", type=int, default=20_000)
+    p_import.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    p_import.add_argument("--iterations", type=int, default=1000,
+                          help="KDF cost used for imported passwords")
+
+    p_ctl = sub.add_parser("controller", help="CircuitLendController hot paths")
+    p_ctl.add_argument("--items", type=int, default=5000)
+    p_ctl.add_argument("--users", type=int, default=1000)
+    p_ctl.add_argument("--iterations", type=int, default=500)
+    p_ctl.add_argument("--json", help="write machine-readable results to this file")
+    p_ctl.add_argument("--baseline", help="compare against a stored results file")
+    p_ctl.add_argument("--save-baseline", help="store these results as the new baseline")
+    p_ctl.add_argument("--tolerance", type=float, default=0.25,
+                       help="allowed mean-latency slowdown vs baseline (0.25 = 25%%)")
+
+    p_an = sub.add_parser("analytics", help="vectorised utilisation report throughput")
+    p_an.add_argument("--loans", type=int, default=1_000_000)
+
+    p_sh = sub.add_parser("shared-stock", help="multi-process borrow/return on shared counters")
+    p_sh.add_argument("--procs", type=int, default=4)
+    p_sh.add_argument("--ops", type=int, default=2000)
+
+    p_key = sub.add_parser("keystrokes", help="per-keystroke search latency, full vs incremental")
+    p_key.add_argument("--items", type=int, default=50_000)
+
+    p_res = sub.add_parser("reservations", help="reservation calendar book/query latency")
+    p_res.add_argument("--count", type=int, default=100_000)
+
+    p_adm = sub.add_parser("admission", help="student latency while others spam submit/undo")
+    p_adm.add_argument("--users", type=int, default=40)
+    p_adm.add_argument("--abusers", type=int, default=4)
+
+    p_codec = sub.add_parser("codec", help="request encode/decode, JSON vs binary codec")
+    p_codec.add_argument("--count", type=int, default=50_000)
+
+    p_rep = sub.add_parser("replication", help="journal shipping to follower processes")
+    p_rep.add_argument("--ops", type=int, default=2000)
+
+    p_start = sub.add_parser("startup", help="import + first controller init vs the startup budget")
+    p_start.add_argument("--runs", type=int, default=5)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "login":
+        _print_rows(bench_login(args.costs, args.duration))
+    elif args.cmd == "import":
+        rows = bench_import(args.users, args.format, args.iterations)
+        _print_rows(rows)
+        if any(r["rejects_ok"] != "yes" for r in rows):
+            return 1
+    elif args.cmd == "analytics":
+        _print_rows(bench_analytics(args.loans))
+    elif args.cmd == "keystrokes":
+        _print_rows(bench_keystrokes(args.items))
+    elif args.cmd == "reservations":
+        _print_rows(bench_reservations(args.count))
+    elif args.cmd == "replication":
+        rows = bench_replication(args.ops)
+        _print_rows(rows)
+        if any(r["consistent"] != "yes" for r in rows):
+            return 1
+    elif args.cmd == "codec":
+        rows = bench_codec(args.count)
+        _print_rows(rows)
+        if any(r["lossless"] != "yes" for r in rows):
+            return 1
+    elif args.cmd == "startup":
+        rows = bench_startup(args.runs)
+        _print_rows(rows)
+        if any(r["within_budget"] != "yes" for r in rows):
+            return 1
+    elif args.cmd == "admission":
+        _print_rows(bench_admission(args.users, args.abusers))
+    elif args.cmd == "shared-stock":
+        rows, _ = bench_shared_stock(args.procs, args.ops)
+        _print_rows(rows)
+        if rows[0]["consistent"] != "yes":
+            return 1
+    elif args.cmd == "controller":
+        out = bench_controller(args.items, args.users, args.iterations)
+        _print_rows([{"op": op, **r} for op, r in out["results"].items()])
+        for path in (args.json, args.save_baseline):
+            if path:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(out, f, indent=2)
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                regressions = compare_to_baseline(out, json.load(f), args.tolerance)
+            for op, base_us, cur_us in regressions:
+                print(f"REGRESSION {op}: {base_us:.1f} us -> {cur_us:.1f} us")
+            if regressions:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,287 @@
 # catalog.py
-def build_tree_and_items():
-    demo_items = [
-        "Breadboard",
-        "DC Power Supply",
-        "AC Power Supply",
-        "Digital Multimeter",
-        "AC Ammeter",
-        "AC Voltmeter",
-        "Analog Multimeter",
-        "Resistors (10 Ω – 1 kΩ)",
-        "Potentiometer",
-        "Capacitors (0.1 µF – 100 µF)",
-        "Inductors (10 mH – 1.389 H)",
-        "Connecting Wires",
-        "Alligator Clips",
-        "Switches"
-    ]
-    categories = {
-        "Equipment": demo_items[:7],
-        "Components": demo_items[7:11],
-        "Accessories": demo_items[11:]
-    }
+import csv
+import hashlib
+import io
+import json
+import os
+from collections.abc import MutableMapping
+
+CATALOG_FILE = os.path.join(os.path.dirname(__file__), "catalog.jsonl")
+RECORD_FIELDS = ("id", "title", "category", "image", "desc", "stock")
+
+
+def _normalize_record(raw):
+    if not isinstance(raw, dict) or not raw.get("id"):
+        return None
+    rec = {k: raw.get(k) for k in RECORD_FIELDS}
+    rec["id"] = str(rec["id"]).strip()
+    rec["title"] = rec["title"] or rec["id"]
+    rec["category"] = rec["category"] or "Uncategorized"
+    rec["desc"] = rec["desc"] or ""
+    try:
+        rec["stock"] = int(rec["stock"]) if rec["stock"] not in (None, "") else None
+    except (TypeError, ValueError):
+        rec["stock"] = None
+    return rec
+
+
+class _HashingReader(io.RawIOBase):
+    """Raw file reader that feeds every byte it reads to a hashlib object."""
+
+    def __init__(self, raw, digest):
+        self._raw = raw
+        self._digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._raw.readinto(b)
+        if n:
+            self._digest.update(memoryview(b)[:n])
+        return n
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+def _open_text(path, digest=None, newline=None):
+    if digest is None:
+        return open(path, newline=newline, encoding="utf-8")
+    raw = io.BufferedReader(_HashingReader(open(path, "rb"), digest))
+    return io.TextIOWrapper(raw, encoding="utf-8", newline=newline)
+
+
+def iter_catalog_records(path, digest=None):
+    """
+    Stream item records from a .jsonl or .csv catalog, one at a time.
+    Columns: id, title, category, image, desc, stock. Bad lines are skipped.
+    `digest` (a hashlib object) is fed the raw bytes as they are read.
+    """
+    if path.lower().endswith(".csv"):
+        with _open_text(path, digest, newline="") as f:
+            for raw in csv.DictReader(f):
+                rec = _normalize_record(raw)
+                if rec:
+                    yield rec
+        return
+    with _open_text(path, digest) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = _normalize_record(json.loads(line))
+            except ValueError:
+                continue
+            if rec:
+                yield rec
+
+
+class CatalogSource:
+    """
+    File-backed catalog that parses lazily: records are pulled from the
+    stream only as far as a caller needs them (get() stops at the match,
+    iteration yields as it reads). The content hash is taken from the same
+    read, so it is known once the stream reaches the end. changed() uses
+    mtime/size first and compares hashes only when those moved; reload()
+    re-streams the file and reports which ids were added, removed or changed.
+    """
+
+    def __init__(self, path=CATALOG_FILE):
+        self.path = path
+        self.version = 0
+        self._records = {}    # id -> record
+        self._order = []      # ids in file order
+        self._stream = None
+        self._stamp = None
+        self._digest = None
+        self._hasher = None
+        self._open_stream()
+
+    def _open_stream(self):
+        self._records = {}
+        self._order = []
+        self._stamp = self._file_stamp()
+        # hashed while streaming, so opening reads nothing; lets changed() ignore bare touches
+        self._digest = None
+        self._hasher = hashlib.sha1() if self._stamp else None
+        self._stream = iter_catalog_records(self.path, self._hasher) if self._stamp else None
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _file_digest(self):
+        h = hashlib.sha1()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _pull(self):
+        if self._stream is None:
+            return None
+        rec = next(self._stream, None)
+        if rec is None:
+            self._stream = None
+            self._digest = self._hasher.hexdigest()
+            return None
+        if rec["id"] not in self._records:
+            self._order.append(rec["id"])
+        self._records[rec["id"]] = rec
+        return rec
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i < len(self._order):
+                yield self._records[self._order[i]]
+                i += 1
+            elif self._pull() is None:
+                return
+
+    def get(self, item_id):
+        rec = self._records.get(item_id)
+        while rec is None and self._stream is not None:
+            pulled = self._pull()
+            if pulled and pulled["id"] == item_id:
+                rec = pulled
+        return rec
+
+    def records(self):
+        """All records (finishes the stream)."""
+        while self._pull() is not None:
+            pass
+        return [self._records[i] for i in self._order]
+
+    # CHANGE DETECTION
+    def fingerprint(self):
+        """Content hash as an int64, the same in every process reading this file (0 if missing)."""
+        if self._digest is None and self._stream is not None:
+            self.records()
+        return int(self._digest[:15], 16) if self._digest else 0
+
+    def changed(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        if stamp is None or self._stamp is None or self._digest is None:
+            return True     # no hash yet (stream not read to the end): any move counts
+        # mtime moved (touch, copy); only a content change counts
+        same = self._file_digest() == self._digest
+        if same:
+            self._stamp = stamp
+        return not same
+
+    def reload(self):
+        """
+        Re-read the file. Returns (added, removed, changed) record lists/ids
+        against the records read so far: ids the old stream never reached
+        come back as added.
+        """
+        old = self._records
+        self._open_stream()
+        new = {r["id"]: r for r in self.records()}
+        self.version += 1
+        added = [r for i, r in new.items() if i not in old]
+        removed = [i for i in old if i not in new]
+        changed = [(old[i], r) for i, r in new.items() if i in old and old[i] != r]
+        return added, removed, changed
+
+
+def build_tree_and_items(source=None):
+    """(tree_root, categories, item ids) from a catalog source (default: catalog.jsonl)."""
+    source = source if source is not None else CatalogSource()
+    categories = {}
+    items = []
+    for rec in source:
+        items.append(rec["id"])
+        categories.setdefault(rec["category"], []).append(rec["id"])
     tree_root = {"name": "root", "children": list(categories.keys())}
-    return tree_root, categories, demo_items
+    return tree_root, categories, items
+
+def default_stock(item):
+    if "Resistors" in item or "Wires" in item:
+        return 100
+    elif "Capacitors" in item:
+        return 40
+    elif "Power Supply" in item:
+        return 15
+    return 10
+
+class StreamedAvailability(MutableMapping):
+    """
+    Availability (item -> units) over a CatalogSource (or a mapped
+    catalog_bin.MappedCatalog) that reads an item's stock the first time it
+    is looked up, so a first borrow does not wait for the whole catalog.
+    `out` ({item: units}) is what is already on loan; it is subtracted as
+    each item is read.
+    """
+
+    def __init__(self, source, out=None):
+        self._source = source
+        self._counts = {}
+        self._out = dict(out or {})
+
+    def _read(self, item):
+        rec = self._source.get(item)
+        if rec is None:
+            return None
+        stock = rec["stock"] if rec["stock"] is not None else default_stock(item)
+        n = self._counts[item] = max(0, stock - self._out.pop(item, 0))
+        return n
+
+    def loaded(self, item):
+        """True once item's stock has been read (later catalog edits must be applied to it)."""
+        return item in self._counts
+
+    def __getitem__(self, item):
+        n = self._counts.get(item)
+        if n is None:
+            n = self._read(item)
+            if n is None:
+                raise KeyError(item)
+        return n
+
+    def get(self, item, default=None):
+        n = self._counts.get(item)
+        if n is None:
+            n = self._read(item)
+        return default if n is None else n
+
+    def __contains__(self, item):
+        return item in self._counts or self._read(item) is not None
+
+    def __setitem__(self, item, value):
+        self._counts[item] = value
+        self._out.pop(item, None)
+
+    def __delitem__(self, item):
+        del self._counts[item]
+
+    def __iter__(self):
+        if hasattr(self._source, "ids"):
+            return iter(self._source.ids())
+        return (rec["id"] for rec in self._source)
+
+    def __len__(self):
+        if hasattr(self._source, "ids"):
+            return len(self._source.ids())
+        return sum(1 for _ in self._source)
+
 
-def init_availability(all_items):
+def init_availability(all_items, source=None):
+    # stock from the catalog record when given, else the old substring rules
     avail = {}
     for it in all_items:
-        if "Resistors" in it or "Wires" in it:
-            avail[it] = 100
-        elif "Capacitors" in it:
-            avail[it] = 40
-        elif "Power Supply" in it:
-            avail[it] = 15
-        else:
-            avail[it] = 10
+        rec = source.get(it) if source is not None else None
+        stock = rec.get("stock") if rec else None
+        avail[it] = stock if stock is not None else default_stock(it)
     return avail
 
 def array_search(all_items, q):
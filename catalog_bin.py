@@ -0,0 +1,345 @@
+# catalog_bin.py
+"""
+Compact read-only catalog file for sharing one copy across processes.
+
+Every process mmaps the same file read-only, so the OS page cache holds a
+single copy no matter how many kiosks/workers run. Nothing is decoded at
+open time; lookups slice the map on demand.
+
+Windows will not replace or delete a file while it is mapped, so each
+write goes to a new versioned data file (catalog.bin.<n>) and catalog.bin
+itself is a small link naming the current one. Readers keep their old
+version mapped until they reload; superseded versions are deleted once
+nothing maps them (tried again on every write).
+
+Layout (little-endian):
+    header
+    records      n x RECORD   fixed width, file order
+    categories   c x (off, len) into the string table
+    by_id        n x u32      record indexes sorted by id bytes (binary search)
+    search_pos   n x u32      start of each record's key in the search blob
+    strings      utf-8 string table (ids, titles, images, descs, categories)
+    search       lower-cased ids joined by "\\n" (substring search runs over it
+                 with mmap.find, the same semantics as catalog.array_search)
+
+    python catalog_bin.py catalog.jsonl catalog.bin
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from collections.abc import Mapping, Sequence
+
+MAGIC = b"CCAT"
+LINK = b"CCLN"      # link file: LINK + utf-8 name of the current data file beside it
+VERSION = 1
+NO_STOCK = -1
+
+# magic, version, n_records, n_categories,
+# records_off, categories_off, by_id_off, search_pos_off, strings_off, search_off, search_len
+HEADER = struct.Struct("<4sIIIQQQQQQQ")
+# id, title, image, desc as (off, len) pairs; category index; stock
+RECORD = struct.Struct("<8IIi")
+SPAN = struct.Struct("<II")
+U32 = struct.Struct("<I")
+
+
+# WRITER
+def write_binary_catalog(records, path):
+    """
+    Write records (dicts as produced by catalog.iter_catalog_records) to a
+    new data file and switch the link at path to it atomically.
+    """
+    strings = bytearray()
+    interned = {}
+
+    def put(text):
+        data = (text or "").encode("utf-8")
+        span = interned.get(data)
+        if span is None:
+            span = interned[data] = (len(strings), len(data))
+            strings.extend(data)
+        return span
+
+    categories, cat_index = [], {}
+    rows, ids, search, search_pos = [], [], bytearray(), []
+    for rec in records:
+        cat = rec.get("category") or "Uncategorized"
+        if cat not in cat_index:
+            cat_index[cat] = len(categories)
+            categories.append(put(cat))
+        id_span = put(rec["id"])
+        stock = rec.get("stock")
+        rows.append(RECORD.pack(*id_span, *put(rec.get("title") or rec["id"]),
+                                *put(rec.get("image")), *put(rec.get("desc")),
+                                cat_index[cat], NO_STOCK if stock is None else int(stock)))
+        ids.append(rec["id"].encode("utf-8"))
+        search_pos.append(len(search))
+        search.extend(rec["id"].lower().replace("\n", " ").encode("utf-8"))
+        search.extend(b"\n")
+
+    n, c = len(rows), len(categories)
+    by_id = sorted(range(n), key=ids.__getitem__)
+    records_off = HEADER.size
+    categories_off = records_off + n * RECORD.size
+    by_id_off = categories_off + c * SPAN.size
+    search_pos_off = by_id_off + n * U32.size
+    strings_off = search_pos_off + n * U32.size
+    search_off = strings_off + len(strings)
+
+    data_path = f"{path}.{time.time_ns()}"
+    with open(data_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n, c, records_off, categories_off, by_id_off,
+                            search_pos_off, strings_off, search_off, len(search)))
+        f.writelines(rows)
+        f.writelines(SPAN.pack(*span) for span in categories)
+        f.write(struct.pack(f"<{n}I", *by_id))
+        f.write(struct.pack(f"<{n}I", *search_pos))
+        f.write(strings)
+        f.write(search)
+    _write_link(path, os.path.basename(data_path))
+    _remove_stale(path, data_path)
+    return path
+
+
+def _write_link(path, name, attempts=5):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(LINK + name.encode("utf-8"))
+    for attempt in range(attempts):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            # Windows: a reader has the link open for the instant it reads it
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05)
+
+
+def _remove_stale(path, keep):
+    folder, base = os.path.split(os.path.abspath(path))
+    for name in os.listdir(folder):
+        version = name[len(base) + 1:]
+        full = os.path.join(folder, name)
+        if name.startswith(base + ".") and version.isdigit() and full != os.path.abspath(keep):
+            try:
+                os.remove(full)
+            except OSError:
+                pass    # still mapped somewhere (Windows); next write retries
+
+
+# READER
+class _IdView(Sequence):
+    """all_items-compatible view: decodes an id only when indexed."""
+
+    def __init__(self, cat):
+        self._cat = cat
+
+    def __len__(self):
+        return self._cat.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._cat.item_id(k) for k in range(*i.indices(self._cat.n))]
+        if i < 0:
+            i += self._cat.n
+        if not 0 <= i < self._cat.n:
+            raise IndexError(i)
+        return self._cat.item_id(i)
+
+    def __contains__(self, item_id):
+        return self._cat.index_of(item_id) is not None
+
+
+class _CategoryMap(Mapping):
+    """{category: [ids]} built per lookup instead of held in memory."""
+
+    def __init__(self, cat):
+        self._cat = cat
+
+    def __getitem__(self, name):
+        idx = self._cat.category_names().index(name)
+        return [self._cat.item_id(i) for i in range(self._cat.n) if self._cat._category_of(i) == idx]
+
+    def __iter__(self):
+        return iter(self._cat.category_names())
+
+    def __len__(self):
+        return self._cat.n_categories
+
+
+class MappedCatalog:
+    def __init__(self, path):
+        self.path = path
+        self.version = 0
+        self._open()
+
+    def _resolve(self):
+        """(link stamp, data file path); a file written before links is its own data."""
+        with open(self.path, "rb") as f:
+            stamp = os.fstat(f.fileno()).st_mtime_ns
+            head = f.read(len(LINK) + 4096)
+        if head.startswith(LINK):
+            name = head[len(LINK):].decode("utf-8")
+            return stamp, os.path.join(os.path.dirname(os.path.abspath(self.path)), name)
+        return stamp, self.path
+
+    def _open(self, attempts=3):
+        for attempt in range(attempts):
+            self._stamp, self.data_path = self._resolve()
+            try:
+                with open(self.data_path, "rb") as f:
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                break
+            except FileNotFoundError:
+                # a writer switched versions between reading the link and the data
+                if attempt == attempts - 1:
+                    raise
+        (magic, version, self.n, self.n_categories, self._records_off, self._categories_off,
+         self._by_id_off, search_pos_off, self._strings_off, self._search_off,
+         search_len) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a v{VERSION} CircuitCart binary catalog")
+        self._search_end = self._search_off + search_len
+        self._view = view = memoryview(self._mm)
+        self._by_id = view[self._by_id_off:self._by_id_off + 4 * self.n].cast("I")
+        self._search_pos = view[search_pos_off:search_pos_off + 4 * self.n].cast("I")
+        self._category_names = None
+        self._ids = _IdView(self)
+
+    def close(self):
+        self._by_id.release()
+        self._search_pos.release()
+        self._view.release()
+        self._mm.close()
+
+    # RAW ACCESS
+    def _str(self, off, length):
+        start = self._strings_off + off
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _row(self, i):
+        return RECORD.unpack_from(self._mm, self._records_off + i * RECORD.size)
+
+    def _category_of(self, i):
+        return self._row(i)[8]
+
+    def item_id(self, i):
+        start = self._records_off + i * RECORD.size
+        off, length = SPAN.unpack_from(self._mm, start)
+        return self._str(off, length)
+
+    def category_names(self):
+        if self._category_names is None:
+            self._category_names = [
+                self._str(*SPAN.unpack_from(self._mm, self._categories_off + k * SPAN.size))
+                for k in range(self.n_categories)]
+        return self._category_names
+
+    def index_of(self, item_id):
+        key = item_id.encode("utf-8")
+        lo, hi = 0, self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = self._by_id[mid]
+            off, length = SPAN.unpack_from(self._mm, self._records_off + i * RECORD.size)
+            start = self._strings_off + off
+            probe = self._mm[start:start + length]
+            if probe == key:
+                return i
+            if probe < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    # CATALOG API (same shape as catalog.CatalogSource)
+    def record(self, i):
+        r = self._row(i)
+        return {
+            "id": self._str(r[0], r[1]),
+            "title": self._str(r[2], r[3]),
+            "category": self.category_names()[r[8]],
+            "image": self._str(r[4], r[5]) or None,
+            "desc": self._str(r[6], r[7]),
+            "stock": None if r[9] == NO_STOCK else r[9],
+        }
+
+    def get(self, item_id):
+        i = self.index_of(item_id)
+        return None if i is None else self.record(i)
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield self.record(i)
+
+    def __len__(self):
+        return self.n
+
+    def records(self):
+        return list(self)
+
+    def ids(self):
+        return self._ids
+
+    def categories(self):
+        return _CategoryMap(self)
+
+    def search(self, q):
+        """Case-insensitive substring match over ids, straight from the map."""
+        needle = q.lower().replace("\n", " ").encode("utf-8")
+        out = []
+        pos = self._search_off
+        mm, starts = self._mm, self._search_pos
+        while True:
+            hit = mm.find(needle, pos, self._search_end)
+            if hit < 0:
+                return out
+            i = bisect.bisect_right(starts, hit - self._search_off) - 1
+            out.append(self.item_id(i))
+            if i + 1 >= self.n:
+                return out
+            pos = self._search_off + starts[i + 1]
+
+    # CHANGE DETECTION (the file is replaced atomically by write_binary_catalog)
+    def fingerprint(self):
+        """Modification stamp of the mapped file, the same in every process mapping it."""
+        return self._stamp
+
+    def changed(self):
+        try:
+            return os.stat(self.path).st_mtime_ns != self._stamp
+        except OSError:
+            return False
+
+    def reload(self):
+        old = {r["id"]: r for r in self}
+        self.close()
+        self._open()
+        new = {r["id"]: r for r in self}
+        self.version += 1
+        added = [r for i, r in new.items() if i not in old]
+        removed = [i for i in old if i not in new]
+        changed = [(old[i], r) for i, r in new.items() if i in old and old[i] != r]
+        return added, removed, changed
+
+
+def main(argv=None):
+    from catalog import iter_catalog_records
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("usage: python catalog_bin.py <catalog.jsonl|csv> <catalog.bin>")
+        return 2
+    write_binary_catalog(iter_catalog_records(argv[0]), argv[1])
+    cat = MappedCatalog(argv[1])
+    print(f"wrote {len(cat)} records to {cat.data_path} ({os.path.getsize(cat.data_path)} bytes)")
+    cat.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
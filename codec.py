@@ -0,0 +1,298 @@
+# codec.py
+"""
+Compact binary encoding of borrow requests (requests.make_request dicts).
+
+Record layout (little-endian):
+
+    B    version (1)
+    8s   request id (the 16 hex chars as 8 raw bytes)
+    B    flags: 1 id_deposit, 2 id is a literal string, 4 timestamp is a
+         literal string, 8 "user" is kept in the extra part, 16 extra
+         part present, bits 5-7 reason code (7 = literal string)
+    q    timestamp, microseconds since the Unix epoch (naive UTC)
+    then varint-tagged strings: [id] user name, student id,
+    varint item count, one string per item, [reason], [timestamp],
+    [varint length + JSON of any keys not listed above]
+
+A string is a varint tag: 0 is None, odd is a reference to entry tag>>1
+of the StringTable, even is a literal of (tag>>1) - 1 UTF-8 bytes. Item
+ids and names repeat constantly, so almost every string is a one- or
+two-byte reference. decode(encode(req)) == req for make_request dicts;
+keys beyond the standard six ride along as JSON.
+
+Tables are shared between the two ends in one of two ways:
+  learn=True    a stream: each literal is appended to the table on both
+                sides in the same order (one codec per stream, in order)
+  learn=False   the table is fixed or interns on lookup (user_store keeps
+                its table in SQLite, so index() never misses)
+"""
+import datetime
+import json
+import struct
+from collections.abc import Mapping
+
+VERSION = 1
+REASONS = ("emergency", "urgent", "normal", "low")
+_REASON_CODE = {r: i for i, r in enumerate(REASONS)}
+_REASON_LITERAL = 7
+
+F_DEPOSIT, F_ID_LITERAL, F_TS_LITERAL, F_USER_EXTRA, F_EXTRA = 1, 2, 4, 8, 16
+_KNOWN = ("id", "user", "items", "reason", "id_deposit", "timestamp")
+
+_HEAD = struct.Struct("<B8sBq")
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICRO = datetime.timedelta(microseconds=1)
+
+
+class StringTable:
+    def __init__(self, strings=()):
+        self.strings = []
+        self._index = {}
+        for s in strings:
+            self.add(s)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, i):
+        return self.strings[i]
+
+    def index(self, s):
+        return self._index.get(s)
+
+    def add(self, s):
+        i = self._index.get(s)
+        if i is None:
+            i = self._index[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+
+# VARINTS (LEB128)
+def _put_varint(buf, n):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _get_varint(data, pos):
+    b = data[pos]
+    if b < 0x80:
+        return b, pos + 1
+    n, shift = 0, 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _micros(ts):
+    """Epoch microseconds if ts is exactly what datetime.isoformat() gives, else None."""
+    if not isinstance(ts, str):
+        return None
+    try:
+        dt = datetime.datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+    if dt.tzinfo is not None or dt.isoformat() != ts:
+        return None
+    return (dt - _EPOCH) // _MICRO
+
+
+class RequestCodec:
+    def __init__(self, table=None, learn=False):
+        self.table = table if table is not None else StringTable()
+        self.learn = learn
+        self._refs = {}     # string -> encoded reference tag (table indexes never change)
+
+    # STRINGS
+    def _put_str(self, buf, s):
+        ref = self._refs.get(s)
+        if ref is not None:
+            buf += ref
+            return
+        if s is None:
+            buf.append(0)
+            return
+        i = self.table.index(s)
+        if i is not None:
+            ref = bytearray()
+            _put_varint(ref, (i << 1) | 1)
+            self._refs[s] = bytes(ref)
+            buf += ref
+            return
+        raw = s.encode("utf-8")
+        _put_varint(buf, (len(raw) + 1) << 1)
+        buf += raw
+        if self.learn:
+            self.table.add(s)
+
+    def _get_str(self, data, pos):
+        tag, pos = _get_varint(data, pos)
+        if tag & 1:
+            return self.table[tag >> 1], pos
+        if not tag:
+            return None, pos
+        end = pos + (tag >> 1) - 1
+        s = bytes(data[pos:end]).decode("utf-8")
+        if self.learn:
+            self.table.add(s)
+        return s, end
+
+    # RECORDS
+    def encode(self, req):
+        extra = {k: v for k, v in req.items() if k not in _KNOWN}
+        flags = F_DEPOSIT if req.get("id_deposit") else 0
+
+        rid = req.get("id")
+        try:
+            raw_id = bytes.fromhex(rid) if len(rid) == 16 else None
+        except (TypeError, ValueError):
+            raw_id = None
+        if raw_id is None or raw_id.hex() != rid:
+            raw_id = b"\0" * 8
+            flags |= F_ID_LITERAL
+
+        ts = req.get("timestamp")
+        micros = _micros(ts)
+        if micros is None:
+            micros = 0
+            flags |= F_TS_LITERAL
+
+        user = req.get("user")
+        if not (isinstance(user, dict) and len(user) == 2 and "name" in user and "student_id" in user):
+            extra["user"] = user
+            flags |= F_USER_EXTRA
+        reason = req.get("reason")
+        code = _REASON_CODE.get(reason, _REASON_LITERAL)
+        flags |= code << 5
+        if extra:
+            flags |= F_EXTRA
+
+        buf = bytearray(_HEAD.pack(VERSION, raw_id, flags, micros))
+        if flags & F_ID_LITERAL:
+            self._put_str(buf, rid)
+        if not flags & F_USER_EXTRA:
+            self._put_str(buf, user["name"])
+            self._put_str(buf, user["student_id"])
+        items = req.get("items") or ()
+        _put_varint(buf, len(items))
+        refs = self._refs
+        for item in items:
+            ref = refs.get(item)
+            if ref is None:
+                self._put_str(buf, item)
+            else:
+                buf += ref
+        if code == _REASON_LITERAL:
+            self._put_str(buf, reason)
+        if flags & F_TS_LITERAL:
+            self._put_str(buf, ts)
+        if extra:
+            raw = json.dumps(extra, ensure_ascii=False).encode("utf-8")
+            _put_varint(buf, len(raw))
+            buf += raw
+        return bytes(buf)
+
+    def decode(self, data, pos=0):
+        version, raw_id, flags, micros = _HEAD.unpack_from(data, pos)
+        if version != VERSION:
+            raise ValueError(f"unknown request record version {version}")
+        pos += _HEAD.size
+        get = self._get_str
+        if flags & F_ID_LITERAL:
+            rid, pos = get(data, pos)
+        else:
+            rid = raw_id.hex()
+        user = None
+        if not flags & F_USER_EXTRA:
+            name, pos = get(data, pos)
+            sid, pos = get(data, pos)
+            user = {"name": name, "student_id": sid}
+        n, pos = _get_varint(data, pos)
+        items = []
+        table = self.table
+        for _ in range(n):
+            b = data[pos]
+            if b < 0x80 and b & 1:      # one-byte reference, the common case
+                items.append(table[b >> 1])
+                pos += 1
+            else:
+                item, pos = get(data, pos)
+                items.append(item)
+        code = flags >> 5
+        if code == _REASON_LITERAL:
+            reason, pos = get(data, pos)
+        else:
+            reason = REASONS[code]
+        if flags & F_TS_LITERAL:
+            ts, pos = get(data, pos)
+        else:
+            ts = (_EPOCH + micros * _MICRO).isoformat()
+        req = {"id": rid, "user": user, "items": items, "reason": reason,
+               "id_deposit": bool(flags & F_DEPOSIT), "timestamp": ts}
+        if flags & F_EXTRA:
+            size, pos = _get_varint(data, pos)
+            req.update(json.loads(bytes(data[pos:pos + size])))
+            pos += size
+        return req
+
+    # STREAMS (varint length-prefixed frames)
+    def encode_many(self, reqs):
+        buf = bytearray()
+        for req in reqs:
+            rec = self.encode(req)
+            _put_varint(buf, len(rec))
+            buf += rec
+        return bytes(buf)
+
+    def decode_many(self, data):
+        out = []
+        pos = 0
+        view = memoryview(data)
+        while pos < len(data):
+            size, pos = _get_varint(data, pos)
+            out.append(self.decode(view[pos:pos + size]))
+            pos += size
+        return out
+
+
+class RequestView(Mapping):
+    """
+    Read-only dict view of an encoded request: bytes stay as they are
+    until a field is first read (e.g. a long history the GUI never opens).
+    """
+    __slots__ = ("_data", "_codec", "_req")
+
+    def __init__(self, data, codec):
+        self._data = data
+        self._codec = codec
+        self._req = None
+
+    def _decoded(self):
+        if self._req is None:
+            self._req = self._codec.decode(self._data)
+        return self._req
+
+    def __getitem__(self, key):
+        return self._decoded()[key]
+
+    def __iter__(self):
+        return iter(self._decoded())
+
+    def __len__(self):
+        return len(self._decoded())
+
+    def __repr__(self):
+        return f"RequestView({self._decoded()!r})"
+
+    @property
+    def raw(self):
+        return self._data
+
+    def to_dict(self):
+        return dict(self._decoded())
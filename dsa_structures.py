@@ -118,3 +118,172 @@ class PriorityQueue:
 
     def __len__(self):
         return len(self._heap)
+
+# HIERARCHICAL TIMER WHEEL
+# Used for OVERDUE detection (see overdue.py)
+class TimerWheel:
+    """
+    levels x slots buckets; level L covers slots**(L+1) ticks. A timer goes
+    on the lowest level whose next-higher window it shares with the current
+    tick, so schedule/cancel are O(1) and each timer is moved down at most
+    `levels` times before it fires. Timers past the top window wait in an
+    overflow list. Times are plain numbers (epoch seconds).
+    """
+
+    def __init__(self, tick=60, slots=64, levels=4, start=0):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._bits = slots.bit_length() - 1
+        if 1 << self._bits != slots:
+            raise ValueError("slots must be a power of two")
+        self._wheel = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._overflow = []
+        self._due = []             # scheduled at or before the current tick
+        self.now_tick = int(start // tick)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _place(self, entry):
+        t = entry[0]
+        if t <= self.now_tick:
+            self._due.append(entry)
+            return
+        for level in range(self.levels):
+            shift = self._bits * (level + 1)
+            if t >> shift == self.now_tick >> shift:
+                self._wheel[level][(t >> (self._bits * level)) & (self.slots - 1)].append(entry)
+                return
+        self._overflow.append(entry)
+
+    def schedule(self, when, item):
+        """Fire item once `when` has passed. Returns a handle for cancel()."""
+        entry = [int(when // self.tick), item, True]
+        self._place(entry)
+        self._size += 1
+        return entry
+
+    def cancel(self, handle):
+        if handle[2]:
+            handle[2] = False      # dropped lazily when its bucket is reached
+            self._size -= 1
+
+    def _next_stop(self):
+        """Next tick where a non-empty bucket fires or cascades (skips idle stretches)."""
+        mask = self.slots - 1
+        for level in range(self.levels):
+            shift = self._bits * level
+            cur = (self.now_tick >> shift) & mask
+            base = (self.now_tick >> (shift + self._bits)) << (shift + self._bits)
+            buckets = self._wheel[level]
+            for s in range(cur + 1, self.slots):
+                if buckets[s]:
+                    return base + (s << shift)
+        return ((self.now_tick >> (self._bits * self.levels)) + 1) << (self._bits * self.levels)
+
+    def _cascade(self, level):
+        slot = (self.now_tick >> (self._bits * level)) & (self.slots - 1)
+        bucket, self._wheel[level][slot] = self._wheel[level][slot], []
+        for entry in bucket:
+            if entry[2]:
+                self._place(entry)
+
+    def advance(self, now):
+        """Move the wheel to time `now`; returns the items that expired."""
+        target = int(now // self.tick)
+        fired = [e for e in self._due if e[2]]
+        self._due = []
+        while self.now_tick < target:
+            stop = self._next_stop()
+            if stop > target:
+                self.now_tick = target
+                break
+            self.now_tick = stop
+            # entering a new higher window: redistribute it, top level first
+            top = 0
+            while top < self.levels and stop & ((1 << (self._bits * (top + 1))) - 1) == 0:
+                top += 1
+            if top == self.levels:
+                pending, self._overflow = self._overflow, []
+                for entry in pending:
+                    if entry[2]:
+                        self._place(entry)
+            for level in range(min(top, self.levels - 1), 0, -1):
+                self._cascade(level)
+            slot = stop & (self.slots - 1)
+            bucket, self._wheel[0][slot] = self._wheel[0][slot], []
+            fired.extend(e for e in bucket if e[2])
+            fired.extend(e for e in self._due if e[2])
+            self._due = []
+        for entry in fired:
+            entry[2] = False
+        self._size -= len(fired)
+        return [e[1] for e in fired]
+
+# BK-TREE (metric tree over edit distance)
+# Used for FUZZY search tokens (see search.py)
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance; stops early and returns limit + 1 once it must exceed limit."""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if limit is not None and min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+class BKTree:
+    """
+    Words in a tree where each child edge is labelled with its edit
+    distance to the parent; the triangle inequality prunes every subtree
+    whose edge label is outside [d - k, d + k] during a search.
+    """
+
+    def __init__(self, words=()):
+        self.root = None      # [word, {distance: child}]
+        self.size = 0
+        for w in words:
+            self.add(w)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, word):
+        if self.root is None:
+            self.root = [word, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            d = edit_distance(word, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [word, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, word, max_dist):
+        """[(distance, word)] within max_dist of word."""
+        out = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = edit_distance(word, node[0])   # exact: pruning needs the true distance
+            if d <= max_dist:
+                out.append((d, node[0]))
+            for edge, child in node[1].items():
+                if d - max_dist <= edge <= d + max_dist:
+                    stack.append(child)
+        return out
@@ -0,0 +1,115 @@
+# forecast.py
+"""
+Incremental demand forecasting per item and lab slot.
+
+A lab slot is (weekday, block of slot_hours). Requested units are counted
+for the slot occurrence in progress (a specific date + block); when a
+request arrives for a later occurrence, those counts are folded into an
+exponentially weighted mean/variance per (slot, item). Nothing is ever
+recomputed over full history: each fold costs O(items seen in that slot).
+
+Recommended stock is mean + z * std for the busiest slot, rounded up.
+"""
+import datetime
+import math
+
+
+class DemandForecaster:
+    def __init__(self, alpha=0.3, slot_hours=3, z=1.65):
+        self.alpha = alpha
+        self.slot_hours = slot_hours
+        self.z = z                  # 1.65 ~ 95% one-sided service level
+        self._stats = {}            # (slot_key, item) -> [mean, var, n]
+        self._slot_items = {}       # slot_key -> set of items ever seen in that slot
+        self._open = None           # (date_iso, slot_key) of the occurrence being counted
+        self._counts = {}           # item -> units requested in the open occurrence
+
+    def slot_of(self, when):
+        return (when.weekday(), when.hour // self.slot_hours)
+
+    # UPDATES
+    def observe(self, items, when=None):
+        when = when or datetime.datetime.now()
+        slot_key = self.slot_of(when)
+        occurrence = (when.date().isoformat(), slot_key)
+        if occurrence != self._open:
+            self._close()
+            self._open = occurrence
+        for item in items:
+            self._counts[item] = self._counts.get(item, 0) + 1
+
+    def observe_history(self, requests):
+        """Seed from request dicts (oldest first) using their ISO timestamps."""
+        for req in requests:
+            try:
+                when = datetime.datetime.fromisoformat(req.get("timestamp", ""))
+            except ValueError:
+                continue
+            self.observe(req.get("items", []), when)
+
+    def _close(self):
+        if self._open is None:
+            return
+        slot_key = self._open[1]
+        seen = self._slot_items.setdefault(slot_key, set())
+        seen.update(self._counts)
+        a = self.alpha
+        for item in seen:
+            x = self._counts.get(item, 0)
+            st = self._stats.get((slot_key, item))
+            if st is None:
+                self._stats[(slot_key, item)] = [float(x), 0.0, 1]
+                continue
+            diff = x - st[0]
+            incr = a * diff
+            st[0] += incr
+            st[1] = (1 - a) * (st[1] + diff * incr)
+            st[2] += 1
+        self._open = None
+        self._counts = {}
+
+    def flush(self):
+        """Fold the occurrence in progress (e.g. at the end of a lab day)."""
+        self._close()
+
+    # QUERIES
+    def forecast(self, item, slot_key):
+        st = self._stats.get((slot_key, item))
+        return st[0] if st else 0.0
+
+    def recommend_stock(self, item, slot_key=None):
+        keys = [slot_key] if slot_key is not None else list(self._slot_items)
+        best = 0
+        for key in keys:
+            st = self._stats.get((key, item))
+            if st:
+                best = max(best, math.ceil(st[0] + self.z * math.sqrt(max(st[1], 0.0))))
+        return best
+
+    def recommendations(self, items=None):
+        if items is None:
+            items = {item for (_, item) in self._stats}
+        return {item: self.recommend_stock(item) for item in items}
+
+    # PERSISTENCE (plain JSON-able dict, stored in user_settings.json)
+    def to_dict(self):
+        return {
+            "alpha": self.alpha, "slot_hours": self.slot_hours, "z": self.z,
+            "stats": [[list(k[0]), k[1], v] for k, v in self._stats.items()],
+            # the occurrence still being counted, folded after a restart
+            "open": [self._open[0], list(self._open[1])] if self._open else None,
+            "counts": self._counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        f = cls(data.get("alpha", 0.3), data.get("slot_hours", 3), data.get("z", 1.65))
+        for slot, item, st in data.get("stats", []):
+            key = tuple(slot)
+            f._stats[(key, item)] = list(st)
+            f._slot_items.setdefault(key, set()).add(item)
+        if data.get("open"):
+            day, slot = data["open"]
+            f._open = (day, tuple(slot))
+            f._counts = dict(data.get("counts", {}))
+        return f
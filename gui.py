@@ -3,10 +3,23 @@ import os
 import sys
 import random
 import re
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 import tkinter.font as tkfont
-from PIL import Image, ImageTk, ImageOps, ImageDraw, ImageFont, Image
+
+from receipts import render_receipt_lines
+
+# PIL is imported on first use (see _pil) so the login screen can paint first.
+_PIL = None
+
+
+def _pil():
+    global _PIL
+    if _PIL is None:
+        from PIL import Image, ImageTk, ImageOps
+        _PIL = (Image, ImageTk, ImageOps)
+    return _PIL
 
 def is_valid_cvsu_email(email: str) -> bool:
     """
@@ -20,9 +33,14 @@ def is_valid_cvsu_email(email: str) -> bool:
 FONT_NAME = "Poppins"
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
 FONT_FILE = os.path.join(ASSETS_DIR, "Poppins.ttf")
+CATALOG_POLL_MS = 5000
+OVERDUE_FIRST_CHECK_MS = 1000
+OVERDUE_POLL_MS = 60_000
 
 
-def register_font_from_file(ttf_path):
+def register_font_from_file(ttf_path, root=None):
+    # Registration itself is cheap; only query families when a root already
+    # exists instead of spinning up throwaway Tk interpreters at import time.
     if not os.path.isfile(ttf_path): return False
     try:
         if sys.platform.startswith("win"):
@@ -30,20 +48,13 @@ def register_font_from_file(ttf_path):
             FR_PRIVATE = 0x10
             pathbuf = os.path.abspath(ttf_path)
             ctypes.windll.gdi32.AddFontResourceExW(pathbuf, FR_PRIVATE, 0)
-            root = tk.Tk(); root.withdraw()
-            families = set(tkfont.families(root)); root.destroy()
-            return FONT_NAME in families
-        else:
-            root = tk.Tk(); root.withdraw()
-            families = set(tkfont.families(root)); root.destroy()
-            return FONT_NAME in families
+        if root is None:
+            return True
+        return FONT_NAME in set(tkfont.families(root))
     except Exception:
         return False
 
 
-register_font_from_file(FONT_FILE)
-
-
 def _rounded_rect(canvas, x1, y1, x2, y2, r=15, **kwargs):
     points = [
         x1 + r, y1, x2 - r, y1, x2, y1, x2, y1 + r,
@@ -53,8 +64,11 @@ def _rounded_rect(canvas, x1, y1, x2, y2, r=15, **kwargs):
     return canvas.create_polygon(points, smooth=True, **kwargs)
 
 class CircuitLendGUI:
-    def __init__(self, controller):
+    def __init__(self, controller, on_first_frame=None):
         self.c = controller
+        self._on_first_frame = on_first_frame
+        self.first_frame_at = None
+        register_font_from_file(FONT_FILE)
         self.root = tk.Tk()
         self.root.title("CircuitLend")
         self.root.geometry("360x780")
@@ -62,34 +76,27 @@ class CircuitLendGUI:
         self.root.configure(bg="#ffffff")
         self._configure_styles()
 
+        # nav icons are not needed until after login; loaded after first paint
         self._icons = {}
-        self._ensure_icons()
+        self._icons_ready = False
 
         self.content_frame = tk.Frame(self.root, bg="#ffffff")
         self.content_frame.pack(fill="both", expand=True)
 
         self.nav_frame = None
 
-        self._demo_items = [
-            {"id": "Breadboard", "title": "Breadboard", "image": "breadboard.png", "desc": "Standard solderless breadboard.", "category": "Equipment"},
-            {"id": "DC Power Supply", "title": "DC Power Supply", "image": "dc power supply.png", "desc": "Bench DC/AC power supply.", "category": "Equipment"},
-            {"id": "AC Power Supply", "title": "AC Power Supply", "image": "AC_DC power supply.png", "desc": "AC power source.", "category": "Equipment"},
-            {"id": "Digital Multimeter", "title": "Digital Multimeter", "image": "digital multimeter.png", "desc": "Digital multimeter.", "category": "Equipment"},
-            {"id": "AC Ammeter", "title": "AC Ammeter", "image": "ac ammeter.png", "desc": "AC ammeter.", "category": "Equipment"},
-            {"id": "AC Voltmeter", "title": "AC Voltmeter", "image": "ac voltmeter.png", "desc": "AC voltmeter.", "category": "Equipment"},
-            {"id": "Analog Multimeter", "title": "Analog Multimeter", "image": "analog multimeter.png", "desc": "Analog multimeter.", "category": "Equipment"},
-            {"id": "Resistors (10 Ω – 1 kΩ)", "title": "Resistors (10 Ω – 1 kΩ)", "image": "resistors.png", "desc": "Assorted resistors.", "category": "Components"},
-            {"id": "Potentiometer", "title": "Potentiometer", "image": "potentiometer.png", "desc": "Adjustable potentiometer.", "category": "Components"},
-            {"id": "Capacitors (0.1 µF – 100 µF)", "title": "Capacitors (0.1 µF – 100 µF)", "image": "capacitor.png", "desc": "Assorted capacitors.", "category": "Components"},
-            {"id": "Inductors (10 mH – 1.389 H)", "title": "Inductors (10 mH – 1.389 H)", "image": "inductors.png", "desc": "Inductor assortment.", "category": "Components"},
-            {"id": "Connecting Wires", "title": "Connecting Wires", "image": "connecting wires.png", "desc": "Jumper wires.", "category": "Accessories"},
-            {"id": "Alligator Clips", "title": "Alligator Clips", "image": "alligator clips.png", "desc": "Clip leads.", "category": "Accessories"},
-            {"id": "Switches", "title": "Switches", "image": "switch toggle.png", "desc": "Toggle switches.", "category": "Accessories"},
-        ]
         self._active_category = None
 
+        # hidden diagnostics panel
+        self.root.bind_all("<Control-Shift-D>", lambda e: self._build_diagnostics())
+
         self._build_login()
 
+    @property
+    def _demo_items(self):
+        # catalog records now come from the controller (catalog.jsonl)
+        return self.c.item_records()
+
     def _configure_styles(self):
         style = ttk.Style()
         style.configure("TButton", font=(FONT_NAME, 12))
@@ -103,6 +110,10 @@ class CircuitLendGUI:
         return os.path.join(ASSETS_DIR, filename)
 
     def _load_icon(self, filename, size=(48, 48)):
+        cached = self._icons.get((filename, size))
+        if cached is not None:
+            return cached
+        Image, ImageTk, ImageOps = _pil()
         path = self._icon_path(filename)
         try:
             img = Image.open(path).convert("RGBA")
@@ -117,6 +128,9 @@ class CircuitLendGUI:
             return photo
 
     def _ensure_icons(self):
+        if self._icons_ready:
+            return
+        self._icons_ready = True
         self.home_icon = self._load_icon("home.png", size=(34, 34))
         self.borrowed_icon = self._load_icon("borrowed.png", size=(34, 34))
         self.cart_icon = self._load_icon("cart.png", size=(34, 34))
@@ -125,6 +139,7 @@ class CircuitLendGUI:
         self.settings_icon = self._load_icon("settings.png", size=(34, 34))
 
     def _create_bottom_nav(self):
+        self._ensure_icons()
         self.nav_frame = tk.Frame(self.root, bg="#ffffff")
         self.nav_frame.pack(side="bottom", fill="x")
         self.btn_home = tk.Button(self.nav_frame, image=self.home_icon, text="Home", compound="top",
@@ -159,9 +174,9 @@ class CircuitLendGUI:
         return out + "..."
 
     def _image_for_id(self, item_id, size=(40, 40)):
-        for it in self._demo_items:
-            if it["id"] == item_id:
-                return self._load_icon(it.get("image"), size=size)
+        rec = self.c.item_record(item_id)
+        if rec and rec.get("image"):
+            return self._load_icon(rec["image"], size=size)
         # fallback guess based on first word
         guess = f"{item_id.lower().split()[0]}.png"
         return self._load_icon(guess, size=size)
@@ -171,8 +186,13 @@ class CircuitLendGUI:
         active_tab = tk.StringVar(value="login")
 
         # --- Logo on top ---
-        logo_img = self._load_icon("circuitcart_logo.png", size=(240, 100))
-        tk.Label(self.content_frame, image=logo_img, bg="#ffffff").pack(pady=(100, 80))
+        # (blank placeholder until PIL is loaded after first paint)
+        if _PIL is not None:
+            logo_img = self._load_icon("circuitcart_logo.png", size=(240, 100))
+        else:
+            logo_img = self._icons.setdefault("_logo_placeholder", tk.PhotoImage(width=240, height=100))
+        self._login_logo = tk.Label(self.content_frame, image=logo_img, bg="#ffffff")
+        self._login_logo.pack(pady=(100, 80))
 
         # --- Tab bar ---
         tab_bar = tk.Frame(self.content_frame, bg="#ffffff")
@@ -203,16 +223,28 @@ class CircuitLendGUI:
         login_pwd = tk.StringVar(); pink_entry(login_frame, login_pwd, show="*")
 
         def do_login():
-            ok, msg = self.c.login(login_id.get(), login_pwd.get())
+            # password hashing runs on a worker thread; poll so Tk keeps painting
+            login_btn.config(state="disabled")
+            future = self.c.login_async(login_id.get(), login_pwd.get())
+            self.root.after(20, lambda: finish_login(future))
+
+        def finish_login(future):
+            if not future.done():
+                self.root.after(20, lambda: finish_login(future))
+                return
+            ok, msg = self.c.finish_login(future)
+            if login_btn.winfo_exists():
+                login_btn.config(state="normal")
             (messagebox.showinfo if ok else messagebox.showerror)("Login", msg)
             if ok:
                 if not self.nav_frame:
                     self._create_bottom_nav()
                 self._build_home()
 
-        tk.Button(login_frame, text="LOG IN", font=(FONT_NAME, 12, "bold"),
+        login_btn = tk.Button(login_frame, text="LOG IN", font=(FONT_NAME, 12, "bold"),
                 bg="#ff9898", fg="#ffffff", bd=0,
-                width=20, height=2, command=do_login).pack(pady=12)
+                width=20, height=2, command=do_login)
+        login_btn.pack(pady=12)
 
         #Sign up form
         signup_frame = tk.Frame(self.content_frame, bg="#ffffff")
@@ -270,6 +302,7 @@ class CircuitLendGUI:
 
     def _build_item_grid(self, items=None, cols=2, thumb_size=(140, 90)):
         if items is None: items = self._demo_items
+        self._ensure_icons()
         self._clear()
         header = tk.Frame(self.content_frame, bg="#ffffff"); header.pack(fill="x", pady=6, padx=6)
         
@@ -282,7 +315,7 @@ class CircuitLendGUI:
 
         cat_frame = tk.Frame(self.content_frame, bg="#ffffff"); cat_frame.pack(fill="x", padx=8, pady=(6, 4))
         tk.Label(cat_frame, text="Filter:", font=self.normal_font, bg="#ffffff").pack(side="left", padx=(0, 6))
-        for cat in ["Equipment", "Components", "Accessories"]:
+        for cat in self.c.categories:
             ttk.Button(cat_frame, text=cat, command=lambda c=cat: self._set_category(c)).pack(side="left", padx=4)
 
         canvas = tk.Canvas(self.content_frame, highlightthickness=0, bg="#ffffff", width=340)
@@ -346,7 +379,8 @@ class CircuitLendGUI:
                  wraplength=320, justify="left").pack(anchor="w", pady=(2, 4))
         tk.Label(detail, text=item.get("desc", ""), font=(FONT_NAME, 12), bg="#ffffff",
                  wraplength=320, justify="left").pack(anchor="w", pady=(0, 6))
-        tk.Label(detail, text=f"Stock: {self.c.availability_of(item['id'])}", font=(FONT_NAME, 12), bg="#ffffff").pack(anchor="w")
+        tk.Label(detail, text=f"Stock: {self.c.availability_of(item['id'])}   On loan: {self.c.on_loan(item['id'])}",
+                 font=(FONT_NAME, 12), bg="#ffffff").pack(anchor="w")
         tk.Label(detail, text="Condition: Good", font=(FONT_NAME, 12), bg="#ffffff").pack(anchor="w", pady=(0, 4))
 
         action_row = tk.Frame(detail, bg="#ffffff")
@@ -385,9 +419,9 @@ class CircuitLendGUI:
                 if not bdate or not rdate:
                     messagebox.showwarning("Borrow", "Please enter both dates.")
                     return
-                ok, msg = self.c.add_to_cart(item["id"])
+                ok, msg = self.c.add_to_cart(item["id"], bdate, rdate)
                 if not ok:
-                    messagebox.showerror("Borrow", msg); return
+                    self._offer_waitlist(item["id"], msg, "Borrow"); return
                 ok2, msg2 = self.c.submit_borrow(reason=reason, prioritize=prioritize, borrow_date=bdate, return_date=rdate)
                 if ok2:
                     receipt = self.c.generate_receipt([item["id"]], bdate, rdate)
@@ -443,17 +477,7 @@ class CircuitLendGUI:
         receipt_frame = tk.Frame(parent, bg="#ffffff")
         receipt_frame.place(relx=0.5, rely=0.5, anchor="center", width=310, height=230)
 
-        lines = [
-            f"Borrower: {receipt['borrower_name']} (ID: {receipt.get('student_id','')})",
-            f"Email: {receipt.get('email','')}",
-            "Items borrowed:",
-        ] + receipt.get('items', []) + [
-            f"Borrow date: {receipt['borrow_date']}",
-            f"Return deadline: {receipt['return_date']}",
-            f"Issued on: {receipt['issued_at']}",
-            "",
-            "Note: Present this receipt upon return."
-        ]
+        lines = render_receipt_lines(receipt)
 
         for line in lines:
             tk.Label(receipt_frame, text=line, font=(FONT_NAME, 12), bg="#ffffff",
@@ -463,7 +487,20 @@ class CircuitLendGUI:
     # Cart / Borrow 
     def _add_from_detail(self, item):
         ok, msg = self.c.add_to_cart(item["id"])
-        (messagebox.showinfo if ok else messagebox.showerror)("Cart", msg)
+        if ok:
+            messagebox.showinfo("Cart", msg)
+        else:
+            self._offer_waitlist(item["id"], msg, "Cart")
+
+    def _offer_waitlist(self, item_id, msg, title):
+        # out of stock: offer the waitlist instead of leaving the student to retry
+        if msg != "Item unavailable." or not self.c.current_user:
+            messagebox.showerror(title, msg); return
+        if messagebox.askyesno(title, f"{item_id} is out of stock.\n"
+                                      "Join the waitlist? A unit will be held for you "
+                                      "and you'll get a message when one is returned."):
+            ok, wmsg = self.c.join_waitlist(item_id)
+            (messagebox.showinfo if ok else messagebox.showerror)("Waitlist", wmsg)
 
     # Cart
     def _build_cart(self):
@@ -574,9 +611,7 @@ class CircuitLendGUI:
             self._show_inline_receipt(self.content_frame, receipt)
 
             # Send receipt to Messages tab
-            if not hasattr(self.c, "messages"):
-                self.c.messages = []
-            self.c.messages.append(receipt)
+            self.c.send_message(receipt)
 
             messagebox.showinfo("Borrow", "Borrow request submitted. Receipt sent to Messages.")
 
@@ -625,20 +660,16 @@ class CircuitLendGUI:
             history = self.c.list_borrow_history()
             if not history:
                 messagebox.showwarning("Borrowed", "No borrow history found."); return
-            last_items = history[-1].get("items", [])
-            # Save reminder
-            self.c.reminders.append({
-                "user": self.c.current_user.name,
-                "items": last_items,
-                "borrow_date": borrow_date,
-                "return_date": return_date
-            })
-            self.c._persist()
+            last = history[-1]
+            # Re-date the loan's booking (also scheduled for overdue checks)
+            ok, msg = self.c.set_loan_dates(last.get("id"), borrow_date, return_date)
+            if not ok:
+                messagebox.showwarning("Borrowed", msg); return
             # Show receipt overlay
             overlay_canvas.destroy(); overlay.destroy()
-            r = self.c.generate_receipt(last_items, borrow_date, return_date)
+            r = self.c.generate_receipt(last.get("items", []), borrow_date, return_date)
             self._show_inline_receipt(self.content_frame, r)
-            messagebox.showinfo("Borrowed", "Reminder saved. See Reminders tab.")
+            messagebox.showinfo("Borrowed", msg)
 
         ttk.Button(overlay, text="Save", command=save).pack(pady=10)
         ttk.Button(overlay, text="Cancel", command=lambda: (overlay_canvas.destroy(), overlay.destroy())).pack(pady=(0, 10))
@@ -792,23 +823,101 @@ class CircuitLendGUI:
         ttk.Button(overlay, text="Save", command=submit).pack(pady=6)
         ttk.Button(overlay, text="Cancel", command=lambda: (overlay_canvas.destroy(), overlay.destroy())).pack()
 
-    def _build_messages(self):
+    def _build_messages(self, page=0):
+        self._clear()
+        unread = self.c.unread_messages()
+        title = f"Messages ({unread} new)" if unread else "Messages"
+        tk.Label(self.content_frame, text=title, font=(FONT_NAME, 12, "bold"), bg="#ffffff").pack(pady=8)
+
+        # only the current page of the user's inbox is turned into widgets
+        entries, pages = self.c.inbox_page(page)
+        if page >= pages:
+            page = pages - 1
+            entries, pages = self.c.inbox_page(page)
+        for seq, msg, read in entries:
+            heading = msg.get("title", "Receipt") + ("" if read else "  \u2022 new")
+            tk.Label(self.content_frame, text=heading, font=(FONT_NAME, 12, "bold"), bg="#ffffff").pack(anchor="w", padx=8)
+            lines = msg["lines"] if "lines" in msg else render_receipt_lines(msg)
+            for line in lines:
+                if line:
+                    tk.Label(self.content_frame, text=line, font=(FONT_NAME, 12), bg="#ffffff").pack(anchor="w", padx=20)
+        self.c.mark_messages_read([seq for seq, _, read in entries if not read])
+
+        nav = tk.Frame(self.content_frame, bg="#ffffff"); nav.pack(pady=8)
+        ttk.Button(nav, text="Newer", state=("normal" if page > 0 else "disabled"),
+                   command=lambda: self._build_messages(page - 1)).pack(side="left")
+        tk.Label(nav, text=f"{page + 1} / {pages}", font=(FONT_NAME, 11), bg="#ffffff").pack(side="left", padx=8)
+        ttk.Button(nav, text="Older", state=("normal" if page + 1 < pages else "disabled"),
+                   command=lambda: self._build_messages(page + 1)).pack(side="left")
+
+    # Diagnostics (hidden; Ctrl+Shift+D)
+    def _build_diagnostics(self):
         self._clear()
-        tk.Label(self.content_frame, text="Messages", font=(FONT_NAME, 12, "bold"), bg="#ffffff").pack(pady=8)
-
-        for msg in self.c.messages:
-            tk.Label(self.content_frame, text="Receipt", font=(FONT_NAME, 12, "bold"), bg="#ffffff").pack(anchor="w", padx=8)
-            for line in [
-                f"Borrower: {msg['borrower_name']} (ID: {msg.get('student_id','')})",
-                f"Email: {msg.get('email','')}",
-                "Items borrowed:"
-            ] + msg.get("items", []) + [
-                f"Borrow date: {msg['borrow_date']}",
-                f"Return deadline: {msg['return_date']}",
-                f"Issued on: {msg['issued_at']}",
-                "Note: Present this receipt upon return."
-            ]:
-                tk.Label(self.content_frame, text=line, font=(FONT_NAME, 12), bg="#ffffff").pack(anchor="w", padx=20)
+        tk.Label(self.content_frame, text="Diagnostics", font=(FONT_NAME, 14, "bold"), bg="#ffffff").pack(pady=10)
+
+        btn_row = tk.Frame(self.content_frame, bg="#ffffff"); btn_row.pack(fill="x", padx=12)
+        if self.c.metrics is None:
+            ttk.Button(btn_row, text="Enable metrics",
+                       command=lambda: (self.c.enable_metrics(), self._build_diagnostics())).pack(side="left")
+            tk.Label(self.content_frame, text="Metrics are off.", font=(FONT_NAME, 11), bg="#ffffff").pack(anchor="w", padx=12, pady=6)
+        else:
+            def export():
+                path = self.c.export_metrics()
+                messagebox.showinfo("Diagnostics", f"Metrics written to {path}")
+            ttk.Button(btn_row, text="Refresh", command=self._build_diagnostics).pack(side="left")
+            ttk.Button(btn_row, text="Export", command=export).pack(side="left", padx=6)
+            ttk.Button(btn_row, text="Disable",
+                       command=lambda: (self.c.disable_metrics(), self._build_diagnostics())).pack(side="left")
+
+            snap = self.c.metrics.snapshot()
+            lines = ["Method            calls  err  mean ms  p99 ms"]
+            for name, m in sorted(snap["methods"].items()):
+                lines.append(f"{name[:16]:<16} {m['calls']:>6} {m['errors']:>4} {m['mean_ms']:>8.2f} {m['p99_ms']:>7.2f}")
+            lines.append("")
+            for name, value in snap["gauges"].items():
+                lines.append(f"{name}: {value}")
+            for name, c in snap["caches"].items():
+                lines.append(f"{name} hit rate: {c['hit_rate']:.0%} ({c['hits']}/{c['hits'] + c['misses']})")
+            tk.Label(self.content_frame, text="\n".join(lines), font=("Courier", 9), bg="#ffffff",
+                     justify="left", anchor="w").pack(anchor="w", padx=12, pady=8)
+
+        ttk.Button(self.content_frame, text="Back",
+                   command=self._build_home if self.c.current_user else self._build_login).pack(pady=6)
+
+    def _first_paint(self):
+        self.root.update_idletasks()
+        self.first_frame_at = time.perf_counter()
+        if self._on_first_frame:
+            self._on_first_frame(self.first_frame_at)
+        # deferred assets: PIL, login logo, nav icons
+        self.root.after_idle(self._load_deferred_assets)
+
+    def _load_deferred_assets(self):
+        logo = getattr(self, "_login_logo", None)
+        if logo is not None and logo.winfo_exists():
+            logo.config(image=self._load_icon("circuitcart_logo.png", size=(240, 100)))
+        self._ensure_icons()
+        self.root.after(CATALOG_POLL_MS, self._poll_catalog)
+        self.root.after(OVERDUE_FIRST_CHECK_MS, self._poll_overdue)
+
+    def _poll_catalog(self):
+        # cheap stat() check; a changed file is re-read incrementally
+        try:
+            self.c.reload_catalog()
+        finally:
+            self.root.after(CATALOG_POLL_MS, self._poll_catalog)
+
+    def _poll_overdue(self):
+        # one timer-wheel advance; overdue loans land in the owners' inboxes
+        try:
+            self.c.check_overdue()
+            self.c.expire_holds()
+            if self.c.expire_sessions():
+                messagebox.showinfo("Session", "You were logged out after being idle.")
+                self._build_login()
+        finally:
+            self.root.after(OVERDUE_POLL_MS, self._poll_overdue)
 
     def run(self):
+        self.root.after_idle(self._first_paint)
         self.root.mainloop()
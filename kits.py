@@ -0,0 +1,48 @@
+# kits.py
+"""
+Lab kit templates: a named bundle of catalog items with per-student
+quantities (breadboard, supply, meter, resistors, wires, clips...).
+
+Templates live in user_settings.json under "kits"; DEFAULT_KITS is used
+until one is saved. The controller reserves a kit for a whole class with
+CircuitLendController.reserve_kit, which works from totals(): one count
+per item for all students, so stock is checked and decremented once per
+item rather than once per unit per student.
+"""
+from collections import Counter
+
+DEFAULT_KITS = {
+    "Basic Circuit Lab": {
+        "Breadboard": 1,
+        "DC Power Supply": 1,
+        "Digital Multimeter": 1,
+        "Resistors (10 Ω – 1 kΩ)": 5,
+        "Connecting Wires": 10,
+        "Alligator Clips": 4,
+    },
+}
+
+
+class KitTemplate:
+    def __init__(self, name, items):
+        self.name = name
+        self.items = {item: int(qty) for item, qty in items.items() if int(qty) > 0}
+
+    def units(self):
+        """Item list for one student (one entry per unit)."""
+        return list(Counter(self.items).elements())
+
+    def totals(self, n_students):
+        return Counter({item: qty * n_students for item, qty in self.items.items()})
+
+    def missing(self, known_items):
+        """Template items that are not in the catalog."""
+        return [item for item in self.items if item not in known_items]
+
+    def to_dict(self):
+        return dict(self.items)
+
+
+def load_kits(settings):
+    raw = settings.get("kits") or DEFAULT_KITS
+    return {name: KitTemplate(name, items) for name, items in raw.items()}
@@ -0,0 +1,229 @@
+# loadgen.py
+"""
+Synthetic load generator for the start-of-lab rush.
+
+Each session is login -> search -> add_to_cart (x k) -> submit_borrow -> return_items
+against one headless controller. Arrivals are Poisson at --rate sessions/sec
+(default: --students arriving over --window seconds), or replayed from a
+JSONL trace whose lines look like
+    {"at": 12.5, "student_id": "lab-00003", "query": "multi", "items": ["Breadboard"]}
+
+    python loadgen.py --students 60 --window 300 --concurrency 8 --time-scale 0.01
+    python loadgen.py --replay lab_trace.jsonl --concurrency 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+from auth import hash_password
+
+OPS = ("login", "search_items", "add_to_cart", "submit_borrow", "return_items")
+
+
+# SCHEDULES
+def synthesize(n_sessions, rate, items, seed=0, max_items=3):
+    """Poisson arrivals: [(offset_seconds, plan_dict), ...]."""
+    rng = random.Random(seed)
+    t = 0.0
+    schedule = []
+    for i in range(n_sessions):
+        t += rng.expovariate(rate)
+        picked = rng.sample(items, rng.randint(1, min(max_items, len(items))))
+        schedule.append((t, {
+            "student_id": f"lab-{i:05d}",
+            "query": picked[0].split()[0].lower()[:4],
+            "items": picked,
+        }))
+    return schedule
+
+
+def load_trace(path):
+    schedule = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(rec, dict) or not rec.get("items"):
+                continue
+            schedule.append((float(rec.get("at", 0.0)), {
+                "student_id": rec.get("student_id") or f"lab-{len(schedule):05d}",
+                "query": rec.get("query") or rec["items"][0].split()[0].lower(),
+                "items": list(rec["items"]),
+            }))
+    schedule.sort(key=lambda entry: entry[0])
+    return schedule
+
+
+# TARGET
+def build_target(student_ids, password="pw", import_cost=1000):
+    """
+    Controller on the real catalog with an in-memory store. Returns
+    (controller, tmp): its settings and loans files live in the
+    TemporaryDirectory tmp, which the caller cleans up.
+    """
+    from app_controller import CircuitLendController
+    from user_store import MemoryUserStore
+
+    tmp = tempfile.TemporaryDirectory()
+    c = CircuitLendController(user_store=MemoryUserStore(),
+                              settings_file=os.path.join(tmp.name, "settings.json"))
+    pw_hash = hash_password(password, iterations=import_cost)
+    c.auth.import_users({"name": f"Student {sid}", "student_id": sid, "password_hash": pw_hash}
+                        for sid in sorted(set(student_ids)))
+    for item in c.all_items:
+        c.availability[item] = max(c.availability[item], 10 ** 6)
+    return c, tmp
+
+
+# RUNNER
+class _Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {op: [] for op in OPS}
+        self.sessions = []
+        self.failures = 0
+        self.errors = {}    # exception type name -> sessions it aborted
+
+    def add(self, op, secs):
+        with self.lock:
+            self.samples[op].append(secs)
+
+
+def _run_session(c, ctl_lock, plan, rec, password):
+    start = time.perf_counter()
+
+    def step(op, fn, *args, **kwargs):
+        t = time.perf_counter()
+        result = fn(*args, **kwargs)
+        rec.add(op, time.perf_counter() - t)
+        return result
+
+    # each student has their own controller session; the lock is held per
+    # operation only, so sessions interleave the way kiosks would
+    def op(name, fn, *args, **kwargs):
+        with ctl_lock:
+            c.resume_session(token)
+            return step(name, fn, *args, **kwargs)
+
+    # the KDF runs on the auth workers without the controller lock, so
+    # logins overlap each other and other students' operations
+    t = time.perf_counter()
+    future = c.login_async(plan["student_id"], password)
+    wait([future])
+    with ctl_lock:
+        ok, _ = c.finish_login(future)
+        token = c.session_token if ok else None
+    rec.add("login", time.perf_counter() - t)
+    if ok:
+        op("search_items", c.search_items, plan["query"])
+        for item in plan["items"]:
+            op("add_to_cart", c.add_to_cart, item)
+        ok, _ = op("submit_borrow", c.submit_borrow,
+                   borrow_date="2026-01-12", return_date="2026-01-20")
+        if ok:
+            op("return_items", c.return_items, plan["items"])
+    if token:
+        with ctl_lock:
+            c.resume_session(token)
+            c.logout()
+    with rec.lock:
+        rec.sessions.append(time.perf_counter() - start)
+        if not ok:
+            rec.failures += 1
+
+
+def run(c, schedule, concurrency=4, time_scale=1.0, password="pw"):
+    rec = _Recorder()
+    ctl_lock = threading.Lock()
+    t0 = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset, plan in schedule:
+            delay = offset * time_scale - (time.perf_counter() - t0)
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(_run_session, c, ctl_lock, plan, rec, password))
+    # a session that raised is a failure too, not a silently missing sample
+    for future in as_completed(futures):
+        exc = future.exception()
+        if exc is not None:
+            rec.failures += 1
+            name = type(exc).__name__
+            rec.errors[name] = rec.errors.get(name, 0) + 1
+    wall = time.perf_counter() - t0
+    return report(rec, wall)
+
+
+def _pct(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * q))]
+
+
+def report(rec, wall):
+    out = {"sessions": len(rec.sessions), "failures": rec.failures, "errors": dict(rec.errors),
+           "wall_seconds": wall,
+           "sessions_per_sec": len(rec.sessions) / wall if wall else 0.0,
+           "ops": {}}
+    for op, vals in list(rec.samples.items()) + [("session", rec.sessions)]:
+        vals = sorted(vals)
+        out["ops"][op] = {"count": len(vals),
+                          "p50_ms": _pct(vals, 0.50) * 1000,
+                          "p99_ms": _pct(vals, 0.99) * 1000}
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay lab-rush traffic against the controller")
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--window", type=float, default=300.0,
+                        help="seconds over which --students arrive")
+    parser.add_argument("--rate", type=float, help="arrivals/sec (overrides --students/--window)")
+    parser.add_argument("--replay", help="JSONL trace of timed sessions")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--time-scale", type=float, default=0.01,
+                        help="multiply arrival offsets (0.01 replays 5 min in 3 s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    from catalog import build_tree_and_items
+    items = build_tree_and_items()[2]
+    if args.replay:
+        schedule = load_trace(args.replay)
+    else:
+        rate = args.rate or args.students / args.window
+        schedule = synthesize(args.students, rate, items, seed=args.seed)
+
+    c, tmp = build_target([plan["student_id"] for _, plan in schedule])
+    try:
+        out = run(c, schedule, args.concurrency, args.time_scale)
+    finally:
+        tmp.cleanup()
+
+    print(f"{out['sessions']} sessions, {out['failures']} failed, "
+          f"{out['sessions_per_sec']:.1f} sessions/s over {out['wall_seconds']:.2f}s")
+    for name, n in out["errors"].items():
+        print(f"  {n} session(s) raised {name}")
+    print(f"{'op':>14} {'count':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for op, r in out["ops"].items():
+        print(f"{op:>14} {r['count']:>7} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# loans.py
+"""
+Index of outstanding loans.
+
+A loan is one submitted borrow request (its request id) and the units
+still out on it. Three hash indexes are kept in step:
+
+    by_item  item -> {loan_id: units out}         "who has the oscilloscope"
+    by_user  uid  -> {loan_id: None}              a user's open loans, oldest first
+    held     (uid, item) -> {loan_id: units out}  what a return can draw from
+
+plus running unit counts per item, per user and per (user, item), so the
+GUI can show outstanding counts and returns are validated in O(1) per
+item. Returns consume the oldest loan first; return_units() reports what
+it consumed so undo can put it back. to_list()/load() round-trip the
+open loans through a small JSON file next to the settings.
+"""
+import time
+from collections import Counter
+
+
+class Loan:
+    __slots__ = ("id", "user", "items", "opened")
+
+    def __init__(self, loan_id, user, items, opened):
+        self.id = loan_id
+        self.user = user
+        self.items = Counter(items)   # units still out, per item
+        self.opened = opened
+
+
+class LoanIndex:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.loans = {}          # loan_id -> Loan
+        self.by_item = {}        # item -> {loan_id: units}
+        self.by_user = {}        # uid -> {loan_id: None} (insertion ordered)
+        self.held = {}           # (uid, item) -> {loan_id: units} (insertion ordered)
+        self._held_units = {}    # (uid, item) -> units out
+        self._item_units = {}    # item -> units out
+        self._user_units = {}    # uid -> units out
+
+    def __len__(self):
+        return len(self.loans)
+
+    # COUNTS / LOOKUPS
+    def outstanding(self, item):
+        return self._item_units.get(item, 0)
+
+    def by_item_units(self):
+        """{item: units out} over all loans."""
+        return dict(self._item_units)
+
+    def user_outstanding(self, user):
+        return self._user_units.get(user, 0)
+
+    def holders(self, item):
+        """{uid: units} of everyone holding item."""
+        out = {}
+        for loan_id, n in self.by_item.get(item, {}).items():
+            uid = self.loans[loan_id].user
+            out[uid] = out.get(uid, 0) + n
+        return out
+
+    def user_items(self, user):
+        """Counter of units user currently holds."""
+        total = Counter()
+        for loan_id in self.by_user.get(user, ()):
+            total.update(self.loans[loan_id].items)
+        return total
+
+    def held_units(self, user, item):
+        return self._held_units.get((user, item), 0)
+
+    def get(self, loan_id):
+        return self.loans.get(loan_id)
+
+    # MUTATIONS
+    def _add_units(self, loan, item, n):
+        loan.items[item] += n
+        if loan.items[item] <= 0:
+            del loan.items[item]
+        left = loan.items.get(item, 0)
+        key = (loan.user, item)
+        for index, k in ((self.by_item, item), (self.held, key)):
+            bucket = index.setdefault(k, {})
+            if left > 0:
+                bucket[loan.id] = left
+            else:
+                bucket.pop(loan.id, None)
+                if not bucket:
+                    del index[k]
+        self._item_units[item] = self._item_units.get(item, 0) + n
+        self._user_units[loan.user] = self._user_units.get(loan.user, 0) + n
+        self._held_units[key] = self._held_units.get(key, 0) + n
+        if not self._held_units[key]:
+            del self._held_units[key]
+
+    def _attach(self, loan):
+        self.loans[loan.id] = loan
+        self.by_user.setdefault(loan.user, {})[loan.id] = None
+
+    def _detach_if_empty(self, loan):
+        if loan.items:
+            return
+        self.loans.pop(loan.id, None)
+        mine = self.by_user.get(loan.user)
+        if mine is not None:
+            mine.pop(loan.id, None)
+            if not mine:
+                del self.by_user[loan.user]
+
+    def open(self, loan_id, user, items):
+        loan = Loan(loan_id, user, (), self.clock())
+        self._attach(loan)
+        for item, n in Counter(items).items():
+            self._add_units(loan, item, n)
+        self._detach_if_empty(loan)
+        return loan
+
+    def close(self, loan_id):
+        """Drop a loan entirely (borrow undone); returns the units that were still out."""
+        loan = self.loans.get(loan_id)
+        if loan is None:
+            return []
+        out = list(loan.items.elements())
+        for item, n in list(loan.items.items()):
+            self._add_units(loan, item, -n)
+        self._detach_if_empty(loan)
+        return out
+
+    def first_unheld(self, user, items):
+        """First item in items that user does not hold enough units of, or None."""
+        for item, n in Counter(items).items():
+            if self._held_units.get((user, item), 0) < n:
+                return item
+        return None
+
+    def return_units(self, user, items):
+        """
+        Take returned units off user's loans, oldest loan first. Caller
+        validates with first_unheld(). Returns [(loan_id, item, n)] consumed.
+        """
+        consumed = []
+        for item, n in Counter(items).items():
+            for loan_id, out in list(self.held.get((user, item), {}).items()):
+                take = min(n, out)
+                loan = self.loans[loan_id]
+                self._add_units(loan, item, -take)
+                self._detach_if_empty(loan)
+                consumed.append((loan_id, item, take))
+                n -= take
+                if not n:
+                    break
+        return consumed
+
+    # PERSISTENCE
+    def to_list(self):
+        """[[loan_id, uid, {item: units out}, opened], ...], oldest first (JSON-safe)."""
+        return [[loan.id, loan.user, dict(loan.items), loan.opened] for loan in self.loans.values()]
+
+    def load(self, rows):
+        for loan_id, user, items, opened in rows:
+            loan = self.open(loan_id, user, Counter(items))
+            loan.opened = opened
+
+    def restore(self, user, consumed):
+        """Undo return_units()."""
+        for loan_id, item, n in consumed:
+            loan = self.loans.get(loan_id)
+            if loan is None:
+                loan = Loan(loan_id, user, (), self.clock())
+                self._attach(loan)
+            self._add_units(loan, item, n)
@@ -1,11 +1,87 @@
 # main.py
-from app_controller import CircuitLendController
-from gui import CircuitLendGUI
+import sys
+import time
 
-def main():
-    controller = CircuitLendController()
-    gui = CircuitLendGUI(controller)
-    gui.run()
+_T0 = time.perf_counter()
+
+STARTUP_BUDGET_MS = 200
+FOLLOW_POLL_MS = 1000
+
+
+def _timed_import(name, marks):
+    t = time.perf_counter()
+    module = __import__(name)
+    marks.append((f"import {name}", time.perf_counter() - t))
+    return module
+
+
+def _flag(argv, name):
+    if name in argv:
+        i = argv.index(name)
+        if i + 1 < len(argv):
+            return argv[i + 1]
+    return None
+
+
+def _replication(controller, argv):
+    """
+    --journal PATH [--serve HOST:PORT]   this kiosk is the primary
+    --follow PATH|HOST:PORT              this kiosk is a read-only follower
+    Returns the Follower (to be pumped by the GUI) or None.
+    """
+    journal, serve, follow = (_flag(argv, f) for f in ("--journal", "--serve", "--follow"))
+    if not (journal or serve or follow):
+        return None
+    import replication
+    if follow:
+        return replication.Follower(controller, replication.source_for(follow, controller.settings))
+    replication.start_primary(controller, journal, serve)
+    return None
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    profile = "--profile-startup" in argv
+    marks = []
+
+    app_controller = _timed_import("app_controller", marks)
+    gui = _timed_import("gui", marks)
+
+    t = time.perf_counter()
+    controller = app_controller.CircuitLendController()
+    if "--metrics" in argv:
+        controller.enable_metrics()
+    follower = _replication(controller, argv)
+    marks.append(("init controller", time.perf_counter() - t))
+
+    def on_first_frame(at):
+        if not profile:
+            return
+        lines = ["startup profile (ms)"]
+        for label, secs in marks:
+            lines.append(f"  {label:<20} {secs * 1000:8.1f}")
+        total = (at - _T0) * 1000
+        verdict = "ok" if total <= STARTUP_BUDGET_MS else "OVER BUDGET"
+        lines.append(f"  {'first frame':<20} {total:8.1f}  (budget {STARTUP_BUDGET_MS} ms: {verdict})")
+        report = "\n".join(lines)
+        if sys.stdout is not None:
+            print(report)
+        else:
+            # windowed PyInstaller build has no console
+            with open("startup_profile.txt", "w", encoding="utf-8") as f:
+                f.write(report + "\n")
+
+    t = time.perf_counter()
+    app = gui.CircuitLendGUI(controller, on_first_frame=on_first_frame)
+    marks.append(("init gui", time.perf_counter() - t))
+    if follower is not None:
+        def pump():
+            try:
+                follower.pump()
+            finally:
+                app.root.after(FOLLOW_POLL_MS, pump)
+        app.root.after(FOLLOW_POLL_MS, pump)
+    app.run()
 
 if __name__ == "__main__":
     main()
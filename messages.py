@@ -0,0 +1,152 @@
+# messages.py
+"""
+In-app message inboxes (receipts and notices for the Messages tab).
+
+Messages are partitioned per user. Each inbox is a ring buffer holding at
+most `capacity` messages; the oldest is dropped when it is full, so memory
+is bounded per user no matter how long the kiosk runs. Every message gets a
+per-inbox sequence number, which makes lookup by seq, a page (newest first)
+and the unread counter O(1) / O(page size) independent of history length:
+
+- unread is a counter adjusted on append, eviction and mark_read
+- mark_all_read moves a watermark instead of touching every message
+"""
+
+DEFAULT_CAPACITY = 200
+PAGE_SIZE = 5
+
+
+class _Inbox:
+    __slots__ = ("capacity", "buf", "start", "next_seq", "read_upto", "unread")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = []            # [seq, message, read]; ring once full
+        self.start = 0           # index of the oldest entry
+        self.next_seq = 0
+        self.read_upto = 0       # every seq below this counts as read
+        self.unread = 0
+
+    def __len__(self):
+        return len(self.buf)
+
+    def _is_read(self, entry):
+        return entry[2] or entry[0] < self.read_upto
+
+    def append(self, message):
+        """Store message; returns (seq, evicted_was_unread or None)."""
+        entry = [self.next_seq, message, False]
+        evicted = None
+        if len(self.buf) < self.capacity:
+            self.buf.append(entry)
+        else:
+            evicted = not self._is_read(self.buf[self.start])
+            if evicted:
+                self.unread -= 1
+            self.buf[self.start] = entry
+            self.start = (self.start + 1) % self.capacity
+        self.next_seq += 1
+        self.unread += 1
+        return entry[0], evicted
+
+    def entry(self, seq):
+        first = self.next_seq - len(self.buf)
+        if not first <= seq < self.next_seq:
+            return None
+        return self.buf[(self.start + seq - first) % len(self.buf)]
+
+    def newest(self, offset, count):
+        out = []
+        n = len(self.buf)
+        for k in range(offset, min(offset + count, n)):
+            out.append(self.buf[(self.start + n - 1 - k) % n])
+        return out
+
+
+class MessageStore:
+    """
+    Per-user bounded inboxes. `user` is any hashable key (the controller
+    uses User.uid); append() without a user goes to a shared inbox.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._inboxes = {}
+        self._count = 0
+        self._unread = 0
+        self.dropped = 0
+
+    def _inbox(self, user, create=False):
+        box = self._inboxes.get(user)
+        if box is None and create:
+            box = self._inboxes[user] = _Inbox(self.capacity)
+        return box
+
+    def append(self, message, user=None):
+        box = self._inbox(user, create=True)
+        seq, evicted = box.append(message)
+        if evicted is None:
+            self._count += 1
+        else:
+            self.dropped += 1
+            self._unread -= evicted
+        self._unread += 1
+        return seq
+
+    def __len__(self):
+        return self._count
+
+    def count(self, user=None):
+        box = self._inbox(user)
+        return len(box) if box else 0
+
+    def unread(self, user=None):
+        box = self._inbox(user)
+        return box.unread if box else 0
+
+    def total_unread(self):
+        return self._unread
+
+    def users(self):
+        return list(self._inboxes)
+
+    # PAGES (newest first)
+    def page_count(self, user=None, per_page=PAGE_SIZE):
+        return max(1, -(-self.count(user) // per_page))
+
+    def page(self, user=None, number=0, per_page=PAGE_SIZE):
+        """[(seq, message, read)] on page `number` (0 = newest)."""
+        box = self._inbox(user)
+        if not box:
+            return []
+        return [(e[0], e[1], box._is_read(e)) for e in box.newest(number * per_page, per_page)]
+
+    def get(self, seq, user=None):
+        box = self._inbox(user)
+        e = box.entry(seq) if box else None
+        return e[1] if e else None
+
+    # READ STATE
+    def mark_read(self, seqs, user=None):
+        box = self._inbox(user)
+        if not box:
+            return
+        for seq in seqs:
+            e = box.entry(seq)
+            if e and not box._is_read(e):
+                e[2] = True
+                box.unread -= 1
+                self._unread -= 1
+
+    def mark_all_read(self, user=None):
+        box = self._inbox(user)
+        if box:
+            self._unread -= box.unread
+            box.unread = 0
+            box.read_upto = box.next_seq
+
+    def clear(self, user=None):
+        box = self._inboxes.pop(user, None)
+        if box:
+            self._count -= len(box)
+            self._unread -= box.unread
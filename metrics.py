@@ -0,0 +1,217 @@
+# metrics.py
+"""
+Opt-in instrumentation for CircuitLendController.
+
+Nothing here runs unless enable_metrics() is called on the controller:
+instrument() replaces every public method (found by reflection, so new
+ones are covered without a list to keep up) plus a few private hot spots
+on that one instance with timing wrappers, so a controller without
+metrics pays no per-call cost at all. login_async() is timed through its
+future and recorded under "login", KDF included.
+"""
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+
+# Latency buckets in seconds (Prometheus "le" bounds)
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+PRIVATE = ("_persist", "_save_loans")     # timed along with the public methods
+SKIPPED = ("enable_metrics", "disable_metrics", "export_metrics")
+_MISSING = object()
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound containing quantile q (coarse, for the diagnostics panel)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for i, n in enumerate(self.counts):
+            running += n
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self):
+        self.calls = {}
+        self.errors = {}
+        self.latency = {}
+        self._gauges = {}   # name -> zero-arg callable
+        self._caches = {}   # name -> zero-arg callable returning (hits, misses)
+        self._lock = threading.Lock()   # async logins report from the auth thread
+
+    def observe(self, method, seconds, error=False):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if error:
+                self.errors[method] = self.errors.get(method, 0) + 1
+            hist = self.latency.get(method)
+            if hist is None:
+                hist = self.latency[method] = Histogram()
+            hist.observe(seconds)
+
+    def gauge(self, name, fn):
+        self._gauges[name] = fn
+
+    def cache(self, name, fn):
+        self._caches[name] = fn
+
+    def snapshot(self):
+        gauges = {}
+        for name, fn in self._gauges.items():
+            try:
+                gauges[name] = fn()
+            except Exception:
+                gauges[name] = None
+        caches = {}
+        for name, fn in self._caches.items():
+            hits, misses = fn()
+            total = hits + misses
+            caches[name] = {"hits": hits, "misses": misses,
+                            "hit_rate": hits / total if total else 0.0}
+        methods = {}
+        for name, hist in self.latency.items():
+            methods[name] = {
+                "calls": self.calls.get(name, 0),
+                "errors": self.errors.get(name, 0),
+                "mean_ms": hist.sum / hist.count * 1000 if hist.count else 0.0,
+                "p99_ms": hist.quantile(0.99) * 1000,
+            }
+        return {"methods": methods, "gauges": gauges, "caches": caches}
+
+    # EXPORT
+    def to_prometheus(self, prefix="circuitcart"):
+        lines = [f"# TYPE {prefix}_calls_total counter"]
+        for m, n in sorted(self.calls.items()):
+            lines.append(f'{prefix}_calls_total{{method="{m}"}} {n}')
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for m, n in sorted(self.errors.items()):
+            lines.append(f'{prefix}_errors_total{{method="{m}"}} {n}')
+        lines.append(f"# TYPE {prefix}_latency_seconds histogram")
+        for m, hist in sorted(self.latency.items()):
+            running = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                running += n
+                lines.append(f'{prefix}_latency_seconds_bucket{{method="{m}",le="{bound}"}} {running}')
+            lines.append(f'{prefix}_latency_seconds_bucket{{method="{m}",le="+Inf"}} {hist.count}')
+            lines.append(f'{prefix}_latency_seconds_sum{{method="{m}"}} {hist.sum:.9f}')
+            lines.append(f'{prefix}_latency_seconds_count{{method="{m}"}} {hist.count}')
+        snap = self.snapshot()
+        for name, value in sorted(snap["gauges"].items()):
+            if value is not None:
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name} {value}")
+        if snap["caches"]:
+            lines.append(f"# TYPE {prefix}_cache_hits_total counter")
+            for name, c in sorted(snap["caches"].items()):
+                lines.append(f'{prefix}_cache_hits_total{{cache="{name}"}} {c["hits"]}')
+            lines.append(f"# TYPE {prefix}_cache_misses_total counter")
+            for name, c in sorted(snap["caches"].items()):
+                lines.append(f'{prefix}_cache_misses_total{{cache="{name}"}} {c["misses"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        # atomic swap so a scraper never reads a half-written file
+        os.replace(tmp, path)
+        return path
+
+
+def _is_failure(name, result):
+    # controller methods report failure as (False, "message"); the savers as
+    # False (a bare False elsewhere, e.g. reload_catalog, means "nothing to do")
+    if result is False:
+        return name in PRIVATE
+    return type(result) is tuple and len(result) == 2 and result[0] is False
+
+
+def public_methods(obj):
+    """Names of the public methods defined on obj's class (properties excluded)."""
+    return [name for name, value in inspect.getmembers(type(obj), inspect.isfunction)
+            if not name.startswith("_") and name not in SKIPPED]
+
+
+def _timed(name, fn, metrics, on):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not on:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            metrics.observe(name, time.perf_counter() - start, error=True)
+            raise
+        metrics.observe(name, time.perf_counter() - start, error=_is_failure(name, result))
+        return result
+    return wrapper
+
+
+def _timed_future(name, fn, metrics, on):
+    # the work happens on another thread: time submit -> done on the future
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        future = fn(*args, **kwargs)
+        if on:
+            start = time.perf_counter()
+
+            def done(f):
+                failed = f.cancelled() or f.exception() is not None or not f.result()
+                metrics.observe(name, time.perf_counter() - start, error=failed)
+            future.add_done_callback(done)
+        return future
+    return wrapper
+
+
+def instrument(obj, metrics, methods=None):
+    """
+    Shadow each method on this instance with a timing wrapper: by default
+    every public method plus PRIVATE. The wrappers are remembered on the
+    instance so uninstrument() removes exactly these.
+    """
+    names = public_methods(obj) + list(PRIVATE) if methods is None else methods
+    installed = obj.__dict__.setdefault("_metrics_wrappers", {})
+    on = [True]
+    for name in names:
+        fn = getattr(obj, name, None)
+        if not callable(fn) or name in installed:
+            continue
+        if name == "login_async":
+            wrapper = _timed_future("login", fn, metrics, on)
+        else:
+            wrapper = _timed(name, fn, metrics, on)
+        wrapper._metrics_on = on
+        installed[name] = (wrapper, obj.__dict__.get(name, _MISSING))
+        setattr(obj, name, wrapper)
+
+
+def uninstrument(obj):
+    """Remove the wrappers instrument() installed, leaving anyone else's in place."""
+    for name, (wrapper, previous) in obj.__dict__.pop("_metrics_wrappers", {}).items():
+        wrapper._metrics_on.clear()     # inert even if someone wrapped it after us
+        if obj.__dict__.get(name) is wrapper:
+            if previous is _MISSING:
+                del obj.__dict__[name]
+            else:
+                setattr(obj, name, previous)
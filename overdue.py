@@ -0,0 +1,68 @@
+# overdue.py
+"""
+Overdue detection for saved reminders.
+
+Each reminder's return_date is parsed once, when it is tracked, into the
+epoch second the loan becomes overdue (end of the return day, local time),
+and scheduled on a dsa_structures.TimerWheel. tick() only advances the
+wheel, so a periodic check costs O(1) amortized per loan instead of a
+rescan and re-parse of every reminder.
+"""
+import datetime
+import time
+
+from dsa_structures import TimerWheel
+
+TICK_SECONDS = 60
+
+
+def parse_due(return_date):
+    """'YYYY-MM-DD' (or ISO datetime) -> epoch seconds when the loan is overdue; None if unparseable."""
+    try:
+        if len(return_date) <= 10:
+            day = datetime.date.fromisoformat(return_date)
+            when = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time())
+        else:
+            when = datetime.datetime.fromisoformat(return_date)
+    except (TypeError, ValueError):
+        return None
+    return int(when.timestamp())
+
+
+class OverdueEngine:
+    def __init__(self, on_overdue, tick=TICK_SECONDS, clock=time.time):
+        self.on_overdue = on_overdue      # on_overdue(reminder, due_epoch)
+        self.clock = clock
+        self.wheel = TimerWheel(tick=tick, start=clock())
+        self._handles = {}                # id(reminder) -> wheel handle
+        self.fired = 0
+
+    def __len__(self):
+        return len(self._handles)
+
+    def track(self, reminder):
+        """Schedule a reminder dict; returned, already notified or undated reminders are ignored."""
+        if reminder.get("returned") or reminder.get("notified") or id(reminder) in self._handles:
+            return False
+        due = parse_due(reminder.get("return_date"))
+        if due is None:
+            return False
+        self._handles[id(reminder)] = self.wheel.schedule(due, (reminder, due))
+        return True
+
+    def untrack(self, reminder):
+        handle = self._handles.pop(id(reminder), None)
+        if handle is not None:
+            self.wheel.cancel(handle)
+
+    def is_tracked(self, reminder):
+        return id(reminder) in self._handles
+
+    def tick(self, now=None):
+        """Advance to now; calls on_overdue for each loan that just became overdue."""
+        expired = self.wheel.advance(self.clock() if now is None else now)
+        for reminder, due in expired:
+            self._handles.pop(id(reminder), None)
+            self.fired += 1
+            self.on_overdue(reminder, due)
+        return [reminder for reminder, _ in expired]
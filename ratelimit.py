@@ -0,0 +1,108 @@
+# ratelimit.py
+"""
+Admission control for the controller's write paths.
+
+Two layers, checked in order:
+
+  per user   a token bucket per (user, operation): a student can submit a
+             short burst, then one request every 1/rate seconds. Excess
+             calls are rejected straight away with a "try again in N s"
+             message; nothing is queued for them.
+  global     one bucket shared by every user's writes. When it runs dry the
+             call is shed with a "busy, try again in N s" message.
+
+Nothing ever waits here: admit() runs on the GUI (Tk main) thread, so a
+refused call returns at once and the student retries. Rejections are
+counted per operation (rejected / shed) so they show up next to the
+latency metrics.
+"""
+import math
+import threading
+import time
+
+# operation -> (tokens per second, burst)
+USER_LIMITS = {
+    "submit_borrow": (0.2, 3),
+    "return_items": (0.5, 5),
+    "undo": (0.5, 3),
+}
+GLOBAL_LIMIT = (200.0, 50)
+MAX_TRACKED = 10_000       # per-user buckets kept before refilled ones are pruned
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = now
+
+    def _refill(self, now):
+        if now > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def take(self, now):
+        """Spend one token; returns 0.0 on success, else seconds until one is available."""
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class AdmissionController:
+    def __init__(self, user_limits=None, global_limit=GLOBAL_LIMIT, clock=time.monotonic):
+        self.user_limits = dict(USER_LIMITS if user_limits is None else user_limits)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._users = {}          # (user key, op) -> TokenBucket
+        self._global = TokenBucket(*global_limit, clock()) if global_limit else None
+        self.admitted = {}
+        self.rejected = {}        # per-user limit hit
+        self.shed = {}            # global limit hit
+
+    def admit(self, op, user):
+        """(True, "") to go ahead, or (False, message) when the call is refused."""
+        with self._lock:
+            now = self.clock()
+            limit = self.user_limits.get(op)
+            if limit is not None:
+                key = (user, op)
+                bucket = self._users.get(key)
+                if bucket is None:
+                    if len(self._users) >= MAX_TRACKED:
+                        self._prune(now)
+                    bucket = self._users[key] = TokenBucket(*limit, now)
+                wait = bucket.take(now)
+                if wait:
+                    _bump(self.rejected, op)
+                    return False, f"Too many requests. Try again in {math.ceil(wait)} s."
+            if self._global is not None:
+                wait = self._global.take(now)
+                if wait:
+                    _bump(self.shed, op)
+                    if limit is not None:
+                        bucket.tokens += 1.0      # not the user's fault; refund
+                    return False, f"System busy. Please try again in {math.ceil(wait)} s."
+            _bump(self.admitted, op)
+        return True, ""
+
+    def _prune(self, now):
+        # a refilled bucket is the same as no bucket
+        for key in [k for k, b in self._users.items() if b.full(now)]:
+            del self._users[key]
+
+    def stats(self):
+        return {"admitted": dict(self.admitted), "rejected": dict(self.rejected),
+                "shed": dict(self.shed)}
+
+
+def _bump(counter, op):
+    counter[op] = counter.get(op, 0) + 1
@@ -0,0 +1,239 @@
+# receipts.py
+"""
+Receipt rendering and batch export.
+
+render_receipt_lines() is the single text layout used by the GUI overlay,
+the Messages tab and the exporters. export_receipts() renders thousands of
+receipts (end of term) in a process pool: receipts are read lazily from any
+iterable, sent to workers in chunks, and only a bounded number of chunks is
+in flight at once, so memory stays flat. Each worker writes its files
+straight to disk and returns only the paths.
+
+PIL is needed for png/pdf and is imported inside the workers; txt needs
+nothing.
+
+    python receipts.py user_settings.json receipts_out [--format png|pdf|txt] [--workers 4]
+"""
+import datetime
+import json
+import os
+import re
+import sys
+import time
+
+FORMATS = ("png", "pdf", "txt")
+CHUNK_SIZE = 64
+
+
+def render_receipt_lines(receipt):
+    return [
+        f"Borrower: {receipt['borrower_name']} (ID: {receipt.get('student_id') or ''})",
+        f"Email: {receipt.get('email') or ''}",
+        "Items borrowed:",
+    ] + list(receipt.get("items", [])) + [
+        f"Borrow date: {receipt['borrow_date']}",
+        f"Return deadline: {receipt['return_date']}",
+        f"Issued on: {receipt.get('issued_at', '')}",
+        "",
+        "Note: Present this receipt upon return.",
+    ]
+
+
+def receipts_from_reminders(reminders, auth=None, opened=None):
+    """
+    Receipt dicts for saved reminders (the records that carry borrow/return
+    dates). A reminder only names its owner, by uid (older ones by name),
+    so student ID and email come from the account in auth (an AuthSystem).
+    The issue time is the loan's: its borrow request in the owner's
+    history, else `opened` ({loan_id: epoch seconds}, the loans file).
+    """
+    users, issued = {}, {}
+    opened = opened or {}
+    for rem in reminders:
+        key = rem.get("uid") if rem.get("uid") is not None else rem.get("user")
+        if key not in users:
+            users[key] = _owner(auth, rem)
+            issued[key] = _request_times(users[key])
+        user = users[key]
+        loan = rem.get("loan")
+        at = issued[key].get(loan)
+        if at is None and loan in opened:
+            # UTC without an offset, like the requests' own timestamps
+            at = datetime.datetime.fromtimestamp(opened[loan], datetime.timezone.utc) \
+                .replace(tzinfo=None).isoformat()
+        yield {
+            "borrower_name": rem.get("user") or getattr(user, "name", ""),
+            "student_id": getattr(user, "student_id", None) or "",
+            "email": getattr(user, "email", None) or "",
+            "items": rem.get("items", []),
+            "borrow_date": rem.get("borrow_date", ""),
+            "return_date": rem.get("return_date", ""),
+            "issued_at": at or "",
+        }
+
+
+def _owner(auth, rem):
+    if auth is None:
+        return None
+    if rem.get("uid") is not None:
+        return auth.user_by_uid(rem["uid"])
+    users = auth.find_by_name(rem.get("user", ""))
+    return users[0] if len(users) == 1 else None
+
+
+def _request_times(user):
+    """{request id: timestamp} over the user's borrow history."""
+    times = {}
+    node = getattr(user, "history_head", None)
+    while node:
+        req = node.get("request") or {}
+        if req.get("id"):
+            times[req["id"]] = req.get("timestamp", "")
+        node = node.get("next")
+    return times
+
+
+# RENDERING (runs in worker processes)
+LINE_HEIGHT = 18
+MARGIN = 24
+WIDTH = 560
+
+
+def _render_image(lines):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (WIDTH, 2 * MARGIN + LINE_HEIGHT * (len(lines) + 2)), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([4, 4, img.width - 5, img.height - 5], outline="#fd4d4e", width=2)
+    draw.text((MARGIN, MARGIN), "CircuitCart Receipt", fill="#fd4d4e")
+    for k, line in enumerate(lines, start=2):
+        draw.text((MARGIN, MARGIN + k * LINE_HEIGHT), line, fill="black")
+    return img
+
+
+def write_receipt(receipt, path, fmt):
+    lines = render_receipt_lines(receipt)
+    if fmt == "txt":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        img = _render_image(lines)
+        img.save(path, "PDF" if fmt == "pdf" else "PNG")
+        img.close()
+    return path
+
+
+def _safe_name(text):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", str(text or "receipt"))[:40]
+
+
+def _render_chunk(chunk, out_dir, fmt):
+    written, errors = [], []
+    for seq, receipt in chunk:
+        path = os.path.join(out_dir, f"{seq:06d}_{_safe_name(receipt.get('student_id') or receipt.get('borrower_name'))}.{fmt}")
+        try:
+            written.append(write_receipt(receipt, path, fmt))
+        except Exception as e:  # one bad receipt must not sink the batch
+            errors.append((seq, str(e)))
+    return written, errors
+
+
+# BATCH EXPORT
+class ExportReport:
+    def __init__(self):
+        self.written = 0
+        self.errors = []      # (sequence number, message)
+        self.elapsed = 0.0
+
+    @property
+    def per_sec(self):
+        return self.written / self.elapsed if self.elapsed else 0.0
+
+
+def _chunks(receipts, size):
+    chunk = []
+    for seq, receipt in enumerate(receipts):
+        chunk.append((seq, receipt))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_receipts(receipts, out_dir, fmt="png", workers=None, chunk_size=CHUNK_SIZE,
+                    max_in_flight=None, on_progress=None):
+    """
+    Render every receipt to out_dir/<seq>_<id>.<fmt>. At most max_in_flight
+    chunks (default 2 per worker) are queued, so a generator of receipts is
+    never materialised. on_progress(written) is called as chunks finish.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    report = ExportReport()
+    t = time.perf_counter()
+
+    def collect(done):
+        for fut in done:
+            written, errors = fut.result()
+            report.written += len(written)
+            report.errors.extend(errors)
+        if on_progress:
+            on_progress(report.written)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for chunk in _chunks(receipts, chunk_size):
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(pool.submit(_render_chunk, chunk, out_dir, fmt))
+        collect(wait(in_flight)[0])
+    report.elapsed = time.perf_counter() - t
+    return report
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Export receipts for saved reminders")
+    parser.add_argument("settings", help="user_settings.json (reminders) or a .jsonl of receipt dicts")
+    parser.add_argument("out_dir")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--users", help="user database for student IDs and emails "
+                                        "(default: the app's own)")
+    args = parser.parse_args(argv)
+
+    if args.settings.endswith(".jsonl"):
+        def source():
+            with open(args.settings, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        receipts = source()
+    else:
+        from auth import AuthSystem
+        from user_store import SQLiteUserStore, default_store_path
+        with open(args.settings, encoding="utf-8") as f:
+            reminders = json.load(f).get("reminders", [])
+        try:
+            with open(os.path.splitext(args.settings)[0] + "_loans.json", encoding="utf-8") as f:
+                opened = {row[0]: row[3] for row in json.load(f)}
+        except (OSError, ValueError):
+            opened = {}
+        auth = AuthSystem(store=SQLiteUserStore(args.users or default_store_path()))
+        receipts = receipts_from_reminders(reminders, auth, opened)
+    report = export_receipts(receipts, args.out_dir, args.format, args.workers)
+    print(f"wrote {report.written} receipts in {report.elapsed:.2f}s "
+          f"({report.per_sec:,.0f}/s), {len(report.errors)} errors")
+    for seq, msg in report.errors[:10]:
+        print(f"  #{seq}: {msg}")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
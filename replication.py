@@ -0,0 +1,471 @@
+# replication.py
+"""
+Log-shipping replication between kiosks.
+
+The primary's controller is wrapped by Primary: every write operation
+(submit_borrow, return_items, undo, reserve_kit, set_loan_dates,
+expire_holds, reload_catalog) appends one journal entry describing its effect:
+
+    {"seq": 7, "op": "submit_borrow",
+     "items": {item: [stock, [[uid, units on loan], ...]]},
+     "cal":   [["book" | "cancel", {item: units}, start_day, end_day]]}
+
+Item state is absolute (the counts after the operation), calendar changes
+are deltas. The first entry is a full snapshot. Entries are appended to a
+JSONL journal file and can also be streamed to followers over a
+multiprocessing.connection socket (JournalServer).
+
+The journal file is appended to across restarts (seq carries on). Every
+snapshot - one at each start, then one every COMPACT_EVERY entries -
+replaces the file with just that snapshot, so the file and a new
+follower's catch-up stay bounded. Only the last MEMORY_TAIL entries are
+kept in memory; a socket follower further behind is served from the file
+(or, without one, from the latest snapshot).
+
+A Follower wraps a controller on another kiosk: it applies entries in seq
+order from a FileTail (shared directory) or SocketTail, answers search /
+availability / on-loan / free_between from replicated state, and refuses
+writes.
+
+Socket peers authenticate with a shared secret from the
+CIRCUITCART_JOURNAL_KEY environment variable (or "journal_key" in
+user_settings.json); only JSON is ever read off the wire.
+
+    python main.py --journal /mnt/lab/journal.jsonl --serve 0.0.0.0:6100   # primary kiosk
+    python main.py --follow /mnt/lab/journal.jsonl                         # follower kiosk
+    python main.py --follow 192.168.1.10:6100
+    python replication.py follow 192.168.1.10:6100                         # headless check
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from multiprocessing import AuthenticationError
+
+from reservations import ReservationCalendar
+
+WRITE_OPS = ("submit_borrow", "return_items", "undo", "reserve_kit", "set_loan_dates",
+             "expire_holds", "reload_catalog")
+READ_ONLY_OPS = WRITE_OPS + ("save_kit", "register", "import_users", "join_waitlist",
+                             "leave_waitlist", "add_reminder", "change_username",
+                             "change_password", "clear_history")
+KEY_ENV = "CIRCUITCART_JOURNAL_KEY"
+MEMORY_TAIL = 10_000       # journal entries kept in memory for socket followers
+COMPACT_EVERY = 5_000      # entries after which the primary writes a snapshot and truncates
+RECONNECT_MAX = 30.0       # seconds, cap of SocketTail's reconnect backoff
+
+
+def journal_authkey(settings=None):
+    """Shared secret for JournalServer / SocketTail; raises if none is configured."""
+    key = os.environ.get(KEY_ENV) or (settings or {}).get("journal_key")
+    if not key:
+        raise RuntimeError(f"Set {KEY_ENV} (or journal_key in the settings) to the same "
+                           "secret on the primary and every follower.")
+    return key.encode("utf-8") if isinstance(key, str) else key
+
+
+# JOURNAL
+class Journal:
+    """
+    JSONL journal file (optional) plus the last `tail` entries in memory.
+    An existing file is appended to and its seq numbers continue; a
+    snapshot entry replaces the file's contents.
+    """
+
+    def __init__(self, path=None, tail=MEMORY_TAIL):
+        self.path = path
+        self.entries = deque(maxlen=tail)
+        self.seq = _recover(path) if path else 0
+        self.since_snapshot = 0
+        self._snapshot = None
+        self._cond = threading.Condition()
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def append(self, entry):
+        with self._cond:
+            self.seq += 1
+            entry["seq"] = self.seq
+            self.entries.append(entry)
+            line = json.dumps(entry, ensure_ascii=False) + "\n"
+            if entry["op"] == "snapshot":
+                self._snapshot, self.since_snapshot = entry, 0
+                if self._file:
+                    self._truncate(line)
+            else:
+                self.since_snapshot += 1
+                if self._file:
+                    self._file.write(line)
+                    self._file.flush()
+            self._cond.notify_all()
+        return entry["seq"]
+
+    def _truncate(self, line, attempts=5):
+        """Replace the file with the single snapshot line (FileTails notice the new file)."""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(line)
+        self._file.close()
+        try:
+            for attempt in range(attempts):
+                try:
+                    os.replace(tmp, self.path)
+                    break
+                except PermissionError:
+                    # Windows: a follower has the file open for the instant it reads it
+                    if attempt == attempts - 1:
+                        raise
+                    time.sleep(0.05)
+        finally:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def since(self, seq, timeout=None):
+        """Entries after seq, waiting up to timeout for the first one."""
+        with self._cond:
+            if self.seq <= seq and timeout:
+                self._cond.wait_for(lambda: self.seq > seq, timeout)
+            first = self.entries[0]["seq"] if self.entries else self.seq + 1
+            if seq + 1 >= first:
+                return list(itertools.islice(self.entries, seq + 1 - first, None))
+        if not self.path:
+            snap = self._snapshot
+            first = self.entries[0]["seq"] if self.entries else self.seq + 1
+            if snap is None or snap["seq"] < first:
+                raise LookupError(f"journal entries after {seq} are no longer in memory")
+            return list(itertools.islice(self.entries, snap["seq"] - first, None))
+        # a follower that fell behind the in-memory tail reads from the file
+        with open(self.path, "rb") as f:
+            out = [json.loads(line) for line in f if line.endswith(b"\n")]
+        return [e for e in out if e["seq"] > seq]
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def _recover(path):
+    """Last seq in an existing journal file; a torn final line is cut off."""
+    if not os.path.exists(path):
+        return 0
+    last, good = None, 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            good += len(line)
+            if line.strip():
+                last = line
+    if good != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good)
+    return json.loads(last)["seq"] if last else 0
+
+
+# PRIMARY
+class Primary:
+    def __init__(self, controller, journal):
+        self.c = controller
+        self.journal = journal
+        self._depth = 0
+        self._touched = set()
+        self._cal = []
+        self._wrap()
+        self.snapshot()
+
+    def _item_state(self, item):
+        holders = self.c.loans.holders(item)
+        return [self.c.availability.get(item, 0), [[uid, n] for uid, n in holders.items()]]
+
+    def snapshot(self):
+        c = self.c
+        cal = []
+        for rem in c.reminders:
+            span = _span(rem)
+            if span and not rem.get("returned"):
+                cal.append(["book", dict(Counter(rem.get("items", []))), *span])
+        return self.journal.append({
+            "op": "snapshot",
+            "items": {item: self._item_state(item) for item in c.all_items},
+            "cal": cal,
+        })
+
+    def _wrap(self):
+        c = self.c
+
+        def op(name, fn):
+            def wrapper(*args, **kwargs):
+                self._depth += 1
+                try:
+                    result = fn(*args, **kwargs)
+                finally:
+                    self._depth -= 1
+                if not self._depth:
+                    self._emit(name, result)
+                    if self.journal.since_snapshot >= COMPACT_EVERY:
+                        self.snapshot()
+                return result
+            return wrapper
+
+        def touch(fn):
+            def wrapper(items):
+                self._touched.update(items)
+                return fn(items)
+            return wrapper
+
+        def touch_loan(fn):
+            def wrapper(loan, item, n):
+                self._touched.add(item)
+                return fn(loan, item, n)
+            return wrapper
+
+        def cal(kind, fn):
+            def wrapper(items, start, end, *rest, **kwargs):
+                out = fn(items, start, end, *rest, **kwargs)
+                if kind == "cancel" or out[0]:
+                    self._cal.append([kind, dict(Counter(items)), start, end])
+                return out
+            return wrapper
+
+        for name in WRITE_OPS:
+            setattr(c, name, op(name, getattr(c, name)))
+        for name in ("_take_stock", "_release_stock", "_retake_stock"):
+            setattr(c, name, touch(getattr(c, name)))
+        c.loans._add_units = touch_loan(c.loans._add_units)
+        c.calendar.book = cal("book", c.calendar.book)
+        c.calendar.cancel = cal("cancel", c.calendar.cancel)
+
+    def _emit(self, name, result):
+        touched, cal = self._touched, self._cal
+        self._touched, self._cal = set(), []
+        if name == "reload_catalog":
+            if result:
+                self.snapshot()
+            return
+        if not touched and not cal:
+            return
+        self.journal.append({"op": name,
+                             "items": {item: self._item_state(item) for item in touched},
+                             "cal": cal})
+
+
+def _span(rem):
+    from app_controller import _day_span
+    span = _day_span(rem.get("borrow_date"), rem.get("return_date"))
+    return span if span and span[0] <= span[1] else None
+
+
+class JournalServer:
+    """
+    Streams a Journal to followers over multiprocessing.connection: a
+    follower connects, sends the last seq it applied and then receives
+    every later entry as it is appended.
+    """
+
+    def __init__(self, journal, authkey, address=("localhost", 0)):
+        from multiprocessing.connection import Listener
+        self.journal = journal
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self._stop = threading.Event()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._stop.is_set():
+                    return
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            # never conn.recv(): that unpickles whatever the peer sends
+            seq = json.loads(conn.recv_bytes(64))
+            if type(seq) is not int:
+                return
+            while not self._stop.is_set():
+                for entry in self.journal.since(seq, timeout=0.5):
+                    conn.send_bytes(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+                    seq = entry["seq"]
+        except (OSError, EOFError, ValueError, LookupError):
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self._stop.set()
+        self.listener.close()
+
+
+# FOLLOWER SOURCES
+class FileTail:
+    """New complete lines of a journal file on a shared directory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self._ino = None
+        self._partial = b""
+
+    def read(self, seq=0, timeout=0):
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return []
+        with f:
+            st = os.fstat(f.fileno())
+            if st.st_ino != self._ino or st.st_size < self.offset:
+                # the primary compacted (or restarted) the journal: a new file
+                self.offset, self._ino, self._partial = 0, st.st_ino, b""
+            if st.st_size == self.offset:
+                return []
+            f.seek(self.offset)
+            data = self._partial + f.read(st.st_size - self.offset)
+        self.offset = st.st_size
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        return [json.loads(line) for line in lines if line]
+
+
+class SocketTail:
+    """
+    Entries streamed by a JournalServer. A refused or broken connection is
+    closed and retried on a later read, backing off up to RECONNECT_MAX.
+    """
+
+    def __init__(self, address, authkey, clock=time.monotonic):
+        self.address = address
+        self.authkey = authkey
+        self.conn = None
+        self.clock = clock
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+    def read(self, seq=0, timeout=0):
+        from multiprocessing.connection import Client
+        out = []
+        try:
+            if self.conn is None:
+                if self.clock() < self._retry_at:
+                    return []
+                self.conn = Client(self.address, authkey=self.authkey)
+                self.conn.send_bytes(json.dumps(seq).encode("utf-8"))
+            while self.conn.poll(timeout if not out else 0):
+                out.append(json.loads(self.conn.recv_bytes()))
+        except (OSError, EOFError, AuthenticationError):
+            self.close()
+            self._backoff = min(max(self._backoff * 2, 1.0), RECONNECT_MAX)
+            self._retry_at = self.clock() + self._backoff
+            return out          # entries received before the break are still good
+        self._backoff = 0.0
+        return out
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# FOLLOWER
+class Follower:
+    def __init__(self, controller, source):
+        self.c = controller
+        self.source = source
+        self.seq = 0
+        self.holders = {}       # item -> {uid: units on loan}
+        self._read_only()
+
+    def _read_only(self):
+        c = self.c
+        for name in READ_ONLY_OPS:
+            if hasattr(c, name):
+                setattr(c, name, _refuse)
+        c.on_loan = lambda item: sum(self.holders.get(item, {}).values())
+        c.who_has = lambda item: dict(self.holders.get(item, {}))
+
+    def pump(self, timeout=0):
+        """Apply whatever the primary has shipped since the last call; returns how many entries."""
+        applied = 0
+        for entry in self.source.read(self.seq, timeout):
+            if entry["op"] == "snapshot":
+                self._reset()
+            elif entry["seq"] <= self.seq:
+                continue
+            self.apply(entry)
+            applied += 1
+        return applied
+
+    def _reset(self):
+        self.holders = {}
+        self.c.calendar = ReservationCalendar(self.c._capacity)
+
+    def apply(self, entry):
+        avail = self.c.availability
+        for item, (stock, holders) in entry["items"].items():
+            avail[item] = stock
+            if holders:
+                self.holders[item] = {uid: n for uid, n in holders}
+            else:
+                self.holders.pop(item, None)
+        cal = self.c.calendar
+        for kind, items, start, end in entry["cal"]:
+            if kind == "book":
+                cal.book(items, start, end, force=True)
+            else:
+                cal.cancel(items, start, end)
+        self.seq = entry["seq"]
+
+
+def _refuse(*args, **kwargs):
+    return False, "Read-only replica: use the primary kiosk for this."
+
+
+def parse_address(text):
+    host, port = text.rsplit(":", 1)
+    return host, int(port)
+
+
+def source_for(target, settings=None):
+    """FileTail for a journal path, SocketTail for host:port."""
+    if os.path.exists(target) or not target.rpartition(":")[2].isdigit():
+        return FileTail(target)
+    return SocketTail(parse_address(target), journal_authkey(settings))
+
+
+def start_primary(controller, journal_path=None, listen=None):
+    """Journal controller's writes; optionally stream them on listen ("host:port"). Returns (primary, server)."""
+    journal = Journal(journal_path)
+    primary = Primary(controller, journal)
+    server = None
+    if listen:
+        server = JournalServer(journal, journal_authkey(controller.settings), parse_address(listen))
+    return primary, server
+
+
+def main(argv=None):
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Follow a primary kiosk's journal (read-only replica)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_follow = sub.add_parser("follow")
+    p_follow.add_argument("source", help="journal file on a shared directory, or host:port")
+    p_follow.add_argument("--interval", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    from app_controller import CircuitLendController
+    c = CircuitLendController()
+    follower = Follower(c, source_for(args.source, c.settings))
+    while True:
+        n = follower.pump(timeout=args.interval)
+        if n:
+            print(f"applied {n} entries (seq {follower.seq})")
+        elif isinstance(follower.source, FileTail):
+            time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # requests.py
 import datetime
+import uuid
 
 def reason_to_priority(reason):
     mapping = {"emergency": 0, "urgent": 1, "normal": 2, "low": 3}
@@ -7,6 +8,7 @@ def reason_to_priority(reason):
 
 def make_request(user, items, reason="normal", id_deposit=True):
     return {
+        "id": uuid.uuid4().hex[:16],
         "user": {"name": getattr(user, "name", str(user)), "student_id": getattr(user, "student_id", None)},
         "items": list(items),
         "reason": reason,
@@ -0,0 +1,147 @@
+# reservations.py
+"""
+Reservation calendar per item.
+
+Bookings are day ranges [start, end] (inclusive, as date.toordinal() day
+numbers). Each item has a dynamic segment tree over day numbers with
+range-add / range-max, so "max concurrent reservations of X in [d1, d2]"
+and booking a range both cost O(log D) (D = 2**DAY_BITS days), with nodes
+only allocated along the paths that bookings touch.
+
+The controller rebuilds the calendar on start-up from dated reminders and
+open undated loans (booked from today to OPEN_END until returned), so
+nothing extra is persisted.
+"""
+import datetime
+from collections import Counter
+
+DAY_BITS = 20          # day numbers up to ~1M (year 2870)
+OPEN_END = (1 << DAY_BITS) - 1     # last day; undated loans are booked up to here
+
+
+def day_number(value):
+    """'YYYY-MM-DD' / date / datetime -> proleptic ordinal day; None if unparseable."""
+    if isinstance(value, datetime.datetime):
+        return value.date().toordinal()
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    try:
+        return datetime.date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+class RangeMaxTree:
+    """
+    Lazily allocated segment tree: add(v) over a range, max over a range.
+    A node's max already includes its own pending add; children are never
+    pushed down, a missing child simply contributes 0.
+    """
+
+    def __init__(self, bits=DAY_BITS):
+        self.size = 1 << bits
+        # parallel lists; index 0 is the root, child index 0 means "absent"
+        self._left = [0]
+        self._right = [0]
+        self._max = [0]
+        self._add = [0]
+
+    def _child(self, node, right):
+        links = self._right if right else self._left
+        child = links[node]
+        if not child:
+            child = len(self._max)
+            self._left.append(0)
+            self._right.append(0)
+            self._max.append(0)
+            self._add.append(0)
+            links[node] = child
+        return child
+
+    def add(self, lo, hi, value):
+        self._update(0, 0, self.size - 1, lo, hi, value)
+
+    def _update(self, node, l, r, lo, hi, value):
+        if lo <= l and r <= hi:
+            self._max[node] += value
+            self._add[node] += value
+            return
+        mid = (l + r) >> 1
+        if lo <= mid:
+            self._update(self._child(node, False), l, mid, lo, hi, value)
+        if hi > mid:
+            self._update(self._child(node, True), mid + 1, r, lo, hi, value)
+        left, right = self._left[node], self._right[node]
+        self._max[node] = self._add[node] + max(self._max[left] if left else 0,
+                                                self._max[right] if right else 0)
+
+    def max(self, lo, hi):
+        return self._query(0, 0, self.size - 1, lo, hi)
+
+    def _query(self, node, l, r, lo, hi):
+        if lo <= l and r <= hi:
+            return self._max[node]
+        mid = (l + r) >> 1
+        parts = []
+        if lo <= mid:
+            left = self._left[node]
+            parts.append(self._query(left, l, mid, lo, hi) if left else 0)
+        if hi > mid:
+            right = self._right[node]
+            parts.append(self._query(right, mid + 1, r, lo, hi) if right else 0)
+        return self._add[node] + max(parts)
+
+    def __len__(self):
+        return len(self._max)
+
+
+class ReservationCalendar:
+    """Per-item trees; capacity(item) gives the number of units that exist."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._trees = {}
+        self.bookings = 0
+
+    def _tree(self, item):
+        tree = self._trees.get(item)
+        if tree is None:
+            tree = self._trees[item] = RangeMaxTree()
+        return tree
+
+    def reserved(self, item, start, end):
+        """Max concurrent units of item reserved on any day in [start, end]."""
+        tree = self._trees.get(item)
+        return tree.max(start, end) if tree else 0
+
+    def free(self, item, start, end):
+        return self.capacity(item) - self.reserved(item, start, end)
+
+    def first_short(self, items, start, end):
+        """First item that cannot take its units in [start, end], or None."""
+        counts = items if isinstance(items, Counter) else Counter(items)
+        for item, n in counts.items():
+            if self.reserved(item, start, end) + n > self.capacity(item):
+                return item
+        return None
+
+    def book(self, items, start, end, force=False):
+        """
+        Reserve one unit per listed item for [start, end], all or nothing.
+        Returns (ok, short_item). force=True skips the capacity check
+        (used when replaying existing loans).
+        """
+        counts = Counter(items)
+        if not force:
+            short = self.first_short(counts, start, end)
+            if short is not None:
+                return False, short
+        for item, n in counts.items():
+            self._tree(item).add(start, end, n)
+        self.bookings += 1
+        return True, None
+
+    def cancel(self, items, start, end):
+        for item, n in Counter(items).items():
+            self._tree(item).add(start, end, -n)
+        self.bookings -= 1
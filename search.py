@@ -0,0 +1,179 @@
+# search.py
+"""
+Typo-tolerant catalog search.
+
+Every item's id and title are folded once into a normalised key
+(NFKD, accents dropped, Ω -> ohm, µ -> u, case-folded, punctuation as
+spaces) and split into tokens. Distinct tokens go into a BK-tree
+(dsa_structures.BKTree) for bounded edit-distance lookup and into a sorted
+list for prefix lookup (the last token of a query is usually unfinished).
+
+A query matches an item when every query token matches one of the item's
+tokens exactly, as a prefix, or within max_typos(token) edits. Results are
+ranked by total edit distance, then exact/prefix quality, then
+catalog order.
+"""
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import OrderedDict
+
+from dsa_structures import BKTree
+
+# applied after NFKD (which maps the ohm sign to Greek omega, micro to mu)
+_SYMBOLS = {"Ω": " ohm ", "μ": "u", "µ": "u"}
+_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(_SYMBOLS.get(ch, ch) for ch in text if not unicodedata.combining(ch))
+    return " ".join(t for t in _SPLIT.split(text.casefold()) if t)
+
+
+def tokens(text):
+    return normalize(text).split()
+
+
+def max_typos(token):
+    # numbers (part numbers, values) are never "close enough"
+    if len(token) <= 3 or not token.isalpha():
+        return 0
+    return 1 if len(token) <= 6 else 2
+
+
+class FuzzyIndex:
+    def __init__(self, records):
+        """records: iterable of dicts with "id" and optional "title" (catalog records)."""
+        self.ids = []
+        self.keys = []                # normalised key per item
+        self._postings = {}           # token -> [item index]
+        for rec in records:
+            i = len(self.ids)
+            self.ids.append(rec["id"])
+            key = normalize(f"{rec['id']} {rec.get('title') or ''}")
+            self.keys.append(key)
+            for tok in set(key.split()):
+                self._postings.setdefault(tok, []).append(i)
+        self._sorted = sorted(self._postings)
+        self._tree = BKTree(t for t in self._sorted if max_typos(t))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _candidates(self, qtok, allow_prefix):
+        """{token: cost} of index tokens matching one query token."""
+        found = {}
+        k = max_typos(qtok)
+        if k:
+            for d, tok in self._tree.search(qtok, k):
+                found[tok] = float(d)
+        elif qtok in self._postings:
+            found[qtok] = 0.0
+        if allow_prefix:
+            # abbreviated/unfinished word: tokens starting with it, slightly behind exact hits
+            lo = bisect.bisect_left(self._sorted, qtok)
+            for tok in self._sorted[lo:lo + 2000]:
+                if not tok.startswith(qtok):
+                    break
+                if tok not in found:
+                    found[tok] = 0.5
+        return found
+
+    def search(self, q, limit=50):
+        """Ranked item ids for q (best first)."""
+        qtoks = tokens(q)
+        if not qtoks:
+            return []
+        per_token = []
+        for qtok in qtoks:
+            best = {}
+            # highest cost first so cheaper matches overwrite (dict.update runs in C)
+            found = self._candidates(qtok, allow_prefix=len(qtok) > 1)
+            for tok in sorted(found, key=found.get, reverse=True):
+                best.update(dict.fromkeys(self._postings[tok], found[tok]))
+            if not best:
+                return []
+            per_token.append(best)
+        per_token.sort(key=len)
+        scores = per_token[0]
+        for best in per_token[1:]:
+            scores = {i: s + best[i] for i, s in scores.items() if i in best}
+            if not scores:
+                return []
+        qkey = " ".join(qtoks)
+        ranked = heapq.nsmallest(limit, scores, key=lambda i: (scores[i], qkey not in self.keys[i], i))
+        return [self.ids[i] for i in ranked]
+
+
+
+# SEARCH-AS-YOU-TYPE
+class QueryCache:
+    """LRU of query -> result list, emptied whenever the catalog version moves."""
+
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self.version = None
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        if version != self.version:
+            self._data.clear()
+            self.version = version
+        found = self._data.get(key)
+        if found is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return found
+
+    def put(self, key, version, results):
+        if version != self.version:
+            self._data.clear()
+            self.version = version
+        self._data[key] = results
+        self._data.move_to_end(key)
+        if len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+
+
+class SearchSession:
+    """
+    One search box. update(q) is called per keystroke: a query that extends
+    the previous one only filters the previous results (substring matches
+    of the longer query are a subset); anything else goes to the cache and
+    then a full search. Fuzzy results are not monotonic, so fuzzy sessions
+    use the cache only.
+    """
+
+    def __init__(self, controller, fuzzy=False, cache=None):
+        self.c = controller
+        self.fuzzy = fuzzy
+        self.cache = cache if cache is not None else QueryCache()
+        self._prev_q = None
+        self._prev = None         # result ids of the previous query
+        self._version = None
+        self._lower = {}          # id -> lower-cased id, per catalog version
+
+    def update(self, q):
+        version = self.c.catalog_version
+        if version != self._version:
+            self._prev, self._lower = None, {}
+        ql = q.lower()
+        key = ("fuzzy" if self.fuzzy else "substr", ql)
+        results = self.cache.get(key, version)
+        if results is None:
+            if not self.fuzzy and self._prev is not None and ql.startswith(self._prev_q):
+                if not self._lower:
+                    self._lower = {it: it.lower() for it in self.c.all_items}
+                lower = self._lower
+                results = [it for it in self._prev if ql in lower[it]]
+            else:
+                results = self.c.search_items(q, fuzzy=self.fuzzy)
+            self.cache.put(key, version, results)
+        self._prev_q, self._prev, self._version = ql, results, version
+        return list(results)
@@ -0,0 +1,132 @@
+# sessions.py
+"""
+Per-user session state.
+
+A Session holds what used to be global on the controller: the logged-in
+user, their cart, their undo history and a small dict of screen state the
+GUI can stash (last search, scroll position...). SessionManager keeps
+sessions in an OrderedDict keyed by token in least-recently-used order:
+
+    get(token)   O(1) lookup; touching moves it to the back
+    expire()     drops idle sessions from the front until one is still live
+    open()       evicts from the front once max_sessions is reached
+
+A user logging in again gets their existing session back (cart intact)
+under the new token.
+"""
+import time
+from collections import OrderedDict
+
+IDLE_TIMEOUT = 30 * 60     # seconds without activity before a session is dropped
+MAX_SESSIONS = 500
+
+
+class Session:
+    __slots__ = ("token", "user", "cart", "undo_stack", "screen", "last_seen")
+
+    def __init__(self, token, user, cart, undo_stack, now):
+        self.token = token
+        self.user = user
+        self.cart = cart
+        self.undo_stack = undo_stack
+        self.screen = {}
+        self.last_seen = now
+
+
+def _user_key(user):
+    uid = getattr(user, "uid", None)
+    return uid if uid is not None else id(user)
+
+
+class SessionManager:
+    def __init__(self, new_cart, new_undo, idle_timeout=IDLE_TIMEOUT,
+                 max_sessions=MAX_SESSIONS, clock=time.monotonic, on_drop=None):
+        """new_cart/new_undo build empty per-session structures; on_drop(session) runs on expiry/eviction."""
+        self.new_cart = new_cart
+        self.new_undo = new_undo
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.on_drop = on_drop
+        self._by_token = OrderedDict()    # token -> Session, least recently used first
+        self._by_user = {}                # user key -> Session
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._by_token)
+
+    def __contains__(self, token):
+        return token in self._by_token
+
+    def open(self, user, token):
+        """Session for user under token; an existing session for the same user is re-keyed."""
+        now = self.clock()
+        session = self._by_user.get(_user_key(user))
+        if session is not None and now - session.last_seen > self.idle_timeout:
+            self._drop(session)
+            self.expired += 1
+            session = None
+        if session is None:
+            self.expire(now)
+            while len(self._by_token) >= self.max_sessions:
+                self._drop(next(iter(self._by_token.values())))
+                self.evicted += 1
+            session = Session(token, user, self.new_cart(), self.new_undo(), now)
+            self._by_user[_user_key(user)] = session
+        else:
+            self._by_token.pop(session.token, None)
+            session.user = user
+            session.token = token
+            session.last_seen = now
+        self._by_token[token] = session
+        return session
+
+    def get(self, token):
+        """Live session for token (marked as used), or None."""
+        session = self._by_token.get(token)
+        if session is None:
+            return None
+        now = self.clock()
+        if now - session.last_seen > self.idle_timeout:
+            self._drop(session)
+            self.expired += 1
+            return None
+        session.last_seen = now
+        self._by_token.move_to_end(token)
+        return session
+
+    def for_user(self, user):
+        return self._by_user.get(_user_key(user))
+
+    def rekey(self, session, token):
+        """Move session to a new token (e.g. reissued after a password change)."""
+        self._by_token.pop(session.token, None)
+        session.token = token
+        self._by_token[token] = session
+
+    def close(self, token):
+        session = self._by_token.get(token)
+        if session is not None:
+            self._drop(session)
+        return session
+
+    def expire(self, now=None):
+        """Drop sessions idle for longer than idle_timeout; returns them."""
+        now = self.clock() if now is None else now
+        dropped = []
+        while self._by_token:
+            session = next(iter(self._by_token.values()))
+            if now - session.last_seen <= self.idle_timeout:
+                break
+            self._drop(session)
+            dropped.append(session)
+        self.expired += len(dropped)
+        return dropped
+
+    def _drop(self, session):
+        self._by_token.pop(session.token, None)
+        if self._by_user.get(_user_key(session.user)) is session:
+            del self._by_user[_user_key(session.user)]
+        if self.on_drop:
+            self.on_drop(session)
@@ -0,0 +1,172 @@
+# shared_stock.py
+"""
+Availability counters in multiprocessing.shared_memory for multi-process
+deployments (several kiosks / workers on one box).
+
+SharedAvailability behaves like the availability dict (item -> units) but
+its counters live in one int64 array indexed by catalog position, so every
+attached process sees the same stock. Mutations go through striped
+multiprocessing locks; try_take_many() is an all-or-nothing
+compare-and-decrement across several items, taken in stripe order so two
+processes can never deadlock.
+
+The creating process passes handle() to children (Process args / pool
+initializer); children call SharedAvailability.attach(handle). The locks
+are plain multiprocessing.Lock objects, which only reach a process by
+inheritance: an unrelated process cannot attach by the shared memory name
+alone, so kiosks sharing stock must be started from one parent.
+
+Catalog stock edits are deltas against the whole fleet's counters, so they
+are applied once: the segment also holds the stamp (catalog fingerprint) its
+counters were last adjusted for, and apply_catalog_delta() only applies an
+edit made from that stamp, under its own lock. The other processes reloading
+the same edit find the new stamp already there and skip it.
+"""
+from collections.abc import MutableMapping
+from multiprocessing import Lock, shared_memory
+
+ITEM_BYTES = 8  # int64 counters
+
+
+class SharedAvailability(MutableMapping):
+    def __init__(self, shm, items, locks, stamp_lock, owner=False):
+        self._shm = shm
+        self._items = list(items)
+        self._index = {it: i for i, it in enumerate(self._items)}
+        self._locks = locks
+        self._stamp_lock = stamp_lock
+        self._owner = owner
+        # one counter per item, then the catalog stamp
+        self._counts = shm.buf[:(len(self._items) + 1) * ITEM_BYTES].cast("q")
+
+    @classmethod
+    def create(cls, items, initial, name=None, stripes=16, stamp=0):
+        """stamp: fingerprint of the catalog initial was read from (0 = unknown)."""
+        items = list(items)
+        shm = shared_memory.SharedMemory(name=name, create=True,
+                                         size=(len(items) + 1) * ITEM_BYTES)
+        locks = [Lock() for _ in range(max(1, stripes))]
+        sa = cls(shm, items, locks, Lock(), owner=True)
+        for i, it in enumerate(items):
+            sa._counts[i] = int(initial.get(it, 0))
+        sa._counts[len(items)] = stamp
+        return sa
+
+    def handle(self):
+        """Picklable (name, items, locks, stamp lock) for SharedAvailability.attach in a child process."""
+        return self._shm.name, self._items, self._locks, self._stamp_lock
+
+    @classmethod
+    def attach(cls, handle):
+        name, items, locks, stamp_lock = handle
+        return cls(shared_memory.SharedMemory(name=name), items, locks, stamp_lock)
+
+    def close(self):
+        self._counts.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    # MAPPING API
+    def _slot(self, item):
+        i = self._index.get(item)
+        if i is None:
+            raise KeyError(item)
+        return i
+
+    def _lock_for(self, i):
+        return self._locks[i % len(self._locks)]
+
+    def __getitem__(self, item):
+        return self._counts[self._slot(item)]
+
+    def __setitem__(self, item, value):
+        i = self._slot(item)
+        with self._lock_for(i):
+            self._counts[i] = int(value)
+
+    def __delitem__(self, item):
+        raise TypeError("shared availability slots are fixed by the catalog")
+
+    def __contains__(self, item):
+        return item in self._index
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    # ATOMIC OPERATIONS
+    def compare_and_decrement(self, item, expected, n=1):
+        i = self._slot(item)
+        with self._lock_for(i):
+            if self._counts[i] != expected or expected < n:
+                return False
+            self._counts[i] = expected - n
+            return True
+
+    def _locked(self, counts):
+        slots = {self._slot(it): n for it, n in counts.items()}
+        stripes = sorted({i % len(self._locks) for i in slots})
+        return slots, [self._locks[s] for s in stripes]
+
+    def try_take_many(self, counts):
+        """Take counts[item] units of every item, or nothing. Returns (ok, short_item)."""
+        slots, locks = self._locked(counts)
+        for lk in locks:
+            lk.acquire()
+        try:
+            for i, n in slots.items():
+                if self._counts[i] < n:
+                    return False, self._items[i]
+            for i, n in slots.items():
+                self._counts[i] -= n
+            return True, None
+        finally:
+            for lk in reversed(locks):
+                lk.release()
+
+    def release_many(self, counts):
+        slots, locks = self._locked(counts)
+        for lk in locks:
+            lk.acquire()
+        try:
+            for i, n in slots.items():
+                self._counts[i] += n
+        finally:
+            for lk in reversed(locks):
+                lk.release()
+
+    @property
+    def stamp(self):
+        return self._counts[len(self._items)]
+
+    def apply_catalog_delta(self, old_stamp, new_stamp, deltas):
+        """
+        Shift counters by deltas[item] (new stock - old stock) for a catalog
+        edit from old_stamp to new_stamp, unless another process already
+        has. Applied when the shared stamp is old_stamp (or 0, never
+        stamped); returns True if this call applied it.
+        """
+        slot = len(self._items)
+        with self._stamp_lock:
+            if self._counts[slot] not in (old_stamp, 0) or old_stamp == new_stamp:
+                return False
+            known = {it: n for it, n in deltas.items() if it in self._index}
+            self.release_many({it: n for it, n in known.items() if n > 0})
+            self.take_up_to_many({it: -n for it, n in known.items() if n < 0})
+            self._counts[slot] = new_stamp
+            return True
+
+    def take_up_to_many(self, counts):
+        """Decrement without going below zero (used to re-apply an undone return)."""
+        slots, locks = self._locked(counts)
+        for lk in locks:
+            lk.acquire()
+        try:
+            for i, n in slots.items():
+                self._counts[i] = max(0, self._counts[i] - n)
+        finally:
+            for lk in reversed(locks):
+                lk.release()
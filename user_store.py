@@ -0,0 +1,280 @@
+# user_store.py
+"""
+Pluggable storage for users and their borrow history.
+
+Both stores expose the same small API used by AuthSystem:
+    get_by_email(email_key) / get_by_id(student_id) / get_by_uid(uid) -> User or None
+    find_by_name(name_key) -> [User]
+    add_many(users), update(user), count()
+    append_history(user, request), clear_history(user)
+
+Email and name lookups take keys normalised with norm_email / norm_name.
+The SQLite store keeps history rows as binary codec.py records.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from codec import RequestCodec, RequestView, StringTable
+from requests import append_history
+
+
+def norm_email(email):
+    return email.strip().lower() if email else email
+
+
+def norm_name(name):
+    return name.strip().casefold()
+
+
+# IN-MEMORY STORE (tests / benchmarks)
+class MemoryUserStore:
+    def __init__(self):
+        self.users = []
+        self.by_email = {}    # lower-cased email -> User
+        self.by_id = {}
+        self.by_name = {}     # casefolded name -> [User]
+        self._name_keys = {}  # id(user) -> name key it is filed under
+
+    def get_by_email(self, email_key):
+        return self.by_email.get(email_key)
+
+    def get_by_id(self, student_id):
+        return self.by_id.get(student_id)
+
+    def get_by_uid(self, uid):
+        return self.users[uid - 1] if isinstance(uid, int) and 0 < uid <= len(self.users) else None
+
+    def find_by_name(self, name_key):
+        return list(self.by_name.get(name_key, []))
+
+    def _index(self, u):
+        if u.email:
+            self.by_email[norm_email(u.email)] = u
+        if u.student_id:
+            self.by_id[u.student_id] = u
+        key = norm_name(u.name)
+        self.by_name.setdefault(key, []).append(u)
+        self._name_keys[id(u)] = key
+
+    def add_many(self, users):
+        for u in users:
+            self.users.append(u)
+            u.uid = len(self.users)   # 1-based, like SQLite rowids
+            self._index(u)
+
+    def update(self, user):
+        old_key = self._name_keys.get(id(user))
+        new_key = norm_name(user.name)
+        if old_key != new_key:
+            bucket = self.by_name.get(old_key, [])
+            if user in bucket:
+                bucket.remove(user)
+            self.by_name.setdefault(new_key, []).append(user)
+            self._name_keys[id(user)] = new_key
+
+    def count(self):
+        return len(self.users)
+
+    # history lives on the User linked list itself
+    def append_history(self, user, request):
+        pass
+
+    def clear_history(self, user):
+        pass
+
+    def close(self):
+        pass
+
+
+# SQLITE STORE
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    uid           INTEGER PRIMARY KEY,
+    name          TEXT NOT NULL,
+    name_key      TEXT NOT NULL,
+    email         TEXT,
+    email_key     TEXT UNIQUE,
+    student_id    TEXT UNIQUE,
+    password_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS users_name_key ON users(name_key);
+CREATE TABLE IF NOT EXISTS history (
+    id      INTEGER PRIMARY KEY,
+    uid     INTEGER NOT NULL REFERENCES users(uid),
+    request TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_uid ON history(uid, id);
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    s  TEXT UNIQUE NOT NULL
+);
+"""
+
+# Statements are module constants so sqlite3's per-connection statement
+# cache hands back the same prepared statement on every call.
+_USER_COLS = "uid, name, email, student_id, password_hash"
+_SQL_BY_EMAIL = f"SELECT {_USER_COLS} FROM users WHERE email_key = ?"
+_SQL_BY_ID = f"SELECT {_USER_COLS} FROM users WHERE student_id = ?"
+_SQL_BY_NAME = f"SELECT {_USER_COLS} FROM users WHERE name_key = ?"
+_SQL_BY_UID = f"SELECT {_USER_COLS} FROM users WHERE uid = ?"
+_SQL_INSERT = ("INSERT INTO users (name, name_key, email, email_key, student_id, password_hash) "
+               "VALUES (?, ?, ?, ?, ?, ?)")
+_SQL_UPDATE = "UPDATE users SET name = ?, name_key = ?, password_hash = ? WHERE uid = ?"
+_SQL_COUNT = "SELECT COUNT(*) FROM users"
+_SQL_HISTORY = "SELECT request FROM history WHERE uid = ? ORDER BY id"
+_SQL_ADD_HISTORY = "INSERT INTO history (uid, request) VALUES (?, ?)"
+_SQL_CLEAR_HISTORY = "DELETE FROM history WHERE uid = ?"
+_SQL_ADD_STRING = "INSERT OR IGNORE INTO strings (s) VALUES (?)"
+_SQL_STRING_ID = "SELECT id FROM strings WHERE s = ?"
+_SQL_STRING = "SELECT s FROM strings WHERE id = ?"
+
+
+class _StoredStrings(StringTable):
+    """
+    Intern table for history records, kept in the strings table. index()
+    interns on a miss, so every string in a stored record is a reference
+    (id = row id); rows added by other processes are fetched on demand.
+    """
+
+    def __init__(self, conn):
+        super().__init__()
+        self._conn = conn
+        self._by_id = {}
+
+    def __getitem__(self, i):
+        s = self._by_id.get(i)
+        if s is None:
+            row = self._conn().execute(_SQL_STRING, (i,)).fetchone()
+            if row is None:
+                raise KeyError(f"unknown string id {i}")
+            s = self._by_id[i] = row[0]
+            self._index[s] = i
+        return s
+
+    def index(self, s):
+        i = self._index.get(s)
+        if i is None:
+            conn = self._conn()
+            conn.execute(_SQL_ADD_STRING, (s,))
+            i = conn.execute(_SQL_STRING_ID, (s,)).fetchone()[0]
+            self._index[s] = i
+            self._by_id[i] = s
+        return i
+
+
+class SQLiteUserStore:
+    """
+    Users are loaded on demand (one row per lookup), never all at startup.
+    Each thread reuses a single WAL-mode connection; loaded users are kept
+    in an identity map so every lookup of the same account returns the same
+    User object (session tokens and current_user rely on identity).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._loaded = {}     # uid -> User
+        self.map_hits = 0
+        self.map_misses = 0
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+        # history rows are codec records; older rows are JSON text
+        self.codec = RequestCodec(_StoredStrings(self._conn))
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _user_from_row(self, row):
+        from auth import User  # auth imports this module
+        if row is None:
+            return None
+        uid, name, email, student_id, password_hash = row
+        u = self._loaded.get(uid)
+        if u is not None:
+            self.map_hits += 1
+            return u
+        self.map_misses += 1
+        u = User(name, email=email, student_id=student_id)
+        u.uid = uid
+        u.password_hash = password_hash
+        for (req,) in self._conn().execute(_SQL_HISTORY, (uid,)):
+            # decoded when first read (most histories are never opened)
+            append_history(u, RequestView(req, self.codec) if isinstance(req, bytes) else json.loads(req))
+        return self._loaded.setdefault(uid, u)
+
+    def get_by_email(self, email_key):
+        return self._user_from_row(self._conn().execute(_SQL_BY_EMAIL, (email_key,)).fetchone())
+
+    def get_by_id(self, student_id):
+        return self._user_from_row(self._conn().execute(_SQL_BY_ID, (student_id,)).fetchone())
+
+    def get_by_uid(self, uid):
+        u = self._loaded.get(uid)
+        if u is not None:
+            self.map_hits += 1
+            return u
+        return self._user_from_row(self._conn().execute(_SQL_BY_UID, (uid,)).fetchone())
+
+    def find_by_name(self, name_key):
+        rows = self._conn().execute(_SQL_BY_NAME, (name_key,)).fetchall()
+        return [self._user_from_row(r) for r in rows]
+
+    def add_many(self, users):
+        conn = self._conn()
+        with conn:
+            for u in users:
+                cur = conn.execute(_SQL_INSERT, (
+                    u.name, norm_name(u.name), u.email, norm_email(u.email),
+                    u.student_id, u.password_hash))
+                u.uid = cur.lastrowid
+                self._loaded[u.uid] = u
+
+    def update(self, user):
+        conn = self._conn()
+        with conn:
+            conn.execute(_SQL_UPDATE, (user.name, norm_name(user.name),
+                                       user.password_hash, user.uid))
+
+    def count(self):
+        return self._conn().execute(_SQL_COUNT).fetchone()[0]
+
+    def append_history(self, user, request):
+        conn = self._conn()
+        with conn:
+            conn.execute(_SQL_ADD_HISTORY, (user.uid, self.codec.encode(request)))
+
+    def clear_history(self, user):
+        conn = self._conn()
+        with conn:
+            conn.execute(_SQL_CLEAR_HISTORY, (user.uid,))
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def data_dir():
+    """
+    Directory for writable app data. A PyInstaller onefile build unpacks
+    the sources to a fresh temp dir on every launch, so when frozen this is
+    the folder holding the executable.
+    """
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def default_store_path():
+    return os.path.join(data_dir(), "circuitcart.db")
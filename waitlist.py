@@ -0,0 +1,103 @@
+# waitlist.py
+"""
+Per-item waitlists and holds.
+
+Each item has a heap-backed PriorityQueue of waiters (priority from
+requests.reason_to_priority, FIFO within a priority). When a unit is freed
+it is popped to the next waiter in O(log n) and held for them for
+HOLD_SECONDS; an expired hold passes to the next waiter or back to stock.
+Leaving a waitlist marks the entry dead; dead entries are skipped when
+popped, so leave() is O(1).
+"""
+import heapq
+import time
+from collections import deque
+
+from dsa_structures import PriorityQueue
+
+HOLD_SECONDS = 24 * 3600
+
+
+class Waitlists:
+    def __init__(self, hold_seconds=HOLD_SECONDS, clock=time.time):
+        self.hold_seconds = hold_seconds
+        self.clock = clock
+        self._queues = {}       # item -> PriorityQueue of entries
+        self._entries = {}      # (item, user) -> live entry dict
+        self._waiting = {}      # item -> live waiter count
+        self._holds = {}        # (item, user) -> deque of held unit dicts
+        self._expiry = []       # heap of (expires_at, seq, unit)
+        self._seq = 0
+
+    # WAITLIST
+    def join(self, item, user, priority=2):
+        """Queue user for item. Returns (ok, message)."""
+        if (item, user) in self._entries:
+            return False, "Already on the waitlist."
+        entry = {"item": item, "user": user, "live": True}
+        self._entries[(item, user)] = entry
+        self._queues.setdefault(item, PriorityQueue()).push(priority, entry)
+        self._waiting[item] = self._waiting.get(item, 0) + 1
+        return True, f"Joined the waitlist ({self._waiting[item]} waiting)."
+
+    def leave(self, item, user):
+        entry = self._entries.pop((item, user), None)
+        if entry is None:
+            return False
+        entry["live"] = False
+        self._waiting[item] -= 1
+        return True
+
+    def waiting(self, item):
+        return self._waiting.get(item, 0)
+
+    def is_waiting(self, item, user):
+        return (item, user) in self._entries
+
+    def _pop(self, item):
+        q = self._queues.get(item)
+        while q:
+            entry = q.pop()
+            if entry["live"]:
+                entry["live"] = False
+                del self._entries[(item, entry["user"])]
+                self._waiting[item] -= 1
+                return entry["user"]
+        return None
+
+    # HOLDS (one unit dict per held unit, oldest first per (item, user))
+    def hand_off(self, item, now=None):
+        """Give one freed unit of item to the next waiter; returns that user or None."""
+        user = self._pop(item)
+        if user is not None:
+            now = self.clock() if now is None else now
+            unit = {"item": item, "user": user, "live": True}
+            self._holds.setdefault((item, user), deque()).append(unit)
+            self._seq += 1
+            heapq.heappush(self._expiry, (now + self.hold_seconds, self._seq, unit))
+        return user
+
+    def held(self, item, user):
+        return len(self._holds.get((item, user), ()))
+
+    def claim(self, item, user, n=1):
+        """Consume up to n held units (earliest expiring first); returns how many."""
+        units = self._holds.get((item, user))
+        taken = 0
+        while units and taken < n:
+            units.popleft()["live"] = False
+            taken += 1
+        if units is not None and not units:
+            del self._holds[(item, user)]
+        return taken
+
+    def expire(self, now=None):
+        """Drop holds past their deadline; returns [(item, user)] per expired unit."""
+        now = self.clock() if now is None else now
+        expired = []
+        while self._expiry and self._expiry[0][0] <= now:
+            unit = heapq.heappop(self._expiry)[2]
+            if unit["live"]:   # claimed units are dead and just fall out here
+                self.claim(unit["item"], unit["user"])
+                expired.append((unit["item"], unit["user"]))
+        return expired